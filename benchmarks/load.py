@@ -0,0 +1,65 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The cogs import the bot's modules from inside the package
+sys.path[:0] = [os.path.join(ROOT_DIR, 'src'), os.path.join(ROOT_DIR, 'src', 'r2d20')]
+os.environ.setdefault('HOME_GUILD', '0')
+
+from r2d20.testing import FakeBot  # noqa: E402
+from r2d20.testing.harness import DEFAULT_MIX, LoadHarness  # noqa: E402
+
+
+def parse_mix(text: str) -> dict[str, int]:
+    """Parse a scenario mix like `roll=10,bones=1`"""
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        mix[name.strip()] = int(weight) if weight else 1
+    return mix
+
+
+async def run(args: argparse.Namespace):
+    bot = FakeBot(latency=args.latency)
+    try:
+        harness = LoadHarness(bot, concurrency=args.concurrency, guilds=args.guilds, users=args.users,
+                              mix=args.mix, latency=args.latency, seed=args.seed,
+                              block_threshold=args.block_threshold)
+        return await harness.run(args.interactions, args.duration)
+    finally:
+        await bot.close()
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load test the command handlers and games with fake interactions")
+    parser.add_argument('-c', '--concurrency', type=int, default=10, help="Scenarios run at once")
+    parser.add_argument('-n', '--interactions', type=int, default=1000, help="Stop after this many interactions")
+    parser.add_argument('-d', '--duration', type=float, help="Stop after this many seconds")
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX,
+                        help=f"Relative frequency of each scenario, e.g. 'roll=10,bones=1' "
+                             f"(scenarios: {', '.join(DEFAULT_MIX)})")
+    parser.add_argument('--guilds', type=int, default=3, help="Guilds the interactions come from")
+    parser.add_argument('--users', type=int, default=20, help="Users in each guild")
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds each reply to Discord takes")
+    parser.add_argument('--seed', type=int, help="Seed of the scenarios, users and notations chosen")
+    parser.add_argument('--json', help="Write the report to this JSON file")
+    parser.add_argument('--block-threshold', type=float, default=0.1,
+                        help="Seconds the event loop may be blocked before the call blocking it is sampled")
+    parser.add_argument('--strict', action='store_true', help="Exit with status 1 if the event loop was blocked")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    report = asyncio.run(run(args))
+    print(report)
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(report.asdict(), file, indent=2)
+    return 1 if args.strict and report.loop_blocked else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,278 @@
+import argparse
+import asyncio
+import fnmatch
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import timeit
+from typing import Any, Callable
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The cogs import the bot's modules from inside the package
+sys.path[:0] = [os.path.join(ROOT_DIR, 'src'), os.path.join(ROOT_DIR, 'src', 'r2d20')]
+os.environ.setdefault('HOME_GUILD', '0')
+
+from r2d20.games.dice.bones import BonesEngine, BonesGame, rulesets, stream_roller  # noqa: E402
+from r2d20.games.lobby import LobbyView  # noqa: E402
+from r2d20.testing import FakeBot, FakeInteraction, FakeMember, click  # noqa: E402
+from r2d20.utils.dice import (DiceNotationParser, ParsedDiceRoller, RollStream, compile_notation,  # noqa: E402
+                              configure_limits, create_embed_from_notation)
+from r2d20.utils.dice.notation import vectorized  # noqa: E402
+from r2d20.utils.dice.notation.parsing import MAX_NESTING, NotationParseException  # noqa: E402
+from cogs.rolls import DiceRolls  # noqa: E402
+
+# Stored results compared against by default
+BASELINE = os.path.join(ROOT_DIR, 'benchmarks', 'baseline.json')
+
+REALISTIC_NOTATIONS = [
+    'd20', 'd20+5', '2d6+3', '4d6kh3', 'd20@adv+7', 'd20@dis-1', '8d6', '(d8+3)*2-d4', '3d6min4',
+    '4df', 'd100', '2d20kl1+4', '10d10dl2+2d4-1', '6d8+6', 'd12+d6+2', '2d4*10',
+]
+ADVERSARIAL_NOTATIONS = [
+    '+'.join(['d6'] * 200),
+    '(' * MAX_NESTING + 'd6' + ')' * MAX_NESTING,
+    '-(' * (MAX_NESTING // 2) + 'd20' + ')' * (MAX_NESTING // 2),
+    '+'.join(['d20@adv+5'] * 50),
+    '+'.join(map(str, range(1, 300))) + '+d6',
+    '100d1000dl50*3/2+100d1000kh1',
+    '99d100kl1+99d100kh1',
+]
+# Notations refused by the parser, which should fail fast
+REJECTED_NOTATIONS = [
+    '(' * (MAX_NESTING + 1) + 'd6' + ')' * (MAX_NESTING + 1),
+    '+'.join(['d6'] * 200) + '+',
+    'd20+5)' * 100,
+    '1000000000d6',
+    'd6' + 'x' * 1000,
+]
+POOL_SIZES = [1, 10, 100, 1000, 10_000, 100_000]
+
+# Benchmarks by name. Each builds the function to time.
+CASES: dict[str, Callable[[], Callable[[], Any]]] = {}
+
+
+def case(name: str):
+    def register(setup: Callable[[], Callable[[], Any]]):
+        CASES[name] = setup
+        return setup
+    return register
+
+
+def _parse_all(notations: list[str]) -> Callable[[], None]:
+    def run():
+        for notation in notations:
+            DiceNotationParser(notation).process()
+    return run
+
+
+case('parse/realistic')(lambda: _parse_all(REALISTIC_NOTATIONS))
+case('parse/adversarial')(lambda: _parse_all(ADVERSARIAL_NOTATIONS))
+
+
+@case('parse/rejected')
+def _parse_rejected():
+    def run():
+        for notation in REJECTED_NOTATIONS:
+            try:
+                DiceNotationParser(notation).process()
+            except NotationParseException:
+                pass
+            else:
+                raise AssertionError(f"{notation!r} was not rejected")
+    return run
+
+
+def _pool(num_dice: int) -> Callable[[], Callable[[], None]]:
+    def setup():
+        configure_limits(max_num_dice=max(POOL_SIZES))
+        term = compile_notation(f'{num_dice}d6kh3').terms[0]
+        stream = RollStream(seed=0)
+        return lambda: ParsedDiceRoller(term.pd, term, stream.next()[0])
+    return setup
+
+
+for _size in POOL_SIZES:
+    case(f'roller/{_size}d6kh3')(_pool(_size))
+
+
+def _embed(notation: str) -> Callable[[], Callable[[], None]]:
+    def setup():
+        stream = RollStream(seed=0)
+        return lambda: create_embed_from_notation(notation, stream.reserve())
+    return setup
+
+
+for _notation in ['d20+5', '4d6kh3+d20@adv*2', '100d20dl10']:
+    case(f'embed/notation/{_notation}')(_embed(_notation))
+
+
+@case('embed/simple_roll')
+def _simple_roll():
+    bot = FakeBot()
+    cog = DiceRolls(bot)
+    interaction = FakeInteraction(guild_id=1)
+
+    def run():
+        bot.dice_buffers.refill()
+        cog.create_embed_for_simple_roll(interaction, 20, 2, 5)
+    return run
+
+
+async def play_bones(bot: FakeBot, ruleset_name: str, num_players: int, stand_at: int):
+    """Play one game of Bones from lobby to game over, with every player standing at `stand_at`"""
+    host = FakeMember()
+    lobby = LobbyView(FakeInteraction(host))
+    for _ in range(num_players - 1):
+        await click(lobby, lobby.join, FakeInteraction())
+    members = {member.id: member for member in lobby.members}
+    await click(lobby, lobby.start, FakeInteraction(host))
+    game = BonesGame(bot, lobby=lobby, ruleset_name=ruleset_name)
+    while not game.is_game_over:
+        player = game.current_player
+        button = game.roll if player.score < stand_at else game.stand
+        await click(game, button, FakeInteraction(members[player.id]))
+    return game
+
+
+def _bones(ruleset_name: str, num_players: int, stand_at: int) -> Callable[[], Callable[[], None]]:
+    def setup():
+        bot = FakeBot()
+        loop = asyncio.new_event_loop()
+
+        def run():
+            bot.dice_buffers.refill()
+            loop.run_until_complete(play_bones(bot, ruleset_name, num_players, stand_at))
+        return run
+    return setup
+
+
+case('bones/baldurs_bones/4p')(_bones('baldurs_bones', 4, 17))
+case('bones/variant_knuckles/10p')(_bones('variant_knuckles', 10, 8))
+
+
+def _bones_engine(ruleset_name: str, num_players: int, stand_at: int) -> Callable[[], Callable[[], None]]:
+    def setup():
+        rules = rulesets[ruleset_name]
+        players = [(seat, f'player{seat}') for seat in range(num_players)]
+        roller = stream_roller(RollStream(seed=0))
+
+        def run():
+            engine = BonesEngine(rules, players, roller)
+            while not engine.is_over:
+                if engine.current_player.score < stand_at:
+                    engine.roll()
+                else:
+                    engine.stand()
+        return run
+    return setup
+
+
+case('bones/engine/baldurs_bones/4p')(_bones_engine('baldurs_bones', 4, 17))
+case('bones/engine/variant_knuckles/10p')(_bones_engine('variant_knuckles', 10, 8))
+
+
+def measure(func: Callable[[], Any], repeat: int) -> dict[str, float | int]:
+    """Seconds per call of `func`, over `repeat` runs of as many calls as take about 0.2s"""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    timings = [elapsed / number for elapsed in timer.repeat(repeat, number)]
+    return {'min': min(timings), 'median': statistics.median(timings), 'number': number, 'repeat': repeat}
+
+
+def run(pattern: str = '*', repeat: int = 5) -> dict[str, Any]:
+    """Run the benchmarks with names matching `pattern`
+
+    Returns:
+        dict[str, Any]: `meta` describing the machine, and `results` for each benchmark
+    """
+    results = {}
+    for name, setup in CASES.items():
+        if not fnmatch.fnmatch(name, pattern):
+            continue
+        results[name] = measure(setup(), repeat)
+        print(f"{name:<40} {_format(results[name]['min'])}", file=sys.stderr)
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'machine': platform.machine(),
+            'numpy': vectorized.available,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        },
+        'results': results,
+    }
+
+
+def compare(current: dict[str, Any], baseline: dict[str, Any], tolerance: float) -> list[str]:
+    """Print each benchmark against the baseline
+
+    Returns:
+        list[str]: Names of the benchmarks more than `tolerance` slower than the baseline
+    """
+    regressions = []
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            print(f"{name:<40} {_format(result['min'])}  (new)")
+            continue
+        ratio = result['min'] / base['min']
+        status = ''
+        if ratio > 1 + tolerance:
+            status = 'REGRESSION'
+            regressions.append(name)
+        elif ratio < 1 - tolerance:
+            status = 'faster'
+        print(f"{name:<40} {_format(base['min'])} -> {_format(result['min'])}  x{ratio:.2f} {status}")
+    if baseline.get('meta', {}).get('numpy') != current['meta']['numpy']:
+        print("Warning: the baseline was recorded with NumPy "
+              f"{'installed' if baseline.get('meta', {}).get('numpy') else 'missing'}")
+    return regressions
+
+
+def _format(seconds: float) -> str:
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return f'{seconds / scale:8.2f} {unit:<2}'
+    return f'{seconds / 1e-9:8.2f} ns'
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the dice engine, renderers and game loop")
+    parser.add_argument('-k', '--pattern', default='*', help="Only run benchmarks matching this glob")
+    parser.add_argument('--repeat', type=int, default=5, help="Timed runs of each benchmark")
+    parser.add_argument('--output', help="Write the results to this JSON file")
+    parser.add_argument('--baseline', default=BASELINE, help="Results to compare against")
+    parser.add_argument('--save-baseline', action='store_true', help="Store the results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="Fraction slower than the baseline counted as a regression")
+    parser.add_argument('--list', action='store_true', help="List the benchmarks and exit")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print('\n'.join(name for name in CASES if fnmatch.fnmatch(name, args.pattern)))
+        return 0
+    current = run(args.pattern, args.repeat)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(current, file, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as file:
+            json.dump(current, file, indent=2)
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}, save one with --save-baseline")
+        return 0
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    regressions = compare(current, baseline, args.tolerance)
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
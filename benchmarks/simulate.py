@@ -0,0 +1,107 @@
+import argparse
+import csv
+import logging
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT_DIR, 'src')]
+
+from r2d20.games.dice.bones import rulesets  # noqa: E402
+from r2d20.games.dice.bones.simulation import (BATCH_SIZE, STRATEGIES, SimulationResult,  # noqa: E402
+                                               np, parse_strategy, tournament)
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+COLUMNS = ['ruleset', 'players', 'strategies', 'batch', 'games', 'metric', 'key', 'value']
+
+
+class CsvWriter:
+    def __init__(self, path: str):
+        self._file = open(path, 'w', newline='')
+        self._writer = csv.DictWriter(self._file, COLUMNS)
+        self._writer.writeheader()
+
+    def write(self, rows: list[dict]):
+        self._writer.writerows(rows)
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetWriter:
+    def __init__(self, path: str):
+        self._schema = pyarrow.schema([
+            ('ruleset', pyarrow.string()), ('players', pyarrow.int64()), ('strategies', pyarrow.string()),
+            ('batch', pyarrow.int64()), ('games', pyarrow.int64()), ('metric', pyarrow.string()),
+            ('key', pyarrow.int64()), ('value', pyarrow.float64()),
+        ])
+        self._writer = pyarrow.parquet.ParquetWriter(path, self._schema)
+
+    def write(self, rows: list[dict]):
+        self._writer.write_table(pyarrow.Table.from_pylist(rows, schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Simulate games of Bones to see how balanced the rulesets are")
+    parser.add_argument('-n', '--games', type=int, default=1_000_000,
+                        help="Games of each ruleset at each table size")
+    parser.add_argument('-r', '--ruleset', action='append', choices=list(rulesets),
+                        help="Ruleset to simulate, repeat for more (default: all of them)")
+    parser.add_argument('-p', '--players', type=int, nargs='+', default=[4], help="Table sizes")
+    parser.add_argument('-s', '--strategy', action='append',
+                        help=f"Strategy of each seat in turn order, repeated round the table "
+                             f"(strategies: {', '.join(STRATEGIES)}, e.g. 'threshold:4', 'random:0.3'; "
+                             f"default: optimal)")
+    parser.add_argument('-b', '--batch-size', type=int, default=BATCH_SIZE, help="Games simulated together")
+    parser.add_argument('-w', '--workers', type=int, help="Processes to use (default: one per CPU)")
+    parser.add_argument('--seed', type=int, help="Seed of the dice")
+    parser.add_argument('-o', '--output', help="Stream the totals of each batch to this CSV or .parquet file")
+    args = parser.parse_args(argv)
+
+    if np is None:
+        parser.error("The simulator needs NumPy")
+    strategies = args.strategy or ['optimal']
+    for spec in strategies:
+        try:
+            parse_strategy(spec, rulesets['kobolds_knuckles'], 1)
+        except (ValueError, TypeError) as error:
+            parser.error(f"Bad strategy {spec!r}: {error}")
+    writer = None
+    if args.output and args.output.endswith('.parquet'):
+        if pyarrow is None:
+            parser.error("Writing Parquet needs pyarrow")
+        writer = ParquetWriter(args.output)
+    elif args.output:
+        writer = CsvWriter(args.output)
+
+    logging.basicConfig(level=logging.WARNING)
+    totals: dict[tuple[str, int], SimulationResult] = {}
+    try:
+        for batch, result in tournament(args.ruleset or list(rulesets), args.players, strategies, args.games,
+                                        batch_size=args.batch_size, workers=args.workers, seed=args.seed):
+            if writer is not None:
+                writer.write(list(result.rows(batch)))
+            key = (result.ruleset, result.players)
+            if key in totals:
+                totals[key].merge(result)
+            else:
+                totals[key] = result
+    finally:
+        if writer is not None:
+            writer.close()
+    for result in totals.values():
+        print(result)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,10 +1,16 @@
+import asyncio
 import logging
 import os
 
 import discord
 from discord.ext import commands
 
-from definitions import COGS_DIR, EMOJIS, HOME_GUILD, RESOURCES_DIR, TEST_GUILDS
+from definitions import COGS_DIR, DISTRIBUTION_CACHE, EMOJIS, HOME_GUILD, RESOURCES_DIR, TEST_GUILDS
+from utils.dice import DiceBuffers, RollStreams, configure_budget, configure_distribution_cache, configure_limits
+from utils.metrics import MetricsServer, MetricsTree, metrics
+from utils.offload import Offloader
+from utils.responses import Responder
+from utils.watchdog import LoopWatchdog
 try:
     import config
 except ImportError:
@@ -17,11 +23,38 @@ logger = logging.getLogger(__name__)
 TEST_GUILDS: list[discord.Object]
 
 
+def configure_dice():
+    """Apply the dice options from `config`. Also run in each offload worker process."""
+    if hasattr(config, 'dice_limits') and config.dice_limits:
+        configure_limits(**config.dice_limits)
+    for guild_id, budget in (getattr(config, 'roll_budgets', None) or {}).items():
+        configure_budget(guild_id, **budget)
+    cache_options = dict(getattr(config, 'distribution_cache', None) or {})
+    configure_distribution_cache(cache_options.pop('path', DISTRIBUTION_CACHE), **cache_options)
+
+
+def _read_text(path: str) -> str:
+    with open(path) as f:
+        return f.read().strip()
+
+
 class R2d20(commands.Bot):
     def __init__(self, command_prefix=None, *, intents: discord.Intents):
-        super().__init__(command_prefix, intents=intents)
+        super().__init__(command_prefix, intents=intents, tree_cls=MetricsTree)
         self.help_command = commands.DefaultHelpCommand()
         self._emoji_cache: dict[str, discord.Emoji] = {}
+        self.responder = Responder()
+        self.rng = RollStreams(**(getattr(config, 'rng', None) or {}))
+        self.dice_buffers = DiceBuffers(self.rng.backend, **(getattr(config, 'dice_buffers', None) or {}))
+        self.offloader = Offloader(initializer=configure_dice, **(getattr(config, 'offload', None) or {}))
+        self.metrics = metrics
+        metrics_options = getattr(config, 'metrics', None)
+        self.metrics_server = MetricsServer(metrics, **metrics_options) if metrics_options else None
+        watchdog_options = getattr(config, 'loop_watchdog', None)
+        if watchdog_options is False:
+            self.watchdog = None
+        else:
+            self.watchdog = LoopWatchdog(**(watchdog_options or {}), metrics=metrics)
 
     async def on_ready(self):
         """Triggered by event when bot is logged in"""
@@ -29,9 +62,20 @@ class R2d20(commands.Bot):
         logger.info(
             f"Using Discord Python API version {discord.__version__}\n")
 
+    async def on_app_command_completion(self, interaction: discord.Interaction,
+                                        command: discord.app_commands.Command):
+        """Triggered when an app command finishes without raising"""
+        self.tree.record(interaction, 'ok')
+
     async def setup_hook(self):
         """Triggered before bot is logged in"""
         logger.debug("Executing setup hook")
+        configure_dice()
+        if self.watchdog is not None:
+            self.watchdog.start()
+        self.dice_buffers.start()
+        if self.metrics_server is not None:
+            await self.metrics_server.start()
         if hasattr(config, 'cogs') and config.cogs:
             for cog_name in config.cogs:
                 try:
@@ -46,11 +90,19 @@ class R2d20(commands.Bot):
         for guild in TEST_GUILDS:
             cmds = await self.tree.sync(guild=guild)
             logger.debug(f"Commands synced: {cmds}")
-        with open(os.path.join(RESOURCES_DIR, "welcome.txt")) as f:
-            self.welcome_text = f.read().strip()
+        self.welcome_text = await asyncio.to_thread(_read_text, os.path.join(RESOURCES_DIR, "welcome.txt"))
         #
         await self._cache_application_emojis()
 
+    async def close(self):
+        self.dice_buffers.stop()
+        self.offloader.shutdown()
+        if self.watchdog is not None:
+            self.watchdog.stop()
+        if self.metrics_server is not None:
+            await self.metrics_server.stop()
+        await super().close()
+
     async def load_all_cogs(self):
         """Load every cog we can find"""
         logger.debug("Loading all cogs")
@@ -1,34 +1,67 @@
-import time
+import asyncio
+import logging
 
 import discord
 from discord import app_commands
 from discord.ext import commands
 
 from r2d20.bot import R2d20
-from r2d20.definitions import TEST_GUILDS
+from r2d20.definitions import STRATEGY_CACHE, TEST_GUILDS
 from r2d20.games import bones
 from r2d20.games.lobby import LobbyView
+from r2d20.games.registry import GameLimitException, GameRegistry, SessionState
+from r2d20.utils.responses import reply_error
+try:
+    import config
+except ImportError:
+    config = None
+
+logger = logging.getLogger(__name__)
 
 
 class BonesCog(commands.GroupCog, name='bones'):
     def __init__(self, bot: R2d20):
         self.bot = bot
+        self.games = GameRegistry(**(getattr(config, 'games', None) or {}), metrics=getattr(bot, 'metrics', None))
+        self.strategies: dict[str, bones.BonesStrategy] = {}
         for name in bones.rulesets:
             ruleset: bones.BonesRules = bones.rulesets[name]
             command = app_commands.Command(name=name, description=ruleset.description,
                                            parent=self, callback=self.run_game)
             self.app_command.add_command(command)
 
+    async def cog_load(self):
+        self.games.start()
+        hint_options = getattr(config, 'bones_hints', None)
+        if hint_options is not False:
+            hint_options = {'path': STRATEGY_CACHE, **(hint_options or {})}
+            self.strategies = await asyncio.to_thread(bones.load_strategies, bones.rulesets, **hint_options)
+
+    async def cog_unload(self):
+        await self.games.stop()
+
     async def run_game(self, interaction: discord.Interaction):
+        """Open a lobby, which the registry replaces with the game once it's started"""
         ruleset_name = interaction.command.name
         ruleset: bones.BonesRules = bones.rulesets[ruleset_name]
-        lobby = LobbyView(interaction, lobby_title=f"{interaction.user.display_name}'s {ruleset.title} Lobby")
-        await interaction.response.send_message(embed=lobby.embed, view=lobby)
-        await lobby.wait()
-        time.sleep(1)
-        game = bones.BonesGame(self.bot, lobby=lobby, ruleset_name=ruleset_name)
-        await interaction.edit_original_response(embed=game.embed, view=game)
-        await game.wait()
+        lobby = LobbyView(interaction, lobby_title=f"{interaction.user.display_name}'s {ruleset.title} Lobby",
+                          timeout=None)
+        session = self.games.open(interaction, ruleset_name, lobby,
+                                  lambda lobby: bones.BonesGame(self.bot, lobby=lobby, ruleset_name=ruleset_name,
+                                                                strategy=self.strategies.get(ruleset_name),
+                                                                timeout=None))
+        try:
+            await self.bot.responder.send(interaction, {'embed': lobby.embed, 'view': lobby})
+        except Exception:
+            self.games.close(session, SessionState.FAILED)
+            raise
+
+    async def cog_app_command_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError):
+        if isinstance(error, app_commands.CommandInvokeError) and isinstance(error.original, GameLimitException):
+            await reply_error(interaction, error.original.args[0], ephemeral=True)
+        else:
+            logger.exception(f"Unhandled error in command: /{interaction.command.qualified_name}")
+            await reply_error(interaction, "There was a problem starting the game.", ephemeral=True)
 
 
 async def setup(bot: R2d20):
@@ -1,4 +1,5 @@
 import logging
+import os
 
 import discord
 from discord import Interaction, app_commands
@@ -7,9 +8,19 @@ from discord.ext import commands
 from bot import R2d20
 from definitions import HOME_GUILD
 from utils.checks import is_owner
+from utils.dice import EMBED_FIELD_LIMIT, join_parts
+from utils.responses import reply_error
+from utils.watchdog import Stack
 
 logger = logging.getLogger(__name__)
 
+# Latency histograms shown by /bot metrics, with the label to show them by
+METRICS_SHOWN = (
+    ('Commands', 'r2d20_command_seconds', 'command'),
+    ('Buttons', 'r2d20_view_seconds', 'action'),
+    ('Phases', 'r2d20_phase_seconds', 'phase'),
+)
+
 
 @app_commands.check(is_owner)
 class BotAdminCog(commands.GroupCog, group_name='bot'):
@@ -19,27 +30,25 @@ class BotAdminCog(commands.GroupCog, group_name='bot'):
     @app_commands.command()
     async def sync_guild(self, ctx: Interaction, guild_id: str = None):
         """Sync the command tree to the guild"""
-        await ctx.response.send_message("Syncing...", ephemeral=True)
         guild = discord.Object(guild_id) if guild_id else ctx.guild
         # self.bot.tree.clear_commands(guild=guild)
-        await self.bot.tree.sync(guild=guild)
-        await ctx.edit_original_response(content="Synced")
+        await self.bot.responder.send(ctx, self._sync(guild), slow=True, ephemeral=True)
 
     @app_commands.command()
     async def clear_guild(self, ctx: Interaction, guild_id: str = None):
         """Sync the command tree to the guild"""
-        await ctx.response.send_message("Syncing...", ephemeral=True)
         guild = discord.Object(guild_id) if guild_id else ctx.guild
         self.bot.tree.clear_commands(guild=guild)
-        await self.bot.tree.sync(guild=guild)
-        await ctx.edit_original_response(content="Synced")
+        await self.bot.responder.send(ctx, self._sync(guild), slow=True, ephemeral=True)
 
     @app_commands.command()
     async def sync_global(self, ctx: Interaction):
         """Sync the command tree"""
-        await ctx.response.send_message("Syncing...", ephemeral=True)
-        await self.bot.tree.sync()
-        await ctx.edit_original_response(content="Synced")
+        await self.bot.responder.send(ctx, self._sync(), slow=True, ephemeral=True)
+
+    async def _sync(self, guild: discord.abc.Snowflake = None) -> dict:
+        await self.bot.tree.sync(guild=guild)
+        return {'content': "Synced"}
 
     @app_commands.command()
     async def log_level(self, ctx: Interaction, level: str):
@@ -49,7 +58,35 @@ class BotAdminCog(commands.GroupCog, group_name='bot'):
             if isinstance(_logger, logging.Logger):
                 _logger.setLevel(level)
         logger.info(f"Set log level to {level}")
-        await ctx.response.send_message(f"Set log level to {level}")
+        await self.bot.responder.send(ctx, {'content': f"Set log level to {level}"})
+
+    @app_commands.command()
+    async def metrics(self, ctx: Interaction):
+        """Show command latencies and errors"""
+        await self.bot.responder.send(ctx, {'embed': self._metrics_embed()}, ephemeral=True)
+
+    def _metrics_embed(self) -> discord.Embed:
+        metrics = self.bot.metrics
+        embed = discord.Embed(title='Metrics')
+        for title, name, label in METRICS_SHOWN:
+            rows = ((f'{value}: {count:,}, p50 {p50 * 1000:.1f}ms, p99 {p99 * 1000:.1f}ms', 1)
+                    for value, count, p50, p99 in metrics.summary(name, label))
+            text, _ = join_parts(rows, EMBED_FIELD_LIMIT, separator='\n', opening='', closing='')
+            embed.add_field(name=title, value=text or 'None yet', inline=False)
+        errors = sorted(metrics.counters.get('r2d20_command_errors_total', {}).items(),
+                        key=lambda item: item[1], reverse=True)
+        rows = ((f"/{dict(labels)['command']} {dict(labels)['error']}: {count:,}", 1) for labels, count in errors)
+        text, _ = join_parts(rows, EMBED_FIELD_LIMIT, separator='\n', opening='', closing='')
+        embed.add_field(name='Errors', value=text or 'None', inline=False)
+        if (bones := self.bot.get_cog('bones')) is not None:
+            stats = bones.games.stats()
+            embed.add_field(name='Games', value=', '.join(f"{name.replace('_', ' ')}: {count:,}"
+                                                          for name, count in stats.items()), inline=False)
+        if self.bot.watchdog is not None and self.bot.watchdog.episodes:
+            rows = ((f"{count:,} × {_call_site(stack)}", 1) for stack, count in self.bot.watchdog.call_sites())
+            text, _ = join_parts(rows, EMBED_FIELD_LIMIT, separator='\n', opening='', closing='')
+            embed.add_field(name=f'Loop blocked {self.bot.watchdog.episodes:,} times', value=text, inline=False)
+        return embed
 
     async def cog_app_command_error(self,
                                 ctx: Interaction,
@@ -62,16 +99,16 @@ class BotAdminCog(commands.GroupCog, group_name='bot'):
         """
         if isinstance(error, app_commands.CheckFailure):
             logger.debug("Failed command check")
-            await ctx.response.send_message(
-                "You are not allowed to use this command",
-                ephemeral=True
-            )
+            await reply_error(ctx, "You are not allowed to use this command", ephemeral=True)
         else:
             logger.exception(error)
-            if ctx.response.is_done():
-                await ctx.response.edit_message(content="Unhandled error")
-            else:
-                await ctx.response.send_message("Unhandled error", ephemeral=True)
+            await reply_error(ctx, "Unhandled error", ephemeral=True)
+
+
+def _call_site(stack: Stack) -> str:
+    """The innermost call of a stack, e.g. `bones.py:28 in run_game`"""
+    filename, lineno, name = stack[-1]
+    return f"{os.path.basename(filename)}:{lineno} in {name}"
 
 
 async def setup(bot: R2d20):
@@ -8,6 +8,7 @@ from bot import R2d20
 from definitions import HOME_GUILD
 from r2d20 import config
 from utils.checks import is_owner
+from utils.responses import reply_error
 
 logger = logging.getLogger(__name__)
 
@@ -29,11 +30,11 @@ class CogLoaderCog(commands.GroupCog, group_name='cog'):
             ctx (Interaction): The interaction that triggered this function
             name_of_cog (Literal['test_cog']): Name of the cog
         """
+        await self.bot.responder.send(ctx, self._reload(name_of_cog), slow=True, ephemeral=True)
+
+    async def _reload(self, name_of_cog: str) -> dict:
         successful = await self.bot.load_or_reload_extension(name_of_cog)
-        await ctx.response.send_message(
-            ['Failed', 'Success'][successful],
-            ephemeral=True
-        )
+        return {'content': ['Failed', 'Success'][successful]}
 
     async def cog_app_command_error(self,
                                     ctx: Interaction,
@@ -46,13 +47,10 @@ class CogLoaderCog(commands.GroupCog, group_name='cog'):
         """
         if isinstance(error, app_commands.CheckFailure):
             self.logger.debug("Failed command check")
-            await ctx.response.send_message(
-                "You are not allowed to use this command",
-                ephemeral=True
-            )
+            await reply_error(ctx, "You are not allowed to use this command", ephemeral=True)
         else:
             self.logger.exception(error)
-            await ctx.response.send_message("Unhandled error", ephemeral=True)
+            await reply_error(ctx, "Unhandled error", ephemeral=True)
 
 
 async def setup(bot: R2d20):
@@ -1,5 +1,5 @@
+import contextlib
 import logging
-import random
 
 import discord
 from discord import app_commands, Interaction
@@ -7,7 +7,13 @@ from discord.ext import commands
 
 from bot import R2d20
 from utils.enums import Advantage
-from utils.dice import NotationParseException, create_embed_from_notation
+from utils.dice import (Admission, DiceResult, NotationParseException, RenderBuffer, RollSeed, admit, budget_for,
+                        check_repeat, compile_notation, create_embed_for_batch, create_embed_for_stats,
+                        create_embed_from_notation, estimate_cost, roll_batch, select_dice, split_repeat,
+                        stats_cost, write_results)
+from utils.metrics import metrics
+from utils.offload import OffloadException
+from utils.responses import reply_error
 
 logger = logging.getLogger(__name__)
 
@@ -17,16 +23,38 @@ class DiceRolls(commands.Cog):
         self.bot: R2d20 = bot
 
     @app_commands.command()
-    @app_commands.describe(dice_notation="Dice notation (see help for more)",
+    @app_commands.describe(dice_notation="Dice notation (see help for more), e.g. \"6x 4d6kh3\" to roll 6 times",
+                           repeat="Number of times to roll",
                            hidden="Roll in secret?")
-    async def roll(self, interaction: Interaction, dice_notation: str, hidden: bool = False):
+    async def roll(self, interaction: Interaction, dice_notation: str, repeat: int = 1, hidden: bool = False):
         """Roll dice using dice notation"""
         logger.debug(
-            f"Command /roll invoked with arguments: dice_notation={dice_notation}, hidden={hidden}")
-        embed = create_embed_from_notation(dice_notation)
-        embed.set_author(name=interaction.user.display_name,
-                         icon_url=interaction.user.avatar.url)
-        await interaction.response.send_message(embed=embed, ephemeral=hidden)
+            f"Command /roll invoked with arguments: dice_notation={dice_notation}, repeat={repeat}, hidden={hidden}")
+        with metrics.phase('parse', interaction):
+            times, notation = split_repeat(dice_notation)
+            times *= repeat
+            check_repeat(times)
+            admission = admit(estimate_cost(compile_notation(notation), times), budget_for(interaction.guild_id))
+        await self._send_notation(interaction, notation, times, admission, hidden)
+
+    @app_commands.command()
+    @app_commands.describe(dice_notation="Dice notation (see help for more)",
+                           at_least="Also show the chance of rolling at least this",
+                           hidden="Show the odds in secret?")
+    async def roll_stats(self, interaction: Interaction, dice_notation: str, at_least: int = None,
+                         hidden: bool = False):
+        """Show the exact odds of rolling dice notation"""
+        logger.debug(
+            f"Command /roll_stats invoked with arguments: dice_notation={dice_notation}, at_least={at_least}, hidden={hidden}")
+        inline = stats_cost(compile_notation(dice_notation)) < budget_for(interaction.guild_id).inline_stats
+
+        async def reply():
+            with metrics.phase('stats' if inline else 'offload', interaction):
+                embed = await self.bot.offloader.run(create_embed_for_stats, dice_notation, at_least, inline=inline)
+            embed.set_author(name=interaction.user.display_name,
+                             icon_url=interaction.user.avatar.url)
+            return {'embed': embed}
+        await self.bot.responder.send(interaction, reply(), slow=not inline, ephemeral=hidden)
 
     @app_commands.command()
     @app_commands.describe(quantity="Number of dice to roll",
@@ -92,34 +120,62 @@ class DiceRolls(commands.Cog):
         """Roll a new set of character stats"""
         logger.debug(
             f"Command /newstats invoked with arguments: hidden={hidden}")
-        results = self.genstats()
+        seed = self.bot.rng.for_guild(interaction.guild_id).reserve()
+        results = self.genstats(seed)
         results_str = ', '.join(map(str, results))
         embed = discord.Embed(title='Rolled New Stats',
                               description=results_str)
+        embed.set_footer(text=f'Seed {seed}')
         embed.set_author(name=interaction.user.display_name,
                          icon_url=interaction.user.avatar.url)
-        await interaction.response.send_message(embed=embed, ephemeral=hidden)
+        await self.bot.responder.send(interaction, {'embed': embed}, ephemeral=hidden)
 
     async def cog_app_command_error(self, interaction: Interaction,
                                     error: app_commands.AppCommandError):
         if isinstance(error, app_commands.CheckFailure):
-            await interaction.response.send_message("You are not allowed to use this command")
+            await reply_error(interaction, "You are not allowed to use this command")
         elif isinstance(error, app_commands.CommandInvokeError) and\
-                isinstance(error.original, NotationParseException):
-            await interaction.response.send_message(error.original.args[0])
+                isinstance(error.original, (NotationParseException, OffloadException)):
+            await reply_error(interaction, error.original.args[0])
         else:
             logger.exception(
                 f"Unhandled error in command: /{interaction.command.qualified_name}")
-            await interaction.response.send_message("There was a problem... I'm not surprised tbh.")
+            await reply_error(interaction, "There was a problem... I'm not surprised tbh.")
+
+    async def _send_notation(self, interaction: Interaction, notation: str, times: int, admission: Admission,
+                             hidden: bool):
+        """Roll notation `times` times, on the event loop or in the process pool as it was admitted"""
+        seed = self.bot.rng.for_guild(interaction.guild_id).reserve()
+
+        async def reply():
+            inline = admission is Admission.INLINE
+            # Jobs in the process pool record their phases there, so only the whole job is timed here
+            with contextlib.nullcontext() if inline else metrics.phase('offload', interaction):
+                if times == 1:
+                    embed = await self.bot.offloader.run(create_embed_from_notation, notation, seed, inline=inline)
+                else:
+                    embed = await self.bot.offloader.run(create_embed_for_batch, notation, times, seed,
+                                                         inline=inline)
+            embed.set_author(name=interaction.user.display_name,
+                             icon_url=interaction.user.avatar.url)
+            return {'embed': embed}
+        await self.bot.responder.send(interaction, reply(), slow=admission is Admission.OFFLOAD, ephemeral=hidden)
 
     async def simple_roll(self, interaction: Interaction, die: int,
                           quantity: int = 1, modifier: int = 0, advantage: Advantage = None, hidden: bool = False):
         """Roll a simple die"""
         logger.debug(
             f"Command /d{die} invoked with arguments: quantity={quantity}, modifier={modifier}, advantage={advantage}, hidden={hidden}")
+        notation = self._simple_notation(die, quantity, modifier, advantage)
+        with metrics.phase('parse', interaction):
+            admission = admit(estimate_cost(compile_notation(notation)), budget_for(interaction.guild_id))
+        if admission is Admission.OFFLOAD:
+            # Too many dice for the event loop, so they're rolled like /roll
+            await self._send_notation(interaction, notation, 1, admission, hidden)
+            return
         embed = self.create_embed_for_simple_roll(interaction, die,
                                                   quantity, modifier, advantage)
-        await interaction.response.send_message(embed=embed, ephemeral=hidden)
+        await self.bot.responder.send(interaction, {'embed': embed}, ephemeral=hidden)
 
     def create_embed_for_simple_roll(self, interaction: Interaction, die: int,
                                      quantity: int, modifier: int, advantage: Advantage = None) -> discord.Embed:
@@ -136,41 +192,70 @@ class DiceRolls(commands.Cog):
             discord.Embed: Embed displaying information about the roll and result
         """
         mod_str = "" if modifier == 0 else f"{'+' if modifier >= 0 else '-'}{modifier}"
+        with metrics.phase('roll', interaction):
+            dice, seed = self._roll_simple(interaction, die, quantity, advantage)
+        with metrics.phase('render', interaction):
+            return self._simple_roll_embed(interaction, die, mod_str, dice.total + modifier, dice, seed)
+
+    @staticmethod
+    def _simple_notation(die: int, quantity: int, modifier: int, advantage: Advantage = None) -> str:
+        """Dice notation rolling the same dice as a simple roll, to admit it like /roll"""
+        if advantage is None or advantage == Advantage.NONE:
+            notation = f"{max(quantity, 1)}d{die}"
+        else:
+            notation = f"{max(quantity, 2)}d{die}k{'h' if advantage == Advantage.ADVANTAGE else 'l'}1"
+        return notation if modifier == 0 else f"{notation}{modifier:+d}"
+
+    def _roll_simple(self, interaction: Interaction, die: int, quantity: int,
+                     advantage: Advantage = None) -> tuple[DiceResult, RollSeed]:
         if advantage is None or advantage == Advantage.NONE:
             quantity = 1 if quantity < 1 else quantity
-            roll = sum([random.randint(1, die) for _ in range(quantity)])
-            result = roll + modifier
-            result_str = f"[**{roll}**]{mod_str} = {result}"
+            rolls, seed = self._roll_dice(interaction, die, quantity)
+            dice = select_dice(rolls, 0, quantity)
         elif advantage == Advantage.ADVANTAGE:
             quantity = 2 if quantity < 2 else quantity
-            rolls = [random.randint(1, die) for _ in range(2)]
-            result = max(rolls) + modifier
-            result_str = f"[~~{min(rolls)}~~, **{max(rolls)}**]{mod_str} = {result}"
+            rolls, seed = self._roll_dice(interaction, die, quantity)
+            dice = select_dice(rolls, quantity - 1, quantity)
         elif advantage == Advantage.DISADVANTAGE:
             quantity = 2 if quantity < 2 else quantity
-            rolls = [random.randint(1, die) for _ in range(quantity)]
-            result = min(rolls) + modifier
-            result_str = f"[~~{max(rolls)}~~, **{min(rolls)}**]{mod_str} = {result}"
+            rolls, seed = self._roll_dice(interaction, die, quantity)
+            dice = select_dice(rolls, 0, 1)
+        return dice, seed
+
+    def _simple_roll_embed(self, interaction: Interaction, die: int, mod_str: str, result: int,
+                           dice: DiceResult, seed: RollSeed) -> discord.Embed:
+        tail = f"{mod_str} = {result}"
+        description = RenderBuffer()
+        description.write("Result: ")
+        write_results(description, dice, reserve=len(tail))
+        description.write(tail)
         #
         emoji = self.bot.get_cached_emoji(f'd{die}')
-        result_str = f"Result: {result_str}"
         embed = discord.Embed(title=f"Rolled d{die}{mod_str}",
-                              description=result_str)
+                              description=str(description))
         if emoji:
             embed.set_thumbnail(url=emoji.url)
+        embed.set_footer(text=f'Seed {seed}')
         #
         embed.set_author(name=interaction.user.display_name,
                          icon_url=interaction.user.avatar.url)
         return embed
 
-    def genstats(self):
-        """Generate raw stats for a new D&D Character"""
-        results = []
-        for _ in range(6):
-            rolls = [random.randint(1, 6) for _ in range(4)]
-            result = sum(sorted(rolls, reverse=True)[:-1])
-            results.append(result)
-        return sorted(results)
+    def _roll_dice(self, interaction: Interaction, die: int, quantity: int) -> tuple[list[int], RollSeed]:
+        """Roll from the pre-drawn buffers, unless the guild was given its own seed"""
+        stream = self.bot.rng.for_guild(interaction.guild_id)
+        if interaction.guild_id in self.bot.rng.seeds:
+            source, seed = stream.next()
+            return source.roll(quantity, 1, die), seed
+        return self.bot.dice_buffers.roll(die, quantity, stream)
+
+    def genstats(self, seed: RollSeed = None) -> list[int]:
+        """Generate raw stats for a new D&D Character
+
+        Args:
+            seed (RollSeed, optional): where to draw the dice from. Defaults to the shared stream.
+        """
+        return sorted(roll_batch(compile_notation('4d6kh3'), 6, seed).totals)
 
 
 async def setup(bot: commands.Bot):
@@ -6,6 +6,8 @@ import discord
 ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
 COGS_DIR = os.path.join(ROOT_DIR, "cogs")
 RESOURCES_DIR = os.path.join(ROOT_DIR, "resources")
+DISTRIBUTION_CACHE = os.environ.get('DISTRIBUTION_CACHE', os.path.join(ROOT_DIR, "distributions.sqlite3"))
+STRATEGY_CACHE = os.environ.get('STRATEGY_CACHE', os.path.join(ROOT_DIR, "strategies"))
 TEST_GUILDS = [discord.Object(guild_id) for guild_id in filter(None, os.environ.get('TEST_GUILDS', "").split(','))]
 HOME_GUILD = discord.Object(os.environ.get('HOME_GUILD'))
 EMOJIS = {
@@ -1,2 +1,4 @@
+from .engine import *
 from .game import *
 from .rules import *
+from .strategy import *
@@ -0,0 +1,158 @@
+import logging
+from typing import Callable, Iterable, Iterator
+
+from r2d20.utils.dice import DiceBuffers, RollStream
+from .rules import BonesRules
+
+__all__ = ['BonesEngine', 'BonesPlayer', 'IllegalMoveException', 'Roller', 'stream_roller']
+
+logger = logging.getLogger(__name__)
+
+# Rolls one die with the given number of sides
+Roller = Callable[[int], int]
+
+
+class IllegalMoveException(Exception):
+    """A move was made after the game ended"""
+
+
+class BonesPlayer:
+    __slots__ = ('id', 'name', 'score', 'rolls', 'bust')
+
+    def __init__(self, player_id: int, name: str):
+        """A seat at the table, keeping score
+
+        Attributes:
+            id (int): The player's id, e.g. their Discord user id
+            name (str): The player's name when the game started
+            score (int): Total of their dice
+            rolls (list[int]): Each die they rolled, the initial dice first
+            bust (bool): They went over the target score on their turn
+        """
+        self.id = player_id
+        self.name = name
+        self.score = 0
+        self.rolls: list[int] = []
+        self.bust = False
+
+    def __repr__(self):
+        return f'<BonesPlayer id={self.id} name={self.name!r} score={self.score}>'
+
+    def __str__(self):
+        return self.name
+
+
+class BonesEngine:
+    def __init__(self, rules: BonesRules, players: Iterable[tuple[int, str]], roll: Roller = None):
+        """The state of a game of Bones, played one move at a time, without any Discord objects.
+
+        Every player rolls their initial dice, then takes a turn in seat
+        order. A turn is any number of `roll`s and ends with `stand`, or
+        by itself once the player's score reaches the target.
+
+        Args:
+            rules (BonesRules): The ruleset being played
+            players (Iterable[tuple[int, str]]): The id and name of each player, in seat order
+            roll (Roller, optional): Rolls the dice. Defaults to rolling from a new `RollStream`.
+
+        Attributes:
+            players (list[BonesPlayer]): The players in seat order
+            target_score (int): Scores above this bust, raised by the variant rules
+            turn (int): Seat of the player taking their turn, `len(players)` once the game is over
+            best_score (int): The best score of the players who have stood without busting, 0 if there isn't one
+        """
+        self.rules = rules
+        self.roller = roll if roll is not None else stream_roller(RollStream())
+        self.target_score = int(rules.target_score)
+        self.players = [BonesPlayer(player_id, name) for player_id, name in players]
+        self.turn = 0
+        self.best_score = 0
+        for player in self.players:
+            for _ in range(rules.init_dice):
+                self._roll(player, rules.init_dice_sides)
+
+    def __repr__(self):
+        return f'<BonesEngine title={self.rules.title!r} turn={self.turn} target={self.target_score}>'
+
+    @property
+    def current_player(self) -> BonesPlayer | None:
+        if self.turn < len(self.players):
+            return self.players[self.turn]
+
+    @property
+    def is_over(self) -> bool:
+        return self.turn >= len(self.players)
+
+    @property
+    def players_after(self) -> int:
+        """Players still to take their turns after the current player"""
+        return max(0, len(self.players) - self.turn - 1)
+
+    @property
+    def winners(self) -> list[BonesPlayer]:
+        """The players with the highest score who didn't bust, more than one if they tied"""
+        standing = [player for player in self.players if not player.bust]
+        if not standing:
+            return []
+        high_score = max(player.score for player in standing)
+        return [player for player in standing if player.score == high_score]
+
+    def roll(self) -> int:
+        """The current player rolls another die, ending their turn if they reach the target score
+
+        Returns:
+            int: The die rolled
+
+        Raises:
+            IllegalMoveException: The game is over
+        """
+        player = self._current()
+        result = self._roll(player, self.rules.dice_sides)
+        if player.score >= self.target_score:
+            self._end_turn(player)
+        return result
+
+    def stand(self):
+        """The current player ends their turn
+
+        Raises:
+            IllegalMoveException: The game is over
+        """
+        self._end_turn(self._current())
+
+    def dice(self, player: BonesPlayer) -> Iterator[tuple[int, int]]:
+        """The sides and result of each die the player rolled"""
+        for index, result in enumerate(player.rolls):
+            yield (self.rules.init_dice_sides if index < self.rules.init_dice else self.rules.dice_sides), result
+
+    def _current(self) -> BonesPlayer:
+        if self.is_over:
+            raise IllegalMoveException("The game is over")
+        return self.players[self.turn]
+
+    def _roll(self, player: BonesPlayer, sides: int) -> int:
+        result = self.roller(sides)
+        player.rolls.append(result)
+        player.score += result
+        return result
+
+    def _end_turn(self, player: BonesPlayer):
+        player.bust = player.score > self.target_score
+        if not player.bust:
+            self.best_score = max(self.best_score, player.score)
+        if player.score == self.target_score and self.rules.variant_rules is True:
+            self.target_score += 1
+        self.turn += 1
+
+
+def stream_roller(stream: RollStream, buffers: DiceBuffers = None) -> Roller:
+    """Roll from a seeded stream, through the bot's dice buffers if given, logging each roll's seed"""
+    def roll(sides: int) -> int:
+        if buffers is not None:
+            (result,), seed = buffers.roll(sides, 1, stream)
+        else:
+            source, seed = stream.next()
+            result = source.roll(1, 1, sides)[0]
+        logger.debug(f"Rolled {result} on a d{sides} (seed {seed})")
+        return result
+    return roll
@@ -1,15 +1,19 @@
 import logging
-import random
 
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Iterable
 
 import discord
 
-from r2d20.bot import R2d20
 from r2d20.games.lobby import LobbyView
-from r2d20.games.players import PlayerBase
+from r2d20.games.registry import SessionView
+from r2d20.utils.dice import EMBED_FIELD_LIMIT, join_parts
+from r2d20.utils.metrics import timed_callback
+from .engine import BonesEngine, BonesPlayer, stream_roller
+from .strategy import BonesStrategy
 from .rules import rulesets
 from .rules import BonesRules
+if TYPE_CHECKING:
+    from r2d20.bot import R2d20
 
 __all__ = ['BonesGame']
 
@@ -17,72 +21,88 @@ __all__ = ['BonesGame']
 logger = logging.getLogger(__name__)
 
 
-class BonesPlayer(PlayerBase):
-    """Keeps score in the dice game for a discord.Member"""
-    def __init__(self, member: discord.Member, *,
-                 init_dice: int = 0, init_dice_sides: int = 0, **kwargs):
-        super().__init__(member)
-        self.score: int = 0
-        self.rolls: list[tuple[int, int]] = []
-        for _ in range(init_dice):
-            self.roll(init_dice_sides)
+class BonesGame(SessionView):
+    def __init__(self, bot: 'R2d20', *, lobby: LobbyView, ruleset_name: str, strategy: BonesStrategy = None,
+                 **kwargs):
+        """Shows a `BonesEngine` and passes the current player's clicks to it.
 
-    def roll(self, sides):
-        roll = int(random.randint(1, sides))
-        self.rolls.append((sides, int(roll)))
-        self.score += roll
-        return roll
+        Args:
+            bot (R2d20): The bot, for its dice and emojis
+            lobby (LobbyView): The lobby the players joined, in seat order
+            ruleset_name (str): Name of a ruleset in `rulesets`
+            strategy (BonesStrategy, optional): The ruleset's solved strategy, adding a Hint button
+            kwargs (dict): Additional keyword arguments sent to `SessionView`
 
-
-class BonesGame(discord.ui.View):
-    def __init__(self, bot: R2d20, *, lobby: LobbyView, ruleset_name: str, **kwargs):
+        Attributes:
+            engine (BonesEngine): The state of the game
+        """
         super().__init__(**kwargs)
         self.bot = bot
-        self.lobby = lobby
         self.orig_interaction = lobby.interaction
         if ruleset_name not in rulesets:
             raise ValueError(f"Ruleset {ruleset_name} not found")
         self.ruleset: BonesRules = rulesets[ruleset_name]
-        self.target_score = int(self.ruleset.target_score)
-        self.players = [BonesPlayer(member, **self.ruleset.asdict()) for member in self.lobby.members]
-
-        self._current_player_index: int = 0
+        self.stream = bot.rng.for_game()
+        logger.debug(f"Rolling {ruleset_name} from {self.stream}")
+        self.engine = BonesEngine(self.ruleset, ((member.id, member.display_name) for member in lobby.members),
+                                  stream_roller(self.stream, bot.dice_buffers))
+        self.strategy = strategy
+        if strategy is None:
+            self.remove_item(self.hint)
         self._player_marker = "👈"
         self._embed: discord.Embed = self._init_embed()
 
     @property
     def current_player(self) -> BonesPlayer | None:
-        if self._current_player_index in range(len(self.players)):
-            return self.players[self._current_player_index]
-        
+        return self.engine.current_player
+
+    @property
+    def target_score(self) -> int:
+        return self.engine.target_score
+
     @property
     def embed(self) -> discord.Embed:
         return self._embed
 
     @property
     def is_game_over(self) -> bool:
-        return self.current_player is None
+        return self.engine.is_over
 
     @discord.ui.button(label='Roll', style=discord.ButtonStyle.green)
+    @timed_callback('bones')
     async def roll(self, interaction: discord.Interaction, button: discord.ui.Button):
-        self.current_player.roll(self.ruleset.dice_sides)
-        if self.current_player.score >= self.target_score:
-            self._turn_end()
-        else:
-            self._update_results()
-            self._embed.description = f'Target: **{self.target_score}**'
+        async with self.lock:
+            turn = self.engine.turn
+            self.engine.roll()
+            self._show_move(turn)
         #
-        view = None if self.is_finished() else self
-        await interaction.response.edit_message(embed=self._embed, view=view)
+        await self.updater.update(interaction, final=self.is_finished())
 
     @discord.ui.button(label='Stand', style=discord.ButtonStyle.red)
+    @timed_callback('bones')
     async def stand(self, interaction: discord.Interaction, button: discord.ui.Button):
-        self._turn_end()
-        view = None if self.is_finished() else self
-        await interaction.response.edit_message(embed=self._embed, view=view)
+        async with self.lock:
+            turn = self.engine.turn
+            self.engine.stand()
+            self._show_move(turn)
+        await self.updater.update(interaction, final=self.is_finished())
     
+    @discord.ui.button(label='Hint', style=discord.ButtonStyle.grey)
+    @timed_callback('bones')
+    async def hint(self, interaction: discord.Interaction, button: discord.ui.Button):
+        """Tell the current player their best move, looked up in the solved strategy."""
+        engine = self.engine
+        hint = self.strategy.hint(engine.current_player.score, engine.best_score, engine.players_after,
+                                  engine.target_score)
+        move = 'Roll' if hint.roll else 'Stand'
+        await interaction.response.send_message(
+            f"**{move}**: {hint.roll_chance:.0%} chance to win if you roll, {hint.stand_chance:.0%} if you stand",
+            ephemeral=True, delete_after=10.0)
+
     async def interaction_check(self, interaction: discord.Interaction):
-        allowed = interaction.user.id == self.current_player.id
+        await super().interaction_check(interaction)
+        player = self.engine.current_player
+        allowed = player is not None and interaction.user.id == player.id
         if not allowed:
             logger.debug(f"Interaction was not allowed: It is not {interaction.user.display_name}'s turn")
             await interaction.response.send_message("It's not your turn", ephemeral=True, delete_after=5.0)
@@ -92,72 +112,54 @@ class BonesGame(discord.ui.View):
     def _init_embed(self) -> discord.Embed:
         embed = discord.Embed(title=self.ruleset.title,
                               description=f'Target: **{self.target_score}**')
-        first = True
-        for player in self.players:
-            field = self._create_player_embed_field(player, first)
-            first = False
-            embed.add_field(**field)
+        for turn, player in enumerate(self.engine.players):
+            embed.add_field(**self._create_player_embed_field(player, turn == self.engine.turn))
         #
         return embed
 
-    def _turn_end(self):
-        self._update_results(mark_player=False)
-        
-        if self.current_player.score == self.target_score and\
-           self.ruleset.variant_rules is True:
-            self._incriment_target()
-        #
-        self._current_player_index += 1
-        if self.is_game_over:
+    def _show_move(self, turn: int):
+        """Update the fields the move changed, `turn` being the seat of the player who moved"""
+        engine = self.engine
+        self._embed.set_field_at(turn, **self._create_player_embed_field(engine.players[turn], turn == engine.turn))
+        if engine.is_over:
             self._update_embed_for_game_complete()
             self.stop()
             self.clear_items()
-            return
-        
-        # The game continues
-        self._update_results(mark_player=True)
-        self._embed.description = f"{self.current_player}'s turn"
-
-    def _update_results(self, mark_player=True):
-        field = self._create_player_embed_field(self.current_player, mark_player)
-        self._embed.set_field_at(self._current_player_index, **field)
+        elif turn != engine.turn:
+            self._embed.set_field_at(engine.turn, **self._create_player_embed_field(engine.current_player, True))
+            self._embed.description = f"{engine.current_player}'s turn"
+        else:
+            self._embed.description = f'Target: **{self.target_score}**'
 
     def _create_player_embed_field(self, player: BonesPlayer, mark_player):
-        score = player.score if player.score <= self.target_score else 'BUST!'
-        name = f'{player.display_name} - Score: {score}'
+        score = 'BUST!' if player.bust else player.score
+        name = f'{player.name} - Score: {score}'
         if mark_player:
             name += f' {self._player_marker}'
-        value = self._visualise_results(player.rolls)
+        value = self._visualise_results(self.engine.dice(player))
         inline = False
         return {'name': name, 'value': value, 'inline': inline}
 
-    def _visualise_results(self, rolls: list[tuple[int, int]]) -> str:
+    def _visualise_results(self, rolls: Iterable[tuple[int, int]]) -> str:
         results = []
         for die, roll in rolls:
             die_name = f'd{die}'
             emoji = self.bot.get_cached_emoji(die_name)
             result = f'{emoji if emoji else (die_name)}{roll}'
-            results.append(result)
+            results.append((result, 1))
         #
-        return ' '.join(results)
+        return join_parts(results, EMBED_FIELD_LIMIT, separator=' ', opening='', closing='')[0]
 
     def _update_embed_for_game_complete(self):
         self._embed.set_footer(text="Game Over")
-        scores_not_bust = [p.score for p in self.players if p.score <= self.target_score]
-        if scores_not_bust:
-            max_score = max(scores_not_bust)
-            winners = [player for player in self.players if player.score == max_score]
-            if len(winners) == 1:
-                self._embed.description = f'{winners[0]} is the winner!'
-            else:
-                self._embed.description = f'{" and ".join(winners)} tied!'
+        winners = self.engine.winners
+        if len(winners) == 1:
+            self._embed.description = f'{winners[0]} is the winner!'
+        elif winners:
+            self._embed.description = f'{" and ".join(map(str, winners))} tied!'
         else:
             self._embed.description = f'Skill issue - No one won'
 
-    def _incriment_target(self):
-         self.target_score += 1
-         self._embed.description = f'Target: **{self.target_score}**'
-
     async def on_timeout(self):
         """Remove the view from the message."""
         logger.debug("Game timed out.")
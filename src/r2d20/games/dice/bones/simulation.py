@@ -0,0 +1,311 @@
+import abc
+import concurrent.futures
+import dataclasses
+import multiprocessing
+from typing import Iterable, Iterator, Sequence
+
+from .rules import BonesRules, rulesets
+from .strategy import BonesStrategy, strategy_key
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+__all__ = ['OptimalStrategy', 'RandomStrategy', 'SimulationResult', 'SimulationStrategy', 'ThresholdStrategy',
+           'parse_strategy', 'simulate', 'tournament']
+
+# Games simulated together, unless given
+BATCH_SIZE = 100_000
+
+# Policies of the optimal strategy solved in this process, by `strategy_key`
+_policies: dict[str, tuple['np.ndarray', int]] = {}
+
+
+class SimulationStrategy(abc.ABC):
+    """Decides, for a batch of games at once, which players roll again"""
+    name: str = None
+
+    def __init__(self, rules: BonesRules, players: int):
+        self.rules = rules
+        self.players = players
+
+    def __str__(self):
+        return self.name
+
+    @abc.abstractmethod
+    def rolls(self, scores: 'np.ndarray', best: 'np.ndarray', after: int, targets: 'np.ndarray',
+              rng: 'np.random.Generator') -> 'np.ndarray':
+        """Whether each player rolls again
+
+        Args:
+            scores (np.ndarray): Each player's score, all below their game's target
+            best (np.ndarray): Best score so far that didn't bust in each game, 0 if there isn't one
+            after (int): Players still to take their turns after this player
+            targets (np.ndarray): Each game's target score
+            rng (np.random.Generator): For strategies that choose at random
+        """
+
+
+class ThresholdStrategy(SimulationStrategy):
+    def __init__(self, rules: BonesRules, players: int, margin: str = '4'):
+        """Rolls until the score is within `margin` of the target"""
+        super().__init__(rules, players)
+        self.margin = int(margin)
+        self.name = f'threshold:{self.margin}'
+
+    def rolls(self, scores, best, after, targets, rng):
+        return scores < targets - self.margin
+
+
+class RandomStrategy(SimulationStrategy):
+    def __init__(self, rules: BonesRules, players: int, chance: str = '0.5'):
+        """Rolls with a fixed chance each time"""
+        super().__init__(rules, players)
+        self.chance = float(chance)
+        self.name = f'random:{self.chance:g}'
+
+    def rolls(self, scores, best, after, targets, rng):
+        return rng.random(len(scores)) < self.chance
+
+
+class OptimalStrategy(SimulationStrategy):
+    name = 'optimal'
+
+    def __init__(self, rules: BonesRules, players: int):
+        """Plays the moves of the solved `BonesStrategy`, the same as the Hint button suggests"""
+        super().__init__(rules, players)
+        self.policy, self.base_target = _policy(rules, players)
+
+    def rolls(self, scores, best, after, targets, rng):
+        shape = self.policy.shape
+        return self.policy[min(after, shape[0] - 1), np.clip(targets - self.base_target, 0, shape[1] - 1),
+                           np.minimum(best, shape[2] - 1), np.minimum(scores, shape[3] - 1)]
+
+
+STRATEGIES: dict[str, type[SimulationStrategy]] = {
+    'threshold': ThresholdStrategy,
+    'random': RandomStrategy,
+    'optimal': OptimalStrategy,
+}
+
+
+def parse_strategy(spec: str, rules: BonesRules, players: int) -> SimulationStrategy:
+    """Build a strategy from a spec like `optimal`, `threshold:4` or `random:0.3`
+
+    Raises:
+        ValueError: Unknown strategy
+    """
+    name, *args = spec.split(':')
+    if name not in STRATEGIES:
+        raise ValueError(f"Unknown strategy {name}, expected one of {', '.join(STRATEGIES)}")
+    return STRATEGIES[name](rules, players, *args)
+
+
+@dataclasses.dataclass(slots=True)
+class SimulationResult:
+    """Totals of simulated games of one ruleset, table size and choice of strategies
+
+    Seats are numbered in turn order. In the bot the host takes the first turn.
+
+    Attributes:
+        ruleset (str): Name of the ruleset in `rulesets`.
+        players (int): Players at each table.
+        strategies (tuple[str, ...]): Strategy of each seat.
+        games (int): Games played.
+        wins (list[float]): Wins by seat, a tie split between the players tied.
+        busts (list[int]): Busts by seat.
+        ties (int): Games won by more than one player.
+        everyone_bust (int): Games no one won.
+        target_raised (int): Times the variant rules raised the target.
+        lengths (list[int]): Games by the number of dice rolled after the initial dice.
+    """
+    ruleset: str
+    players: int
+    strategies: tuple[str, ...]
+    games: int = 0
+    wins: list[float] = None
+    busts: list[int] = None
+    ties: int = 0
+    everyone_bust: int = 0
+    target_raised: int = 0
+    lengths: list[int] = dataclasses.field(default_factory=list)
+
+    def __post_init__(self):
+        self.wins = self.wins if self.wins is not None else [0.0] * self.players
+        self.busts = self.busts if self.busts is not None else [0] * self.players
+
+    def merge(self, other: 'SimulationResult'):
+        """Add another batch's totals"""
+        self.games += other.games
+        self.wins = [mine + theirs for mine, theirs in zip(self.wins, other.wins)]
+        self.busts = [mine + theirs for mine, theirs in zip(self.busts, other.busts)]
+        self.ties += other.ties
+        self.everyone_bust += other.everyone_bust
+        self.target_raised += other.target_raised
+        if len(other.lengths) > len(self.lengths):
+            self.lengths.extend([0] * (len(other.lengths) - len(self.lengths)))
+        for length, count in enumerate(other.lengths):
+            self.lengths[length] += count
+
+    def rows(self, batch: int = None) -> Iterator[dict]:
+        """The totals as rows of `metric`, `key` and `value`, e.g. for a CSV file"""
+        common = {'ruleset': self.ruleset, 'players': self.players, 'strategies': ' '.join(self.strategies),
+                  'batch': batch, 'games': self.games}
+        for seat, wins in enumerate(self.wins, start=1):
+            yield {**common, 'metric': 'wins', 'key': seat, 'value': wins}
+        for seat, busts in enumerate(self.busts, start=1):
+            yield {**common, 'metric': 'busts', 'key': seat, 'value': busts}
+        for metric in ('ties', 'everyone_bust', 'target_raised'):
+            yield {**common, 'metric': metric, 'key': None, 'value': getattr(self, metric)}
+        for length, count in enumerate(self.lengths):
+            if count:
+                yield {**common, 'metric': 'length', 'key': length, 'value': count}
+
+    def __str__(self):
+        games = self.games or 1
+        total = sum(self.lengths) or 1
+        mean_length = sum(length * count for length, count in enumerate(self.lengths)) / total
+        return '\n'.join([
+            f"{self.ruleset}, {self.players} players ({', '.join(self.strategies)}): {self.games:,} games",
+            f"  Win rate by seat:  {'  '.join(f'{wins / games:.1%}' for wins in self.wins)}",
+            f"  Bust rate by seat: {'  '.join(f'{busts / games:.1%}' for busts in self.busts)}",
+            f"  Ties:              {self.ties / games:.1%}",
+            f"  Everyone bust:     {self.everyone_bust / games:.1%}",
+            f"  Target raised:     {self.target_raised / games:.2f} times a game",
+            f"  Dice rolled:       mean {mean_length:.1f}, most {len(self.lengths) - 1}",
+        ])
+
+
+def simulate(rules: BonesRules, players: int, strategies: Sequence[SimulationStrategy], games: int,
+             rng: 'np.random.Generator', name: str = None) -> SimulationResult:
+    """Play a batch of games at once, one NumPy operation per roll of the whole batch
+
+    The rules are the engine's: every player rolls their initial dice, then
+    in seat order rolls until they stand or reach the target. A score over
+    the target busts, and under the variant rules meeting the target exactly
+    raises it by one.
+
+    Args:
+        rules (BonesRules): The ruleset
+        players (int): Players at each table
+        strategies (Sequence[SimulationStrategy]): Strategy of each seat, repeated if there are fewer
+        games (int): Games to play
+        rng (np.random.Generator): Source of the dice
+        name (str, optional): Name of the ruleset in the result
+    """
+    if np is None:
+        raise RuntimeError("Simulating games needs NumPy")
+    seats = [strategies[seat % len(strategies)] for seat in range(players)]
+    scores = np.zeros((games, players), dtype=np.int64)
+    if rules.init_dice:
+        scores += rng.integers(1, rules.init_dice_sides + 1, size=(games, players, rules.init_dice)).sum(axis=2)
+    targets = np.full(games, rules.target_score, dtype=np.int64)
+    best = np.zeros(games, dtype=np.int64)
+    bust = np.zeros((games, players), dtype=bool)
+    lengths = np.zeros(games, dtype=np.int64)
+    target_raised = 0
+    for seat, strategy in enumerate(seats):
+        after = players - seat - 1
+        playing = np.arange(games)
+        while len(playing):
+            score = scores[playing, seat]
+            below = score < targets[playing]
+            playing, score = playing[below], score[below]
+            rolling = strategy.rolls(score, best[playing], after, targets[playing], rng)
+            playing = playing[rolling]
+            scores[playing, seat] += rng.integers(1, rules.dice_sides + 1, size=len(playing))
+            lengths[playing] += 1
+        score = scores[:, seat]
+        bust[:, seat] = score > targets
+        best = np.where(bust[:, seat], best, np.maximum(best, score))
+        if rules.variant_rules:
+            raised = score == targets
+            target_raised += int(raised.sum())
+            targets = targets + raised
+    standing = np.where(bust, -1, scores)
+    high_score = standing.max(axis=1)
+    winners = (standing == high_score[:, None]) & (high_score >= 0)[:, None]
+    winner_counts = winners.sum(axis=1)
+    shares = winners / np.maximum(winner_counts, 1)[:, None]
+    return SimulationResult(
+        ruleset=name or rules.title,
+        players=players,
+        strategies=tuple(str(strategy) for strategy in seats),
+        games=games,
+        wins=shares.sum(axis=0).tolist(),
+        busts=bust.sum(axis=0).tolist(),
+        ties=int((winner_counts > 1).sum()),
+        everyone_bust=int((winner_counts == 0).sum()),
+        target_raised=target_raised,
+        lengths=np.bincount(lengths).tolist(),
+    )
+
+
+def tournament(ruleset_names: Iterable[str], player_counts: Iterable[int], strategy_specs: Sequence[str],
+               games: int, *, batch_size: int = BATCH_SIZE, workers: int = None,
+               seed: int = None) -> Iterator[tuple[int, SimulationResult]]:
+    """Simulate `games` games of every ruleset at every table size, in batches spread over a process pool
+
+    Each batch's dice come from its own stream of `seed`, so a seed gives the
+    same totals however many workers there are.
+
+    Args:
+        ruleset_names (Iterable[str]): Names of rulesets in `rulesets`
+        player_counts (Iterable[int]): Table sizes
+        strategy_specs (Sequence[str]): Strategy of each seat, see `parse_strategy`
+        games (int): Games of each ruleset at each table size
+        batch_size (int, optional): Games simulated together. Defaults to `BATCH_SIZE`.
+        workers (int, optional): Processes to use, 1 to simulate in this process. Defaults to the number of CPUs.
+        seed (int, optional): Seed of the dice. Random if omitted.
+
+    Yields:
+        tuple[int, SimulationResult]: The number of each batch with its totals, as batches finish
+    """
+    if np is None:
+        raise RuntimeError("Simulating games needs NumPy")
+    seed = seed if seed is not None else np.random.SeedSequence().entropy
+    jobs = []
+    for ruleset_name in ruleset_names:
+        for players in player_counts:
+            for start in range(0, games, batch_size):
+                jobs.append((ruleset_name, players, tuple(strategy_specs), min(batch_size, games - start),
+                             seed, len(jobs)))
+    if workers == 1:
+        for job in jobs:
+            yield job[-1], _run_batch(job)
+        return
+    # Forking a process with threads running isn't safe
+    with concurrent.futures.ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        futures = {pool.submit(_run_batch, job): job[-1] for job in jobs}
+        for future in concurrent.futures.as_completed(futures):
+            yield futures[future], future.result()
+
+
+def _run_batch(job: tuple[str, int, tuple[str, ...], int, int, int]) -> SimulationResult:
+    ruleset_name, players, strategy_specs, games, seed, batch = job
+    rules = rulesets[ruleset_name]
+    strategies = [parse_strategy(spec, rules, players) for spec in strategy_specs]
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(batch,)))
+    return simulate(rules, players, strategies, games, rng, ruleset_name)
+
+
+def _policy(rules: BonesRules, players: int) -> tuple['np.ndarray', int]:
+    """Whether the solved strategy rolls, by players after, target, best score and score. Solved once a process."""
+    key = strategy_key(rules, players)
+    if key not in _policies:
+        _policies[key] = _solve_policy(rules, players)
+    return _policies[key]
+
+
+def _solve_policy(rules: BonesRules, players: int) -> tuple['np.ndarray', int]:
+    strategy = BonesStrategy.solve(rules, players)
+    targets = range(rules.target_score, rules.target_score + (players if rules.variant_rules else 1))
+    size = targets[-1] + 1
+    policy = np.zeros((players, len(targets), size, size), dtype=bool)
+    for after in range(players):
+        for ti, target in enumerate(targets):
+            for best in range(target + 1):
+                for score in range(target):
+                    policy[after, ti, best, score] = strategy.hint(score, best, after, target).roll
+    return policy, rules.target_score
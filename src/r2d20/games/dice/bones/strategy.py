@@ -0,0 +1,234 @@
+import array
+import hashlib
+import json
+import logging
+import os
+from typing import NamedTuple
+
+from .rules import BonesRules
+
+__all__ = ['BonesStrategy', 'Hint', 'load_strategies', 'load_strategy']
+
+logger = logging.getLogger(__name__)
+
+# Bump when the model changes, so cached strategies are solved again
+SOLVER_VERSION = 1
+# Decimal places kept of each chance in the cache files
+CACHE_PRECISION = 6
+
+
+class Hint(NamedTuple):
+    """What to do next, with the chance of winning either way"""
+    roll: bool
+    stand_chance: float
+    roll_chance: float
+
+    @property
+    def chance(self) -> float:
+        return self.roll_chance if self.roll else self.stand_chance
+
+
+class BonesStrategy:
+    def __init__(self, rules: BonesRules, max_players: int, wins: array.array, rolls: array.array):
+        """The best play of a ruleset at every decision, solved by `solve` and answered by `hint` in O(1).
+
+        A decision is the player's score, the best score so far that didn't
+        bust, how many players are still to take their turns, and the target.
+        Ties count as wins, since everyone tied is a winner. The dice of the
+        players still to play are treated as not rolled yet, which keeps the
+        tables small enough to solve ahead of time.
+
+        Args:
+            rules (BonesRules): The ruleset solved
+            max_players (int): Most players at the table. Bigger tables are answered as if this big.
+            wins (array.array): Chance that the players still to play all fail to beat a score,
+                by players, target and score
+            rolls (array.array): Chance of winning by rolling, by players after the player, target,
+                best score and the player's score
+        """
+        self.rules = rules
+        self.max_players = max_players
+        self.wins = wins
+        self.rolls = rolls
+        self._targets = _targets(rules, max_players)
+        self._size = self._targets[-1] + 1
+
+    def __repr__(self):
+        return f'<BonesStrategy title={self.rules.title!r} max_players={self.max_players}>'
+
+    @classmethod
+    def solve(cls, rules: BonesRules, max_players: int = 10) -> 'BonesStrategy':
+        """Solve a ruleset by dynamic programming, from the last player to take their turn back to the first"""
+        targets = _targets(rules, max_players)
+        size = targets[-1] + 1
+        sides = rules.dice_sides
+        opening = _opening_scores(rules)
+        wins = array.array('d', bytes(8 * max_players * len(targets) * size))
+        rolls = array.array('d', bytes(8 * max_players * len(targets) * size * size))
+        # No one is left to beat the last player
+        for ti, target in enumerate(targets):
+            for best in range(target + 1):
+                wins[ti * size + best] = 1.0
+        # A player's chances depend on the chances of the players after them
+        for after in range(max_players):
+            for ti, target in enumerate(targets):
+                for best in range(target + 1):
+                    offset = ((after * len(targets) + ti) * size + best) * size
+                    stands = [_stand(wins, targets, size, rules, after, target, best, score)
+                              for score in range(target + 1)]
+                    values = [0.0] * (target + sides + 1)
+                    for score in range(target, -1, -1):
+                        if score == target:
+                            values[score] = stands[score]
+                            continue
+                        roll = sum(values[score + 1:score + sides + 1]) / sides
+                        rolls[offset + score] = roll
+                        values[score] = max(stands[score], roll)
+                    if after + 1 < max_players:
+                        # The chance the player fails to beat `best`, then the players after them do too
+                        finals, bust = _finals(opening, stands, rolls, offset, target, sides)
+                        chance = bust * wins[((after * len(targets) + ti) * size) + best]
+                        for score in range(best + 1):
+                            next_ti = _next_target(rules, targets, ti, score)
+                            chance += finals[score] * wins[(after * len(targets) + next_ti) * size + best]
+                        wins[((after + 1) * len(targets) + ti) * size + best] = chance
+        return cls(rules, max_players, wins, rolls)
+
+    def hint(self, score: int, best: int, after: int, target: int) -> Hint:
+        """The best move, and the chance of winning by standing or rolling
+
+        Args:
+            score (int): The player's score
+            best (int): The best score so far that didn't bust, 0 if there isn't one
+            after (int): Players still to take their turns after this player
+            target (int): The target score
+        """
+        if score > target:
+            return Hint(False, 0.0, 0.0)
+        ti = min(max(target - self._targets[0], 0), len(self._targets) - 1)
+        target = self._targets[ti]
+        after = min(after, self.max_players - 1)
+        best = min(best, target)
+        stand = _stand(self.wins, self._targets, self._size, self.rules, after, target, best, score)
+        if score >= target:
+            return Hint(False, stand, 0.0)
+        roll = self.rolls[((after * len(self._targets) + ti) * self._size + best) * self._size + score]
+        return Hint(roll > stand, stand, roll)
+
+    def to_json(self) -> dict:
+        return {
+            'version': SOLVER_VERSION,
+            'key': strategy_key(self.rules, self.max_players),
+            'max_players': self.max_players,
+            'wins': [round(chance, CACHE_PRECISION) for chance in self.wins],
+            'rolls': [round(chance, CACHE_PRECISION) for chance in self.rolls],
+        }
+
+    @classmethod
+    def from_json(cls, rules: BonesRules, data: dict) -> 'BonesStrategy':
+        max_players = data['max_players']
+        if data.get('key') != strategy_key(rules, max_players):
+            raise ValueError("The strategy was solved for other rules")
+        return cls(rules, max_players, array.array('d', data['wins']), array.array('d', data['rolls']))
+
+
+def strategy_key(rules: BonesRules, max_players: int) -> str:
+    """Identifies the rules a strategy depends on, so edited rulesets are solved again"""
+    fields = (SOLVER_VERSION, rules.dice_sides, rules.init_dice, rules.init_dice_sides, rules.target_score,
+              bool(rules.variant_rules), max_players)
+    return hashlib.sha256(repr(fields).encode()).hexdigest()[:16]
+
+
+def load_strategy(rules: BonesRules, max_players: int = 10, path: str = None) -> BonesStrategy:
+    """Read a ruleset's strategy from the cache directory, solving and caching it if it isn't there
+
+    Args:
+        rules (BonesRules): The ruleset
+        max_players (int, optional): Most players at the table. Defaults to 10.
+        path (str, optional): Directory of cached strategies, `None` to always solve.
+    """
+    if path is None:
+        return BonesStrategy.solve(rules, max_players)
+    filename = os.path.join(path, f'bones-{strategy_key(rules, max_players)}.json')
+    try:
+        with open(filename) as file:
+            return BonesStrategy.from_json(rules, json.load(file))
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError, KeyError):
+        logger.warning(f"Ignoring unreadable strategy cache {filename}", exc_info=True)
+    strategy = BonesStrategy.solve(rules, max_players)
+    try:
+        os.makedirs(path, exist_ok=True)
+        temp = f'{filename}.{os.getpid()}.tmp'
+        with open(temp, 'w') as file:
+            json.dump(strategy.to_json(), file, separators=(',', ':'))
+        os.replace(temp, filename)
+    except OSError:
+        logger.warning(f"Couldn't cache the strategy for {rules.title}", exc_info=True)
+    return strategy
+
+
+def load_strategies(rulesets: dict[str, BonesRules], max_players: int = 10,
+                    path: str = None) -> dict[str, BonesStrategy]:
+    """`load_strategy` for each ruleset, by name"""
+    return {name: load_strategy(rules, max_players, path) for name, rules in rulesets.items()}
+
+
+def _targets(rules: BonesRules, max_players: int) -> list[int]:
+    """The targets a game can reach, raised once per player at most by the variant rules"""
+    return list(range(rules.target_score, rules.target_score + (max_players if rules.variant_rules else 1)))
+
+
+def _next_target(rules: BonesRules, targets: list[int], ti: int, score: int) -> int:
+    """Index of the target after a player stands on `score`"""
+    if rules.variant_rules and score == targets[ti]:
+        return min(ti + 1, len(targets) - 1)
+    return ti
+
+
+def _stand(wins: array.array, targets: list[int], size: int, rules: BonesRules,
+           after: int, target: int, best: int, score: int) -> float:
+    """Chance of winning by standing on `score`"""
+    if score < best:
+        return 0.0
+    ti = _next_target(rules, targets, target - targets[0], score)
+    return wins[(after * len(targets) + ti) * size + score]
+
+
+def _opening_scores(rules: BonesRules) -> dict[int, float]:
+    """Chance of each total of the initial dice"""
+    scores = {0: 1.0}
+    for _ in range(rules.init_dice):
+        rolled: dict[int, float] = {}
+        for total, chance in scores.items():
+            for face in range(1, rules.init_dice_sides + 1):
+                rolled[total + face] = rolled.get(total + face, 0.0) + chance / rules.init_dice_sides
+        scores = rolled
+    return scores
+
+
+def _finals(opening: dict[int, float], stands: list[float], rolls: array.array, offset: int,
+            target: int, sides: int) -> tuple[list[float], float]:
+    """Chance of a player finishing on each score, and of busting, playing their best from their initial dice"""
+    chances = [0.0] * (target + 1)
+    bust = 0.0
+    for score, chance in opening.items():
+        if score > target:
+            bust += chance
+        else:
+            chances[score] += chance
+    finals = [0.0] * (target + 1)
+    for score in range(target + 1):
+        chance = chances[score]
+        if not chance:
+            continue
+        if score == target or rolls[offset + score] <= stands[score]:
+            finals[score] += chance
+            continue
+        for face in range(1, sides + 1):
+            if score + face > target:
+                bust += chance / sides
+            else:
+                chances[score + face] += chance / sides
+    return finals, bust
@@ -1,14 +1,26 @@
 import logging
 import discord
 
+from r2d20.games.registry import SessionView
+from r2d20.utils.dice import EMBED_FIELD_LIMIT, join_parts
+from r2d20.utils.metrics import timed_callback
+
+__all__ = ['LobbyView']
+
 logger = logging.getLogger(__name__)
 
+# Members listed on each page of a lobby's roster
+ROSTER_PAGE_SIZE = 20
 
-class LobbyView(discord.ui.View):
+
+class LobbyView(SessionView):
     def __init__(self, interaction: discord.Interaction, *,
                  lobby_title: str = None, lobby_description: str = 'Join the game!', max_players: int = 10, **kwargs):
         """A Lobby for gathing players. The embed is updated by the view automatically.
 
+        Members are kept by id, so joining and leaving don't depend on the size of the lobby,
+        and the embed lists one page of them in a single field, with buttons to turn the page.
+
         Examples:
             Initialise this class and respond to the interaction with the embed property.
             ```python
@@ -17,6 +29,14 @@ class LobbyView(discord.ui.View):
             await lobby.wait()
             ```
 
+            Or open it in a `GameRegistry`, which replaces the lobby with the game
+            when it's started, and times it out, without waiting on the lobby.
+            ```python
+            lobby = LobbyView(interaction, timeout=None)
+            registry.open(interaction, 'game', lobby, lambda lobby: GameView(lobby, timeout=None))
+            await interaction.response.send_message(embed=lobby.embed, view=lobby)
+            ```
+
         Args:
             interaction (discord.Interaction): The interaction that initiated the lobby.
             lobby_title (str, optional): The title of the lobby, defaults to the user's display name.
@@ -27,7 +47,9 @@ class LobbyView(discord.ui.View):
         Attributes:
             interaction (discord.Interaction): The interaction that initiated the lobby.
             embed (discord.Embed): The embed for the lobby.
-            members (list[discord.Member]): A list of members, initially containing the user who initiated the interaction.
+            host (discord.Member | discord.User): The user who initiated the interaction, always the first member.
+            members (list[discord.Member]): The members in the order they joined, initially only the host.
+            page (int): The page of the roster shown, `ROSTER_PAGE_SIZE` members to a page.
             title (str): The title of the lobby.
             description (str): The description for the lobby.
             max_players (int): The maximum number of players allowed in the lobby.
@@ -41,63 +63,127 @@ class LobbyView(discord.ui.View):
         #
         self.description = str(lobby_description)
         self.max_players = int(max_players)
-        self.members: list[discord.Member | discord.User] = [interaction.user]
+        self.host: discord.Member | discord.User = interaction.user
+        self.page = 0
         self.final_interaction: discord.Interaction = None
         self._embed_color = discord.Color.random()
+        # Members by id, in the order they joined
+        self._members: dict[int, discord.Member | discord.User] = {self.host.id: self.host}
+        # The members as a list for slicing pages, rebuilt after someone leaves
+        self._order: list[discord.Member | discord.User] | None = [self.host]
+        # Rendered roster pages, dropped when their members change
+        self._pages: dict[int, str] = {}
+        self.remove_item(self.previous_page)
+        self.remove_item(self.next_page)
+
+    @property
+    def members(self) -> list[discord.Member | discord.User]:
+        """The members in the order they joined, the host first"""
+        return list(self._roster())
+
+    @property
+    def page_count(self) -> int:
+        return max(1, -(-len(self._members) // ROSTER_PAGE_SIZE))
+
+    def is_member(self, user: discord.abc.Snowflake) -> bool:
+        return user.id in self._members
 
     @property
     def embed(self) -> discord.Embed:
         embed = discord.Embed(title=self.title,
                               description=self.description, color=self._embed_color)
-        if self.members:
-            embed.set_author(name=self.members[0].display_name,
-                             icon_url=self.members[0].display_avatar.url)
-        for i, member in enumerate(self.members, start=1):
-            embed.add_field(
-                name=f'Player {i}', value=member.display_name, inline=False)
+        embed.set_author(name=self.host.display_name, icon_url=self.host.display_avatar.url)
+        embed.add_field(name=f'Players ({len(self._members)}/{self.max_players})',
+                        value=self._roster_page(self.page), inline=False)
+        if self.page_count > 1:
+            embed.set_footer(text=f'Page {self.page + 1}/{self.page_count}')
         return embed
 
     @discord.ui.button(label='Join', style=discord.ButtonStyle.green)
+    @timed_callback('lobby')
     async def join(self, interaction: discord.Interaction, button: discord.ui.Button):
         """Add the player to the game."""
-        if interaction.user in self.members:
+        # Only the members change under the lock, the response is sent after releasing it
+        refusal = None
+        async with self.lock:
+            if interaction.user.id in self._members:
+                joined = False
+            elif len(self._members) >= self.max_players:
+                joined, refusal = False, "The lobby is full."
+            else:
+                self._members[interaction.user.id] = interaction.user
+                if self._order is not None:
+                    self._order.append(interaction.user)
+                # Only the last page gains a line
+                self._pages.pop((len(self._members) - 1) // ROSTER_PAGE_SIZE, None)
+                logger.debug(f'{interaction.user} has joined the lobby.')
+                self._update_buttons()
+                joined = True
+        if joined:
+            await self.updater.update(interaction)
+        elif refusal is not None:
+            await interaction.response.send_message(refusal, ephemeral=True, delete_after=10.0)
+        else:
             await interaction.response.defer()
-            return
-
-        self.members.append(interaction.user)
-        logger.debug(f'{interaction.user} has joined the lobby.')
-        if len(self.members) >= 10:
-            self.members = self.members[:self.max_players]
-            button.disabled = True
-            button.label = 'Full'
-        await interaction.response.edit_message(embed=self.embed, view=self)
 
     @discord.ui.button(label='Leave', style=discord.ButtonStyle.red)
+    @timed_callback('lobby')
     async def leave(self, interaction: discord.Interaction, button: discord.ui.Button):
         """Remove the player from the game."""
-        if interaction.user not in self.members:
+        refusal = None
+        async with self.lock:
+            if interaction.user.id not in self._members:
+                left = False
+            elif interaction.user.id == self.host.id:
+                left, refusal = False, "You are not allowed to leave your own lobby."
+            else:
+                del self._members[interaction.user.id]
+                # Everyone after them moves up a place
+                self._order = None
+                self._pages.clear()
+                logger.debug(f'{interaction.user} has left the lobby.')
+                self._update_buttons()
+                left = True
+        if left:
+            await self.updater.update(interaction)
+        elif refusal is not None:
+            await interaction.response.send_message(refusal, ephemeral=True, delete_after=10.0)
+        else:
             await interaction.response.defer()
-            return
-        elif interaction.user == self.members[0]:
-            await interaction.response.send_message("You are not allowed to leave your own lobby.", ephemeral=True,
-                                                    delete_after=10.0)
-            return
-
-        self.members.remove(interaction.user)
-        logger.debug(f'{interaction.user} has left the lobby.')
-        await interaction.response.edit_message(embed=self.embed, view=self)
 
     @discord.ui.button(label='Start', style=discord.ButtonStyle.blurple)
+    @timed_callback('lobby')
     async def start(self, interaction: discord.Interaction, button: discord.ui.Button):
         """Start the game."""
-        if [interaction.user] != self.members[:1]:
+        if interaction.user.id != self.host.id:
             await interaction.response.send_message("Only Player 1 can start the game.", ephemeral=True,
                                                     delete_after=10.0)
             return
+        async with self.lock:
+            self.stop()
+            self.clear_items()
+        if self.session is not None:
+            await self.session.start_game(interaction)
+        else:
+            await self.updater.update(interaction, final=True)
 
-        self.stop()
-        self.clear_items()
-        await interaction.response.edit_message(embed=self.embed, view=self)
+    @discord.ui.button(label='◀', style=discord.ButtonStyle.grey, row=1)
+    @timed_callback('lobby')
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        """Show the previous page of the roster."""
+        async with self.lock:
+            self.page = max(0, self.page - 1)
+            self._update_buttons()
+        await self.updater.update(interaction)
+
+    @discord.ui.button(label='▶', style=discord.ButtonStyle.grey, row=1)
+    @timed_callback('lobby')
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        """Show the next page of the roster."""
+        async with self.lock:
+            self.page = min(self.page_count - 1, self.page + 1)
+            self._update_buttons()
+        await self.updater.update(interaction)
 
     async def on_timeout(self):
         """Remove the view from the message."""
@@ -107,3 +193,33 @@ class LobbyView(discord.ui.View):
         embed = self.embed
         embed.set_footer(text="Lobby timed out.")
         await self.interaction.edit_original_response(embed=embed, view=None)
+
+    def _roster(self) -> list[discord.Member | discord.User]:
+        if self._order is None:
+            self._order = list(self._members.values())
+        return self._order
+
+    def _roster_page(self, page: int) -> str:
+        """One page of the roster, one line per member, rendered once until its members change"""
+        if (text := self._pages.get(page)) is None:
+            start = page * ROSTER_PAGE_SIZE
+            members = self._roster()[start:start + ROSTER_PAGE_SIZE]
+            lines = ((f'`{i}.` {member.display_name}', 1) for i, member in enumerate(members, start=start + 1))
+            text = self._pages[page] = join_parts(lines, EMBED_FIELD_LIMIT, separator='\n', opening='', closing='')[0]
+        return text
+
+    def _update_buttons(self):
+        """Match the buttons to the lobby after a change, keeping the shown page in range"""
+        full = len(self._members) >= self.max_players
+        self.join.disabled = full
+        self.join.label = 'Full' if full else 'Join'
+        self.page = min(self.page, self.page_count - 1)
+        if self.page_count > 1:
+            for button in (self.previous_page, self.next_page):
+                if button not in self.children:
+                    self.add_item(button)
+            self.previous_page.disabled = self.page == 0
+            self.next_page.disabled = self.page == self.page_count - 1
+        else:
+            self.remove_item(self.previous_page)
+            self.remove_item(self.next_page)
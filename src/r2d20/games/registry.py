@@ -0,0 +1,315 @@
+import asyncio
+import collections
+import enum
+import heapq
+import itertools
+import logging
+import time
+from typing import Callable
+
+import discord
+
+from r2d20.utils.metrics import Metrics
+from .updates import UPDATE_WINDOW, MessageUpdater
+
+__all__ = ['GameLimitException', 'GameRegistry', 'GameSession', 'SessionState', 'SessionView']
+
+logger = logging.getLogger(__name__)
+
+
+class GameLimitException(Exception):
+    """Too many games are already open"""
+
+
+class SessionState(enum.Enum):
+    LOBBY = 'lobby'
+    PLAYING = 'playing'
+    FINISHED = 'finished'
+    TIMED_OUT = 'timed_out'
+    FAILED = 'failed'
+
+
+class SessionView(discord.ui.View):
+    session: 'GameSession' = None
+
+    def __init__(self, *, update_window: float = UPDATE_WINDOW, **kwargs):
+        """A view whose lifetime can be managed by a `GameRegistry` session instead of its own timeout task.
+        Every click pushes back the session's deadline, and stopping the view tells the session.
+
+        Args:
+            update_window (float, optional): Least seconds between edits of the view's message.
+                Defaults to `UPDATE_WINDOW`.
+            kwargs (dict): Additional keyword arguments sent to discord.ui.View
+
+        Attributes:
+            lock (asyncio.Lock): Held while a click changes the view's state, so clicks apply one at a time
+            updater (MessageUpdater): Coalesces the edits showing the view's state
+        """
+        super().__init__(**kwargs)
+        self.lock = asyncio.Lock()
+        self.updater = MessageUpdater(self.render, update_window)
+
+    def render(self) -> dict:
+        """The message showing the current state"""
+        return {'embed': self.embed, 'view': None if self.is_finished() else self}
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if self.session is not None:
+            self.session.touch()
+        return True
+
+    def stop(self):
+        super().stop()
+        self.updater.cancel()
+        if self.session is not None:
+            self.session.view_stopped(self)
+
+
+class GameSession:
+    __slots__ = ('registry', 'id', 'name', 'guild_id', 'host', 'interaction', 'state', 'view', 'create_game',
+                 'created_at', 'deadline')
+
+    def __init__(self, registry: 'GameRegistry', session_id: int, name: str, interaction: discord.Interaction,
+                 lobby: SessionView, create_game: Callable[[SessionView], SessionView]):
+        """A game from its lobby opening to the game finishing. Created by `GameRegistry.open`.
+
+        Attributes:
+            id (int): Unique id of the session
+            name (str): The game being played, e.g. the ruleset
+            guild_id (int | None): Guild the game is played in
+            host (discord.Member | discord.User): Who opened the lobby
+            interaction (discord.Interaction): The command that opened the lobby
+            state (SessionState): How far the game has got
+            view (SessionView): The lobby, then the game
+            deadline (float): `time.monotonic()` when the session times out without more clicks
+        """
+        self.registry = registry
+        self.id = session_id
+        self.name = name
+        self.guild_id = interaction.guild_id
+        self.host = interaction.user
+        self.interaction = interaction
+        self.state = SessionState.LOBBY
+        self.view = lobby
+        self.create_game = create_game
+        self.created_at = time.monotonic()
+        self.deadline = 0.0
+        lobby.session = self
+        lobby.updater.window = registry.update_window
+        self.touch()
+
+    def __repr__(self):
+        return f'<GameSession id={self.id} name={self.name} guild={self.guild_id} state={self.state.value}>'
+
+    @property
+    def is_open(self) -> bool:
+        return self.state in (SessionState.LOBBY, SessionState.PLAYING)
+
+    def touch(self):
+        """Push back the deadline after some activity, rescheduling the session if that brings it forward"""
+        timeout = self.registry.lobby_timeout if self.state is SessionState.LOBBY else self.registry.game_timeout
+        deadline = time.monotonic() + timeout
+        # Later deadlines are picked up when the old entry comes due, but an earlier one needs its own entry
+        sooner = deadline < self.deadline
+        self.deadline = deadline
+        if sooner and self.is_open:
+            self.registry._schedule(self)
+
+    async def start_game(self, interaction: discord.Interaction):
+        """Replace the lobby with the game, in the response to the interaction that started it"""
+        if self.state is not SessionState.LOBBY:
+            return
+        try:
+            game = self.create_game(self.view)
+        except Exception:
+            self.registry.close(self, SessionState.FAILED)
+            raise
+        game.session = self
+        game.updater.window = self.registry.update_window
+        self.view = game
+        self.state = SessionState.PLAYING
+        self.touch()
+        self.registry.started(self)
+        await interaction.response.edit_message(embed=game.embed, view=game)
+
+    def view_stopped(self, view: SessionView):
+        """The game stopped itself, so it's over"""
+        if view is self.view and self.state is SessionState.PLAYING:
+            self.registry.close(self, SessionState.FINISHED)
+
+
+class GameRegistry:
+    def __init__(self, max_games: int = 1000, max_games_per_guild: int = 20, lobby_timeout: float = 180.0,
+                 game_timeout: float = 180.0, update_window: float = UPDATE_WINDOW, *, metrics: Metrics = None):
+        """Tracks every open lobby and game, enforcing limits on how many are open and timing them out.
+
+        Sessions don't hold a task or a command callback while they wait.
+        Clicks drive them from lobby to game to finished, and one sweeper
+        task times out every session that has gone quiet, in deadline
+        order, using a heap it only tidies when entries come due.
+
+        Args:
+            max_games (int, optional): Most sessions open at once. Defaults to 1000.
+            max_games_per_guild (int, optional): Most sessions open in one guild. Defaults to 20.
+            lobby_timeout (float, optional): Seconds a lobby stays open without clicks. Defaults to 180.
+            game_timeout (float, optional): Seconds a game stays open without clicks. Defaults to 180.
+            update_window (float, optional): Least seconds between edits of a lobby or game's message.
+                Defaults to `UPDATE_WINDOW`.
+            metrics (Metrics, optional): Record open sessions in `r2d20_games_open`, and closed ones
+                in `r2d20_games_closed_total`.
+
+        Attributes:
+            closed (dict[SessionState, int]): Sessions closed, by how they ended
+        """
+        self.max_games = max_games
+        self.max_games_per_guild = max_games_per_guild
+        self.lobby_timeout = lobby_timeout
+        self.game_timeout = game_timeout
+        self.update_window = update_window
+        self.metrics = metrics
+        self.closed = {state: 0 for state in SessionState if state not in (SessionState.LOBBY, SessionState.PLAYING)}
+        self._sessions: dict[int, GameSession] = {}
+        self._open: collections.Counter[tuple[str, SessionState]] = collections.Counter()
+        self._by_guild: dict[int | None, dict[int, GameSession]] = {}
+        self._deadlines: list[tuple[float, int]] = []
+        self._ids = itertools.count(1)
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task = None
+
+    def __repr__(self):
+        return f'<GameRegistry open={len(self._sessions)} guilds={len(self._by_guild)}>'
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def open(self, interaction: discord.Interaction, name: str, lobby: SessionView,
+             create_game: Callable[[SessionView], SessionView]) -> GameSession:
+        """Register a new lobby. Create its views with `timeout=None`; the registry times them out.
+
+        Args:
+            interaction (discord.Interaction): The command opening the lobby
+            name (str): The game being played
+            lobby (SessionView): The lobby's view
+            create_game (Callable[[SessionView], SessionView]): Builds the game's view from the lobby's
+                once the lobby is started
+
+        Returns:
+            GameSession: The new session
+
+        Raises:
+            GameLimitException: Too many sessions are open, in the guild or in total
+        """
+        guild_sessions = self._by_guild.get(interaction.guild_id, {})
+        if len(guild_sessions) >= self.max_games_per_guild:
+            raise GameLimitException(f"There are already {len(guild_sessions)} games going here, "
+                                     "try again when one has finished")
+        if len(self._sessions) >= self.max_games:
+            raise GameLimitException("Too many games are going right now, try again in a bit")
+        session = GameSession(self, next(self._ids), name, interaction, lobby, create_game)
+        self._sessions[session.id] = session
+        self._by_guild.setdefault(session.guild_id, {})[session.id] = session
+        self._schedule(session)
+        self._count(session, 1)
+        logger.debug(f"Opened {session}")
+        return session
+
+    def started(self, session: GameSession):
+        """A session's lobby became a game"""
+        self._count(session, 1)
+        self._count(session, -1, SessionState.LOBBY)
+
+    def close(self, session: GameSession, state: SessionState):
+        """Forget a session, recording how it ended"""
+        if not session.is_open:
+            return
+        self._count(session, -1)
+        session.state = state
+        del self._sessions[session.id]
+        guild_sessions = self._by_guild[session.guild_id]
+        del guild_sessions[session.id]
+        if not guild_sessions:
+            del self._by_guild[session.guild_id]
+        self.closed[state] += 1
+        if self.metrics is not None:
+            self.metrics.increment('r2d20_games_closed_total', game=session.name, state=state.value)
+        logger.debug(f"Closed {session}")
+
+    def get(self, session_id: int) -> GameSession | None:
+        return self._sessions.get(session_id)
+
+    def sessions(self, guild_id: int = None) -> list[GameSession]:
+        """The open sessions, in the guild if given, oldest first"""
+        if guild_id is None:
+            return list(self._sessions.values())
+        return list(self._by_guild.get(guild_id, {}).values())
+
+    def count(self, guild_id: int = None) -> int:
+        """Open sessions, in the guild if given"""
+        if guild_id is None:
+            return len(self._sessions)
+        return len(self._by_guild.get(guild_id, {}))
+
+    def stats(self) -> dict[str, int]:
+        """Open sessions in each state, guilds with sessions, and closed sessions by how they ended"""
+        counts = {state.value: 0 for state in (SessionState.LOBBY, SessionState.PLAYING)}
+        for (_, state), count in self._open.items():
+            counts[state.value] += count
+        return {**counts, 'guilds': len(self._by_guild), **{state.value: n for state, n in self.closed.items()}}
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._sweep(), name='game-registry')
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _schedule(self, session: GameSession):
+        was_next = self._deadlines[0][0] if self._deadlines else None
+        heapq.heappush(self._deadlines, (session.deadline, session.id))
+        if was_next is None or session.deadline < was_next:
+            self._wakeup.set()
+
+    async def _sweep(self):
+        while True:
+            self._wakeup.clear()
+            delay = self._deadlines[0][0] - time.monotonic() if self._deadlines else None
+            if delay is None or delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            expired = []
+            now = time.monotonic()
+            while self._deadlines and self._deadlines[0][0] <= now:
+                _, session_id = heapq.heappop(self._deadlines)
+                session = self._sessions.get(session_id)
+                if session is None:
+                    continue
+                if session.deadline > now:
+                    # Clicked since it was scheduled
+                    heapq.heappush(self._deadlines, (session.deadline, session.id))
+                    continue
+                self.close(session, SessionState.TIMED_OUT)
+                expired.append(session)
+            if expired:
+                await asyncio.gather(*(self._time_out(session) for session in expired))
+
+    async def _time_out(self, session: GameSession):
+        logger.debug(f"Timed out {session}")
+        try:
+            await session.view.on_timeout()
+        except Exception:
+            logger.exception(f"Error timing out {session}")
+
+    def _count(self, session: GameSession, change: int, state: SessionState = None):
+        key = (session.name, state or session.state)
+        self._open[key] += change
+        if self.metrics is not None:
+            self.metrics.set_gauge('r2d20_games_open', self._open[key], game=key[0], state=key[1].value)
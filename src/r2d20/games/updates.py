@@ -0,0 +1,87 @@
+import asyncio
+import logging
+from typing import Any, Callable
+
+import discord
+
+__all__ = ['MessageUpdater']
+
+logger = logging.getLogger(__name__)
+
+# Default seconds between edits of one message
+UPDATE_WINDOW = 1.0
+
+
+class MessageUpdater:
+    def __init__(self, render: Callable[[], dict[str, Any]], window: float = UPDATE_WINDOW):
+        """Coalesces the edits of a view's message, so a burst of clicks costs one or two edits.
+
+        The first click after a quiet spell edits the message straight away
+        and opens a window of `window` seconds. Clicks during the window are
+        acknowledged without an edit, and when it closes the message is
+        edited once, through the latest click, with the state at that time.
+        The window stays open while clicks keep coming.
+
+        Args:
+            render (Callable[[], dict[str, Any]]): The keyword arguments of the edit showing the
+                current state, e.g. `{'embed': embed, 'view': view}`
+            window (float, optional): Least seconds between edits. Defaults to `UPDATE_WINDOW`.
+
+        Attributes:
+            edits (int): Edits sent
+            coalesced (int): Clicks acknowledged without an edit of their own
+        """
+        self.render = render
+        self.window = window
+        self.edits = 0
+        self.coalesced = 0
+        self._pending: discord.Interaction = None
+        self._task: asyncio.Task = None
+
+    def __repr__(self):
+        return f'<MessageUpdater window={self.window} edits={self.edits} coalesced={self.coalesced}>'
+
+    @property
+    def pending(self) -> bool:
+        """A change is waiting for the window to close"""
+        return self._pending is not None
+
+    async def update(self, interaction: discord.Interaction, *, final: bool = False):
+        """Acknowledge a click that changed the state, showing the change now or when the window closes
+
+        Args:
+            interaction (discord.Interaction): The click
+            final (bool, optional): The last change, e.g. the game ended, so edit straight away
+                and close the window. Defaults to False.
+        """
+        if final:
+            self.cancel()
+        elif self._task is not None:
+            self._pending = interaction
+            self.coalesced += 1
+            await interaction.response.defer()
+            return
+        else:
+            self._task = asyncio.create_task(self._run_window(), name='message-updater')
+        self.edits += 1
+        await interaction.response.edit_message(**self.render())
+
+    def cancel(self):
+        """Close the window, dropping any change waiting for it, e.g. when the view is replaced"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._pending = None
+
+    async def _run_window(self):
+        while True:
+            await asyncio.sleep(self.window)
+            interaction, self._pending = self._pending, None
+            if interaction is None:
+                self._task = None
+                return
+            self.edits += 1
+            try:
+                await interaction.edit_original_response(**self.render())
+            except discord.HTTPException:
+                logger.exception("Failed to edit message")
@@ -0,0 +1,2 @@
+from .fakes import *
+from .strict import *
@@ -0,0 +1,197 @@
+import asyncio
+import datetime
+import itertools
+import time
+
+import discord
+
+from r2d20.utils.dice import DiceBuffers, RollStreams
+from r2d20.utils.metrics import Metrics
+from r2d20.utils.offload import Offloader
+from r2d20.utils.responses import Responder
+
+__all__ = [
+    'FakeBot',
+    'FakeCommand',
+    'FakeEmoji',
+    'FakeFollowup',
+    'FakeInteraction',
+    'FakeMember',
+    'FakeResponse',
+    'click',
+]
+
+_ids = itertools.count(1)
+# Application emojis of the fake bot
+EMOJI_NAMES = ('d4', 'd6', 'd8', 'd10', 'd12', 'd20', 'rip')
+
+
+class FakeAsset:
+    def __init__(self, url: str):
+        self.url = url
+
+
+class FakeMember:
+    def __init__(self, name: str = None, member_id: int = None):
+        """Stands in for a `discord.Member` with the attributes the bot uses"""
+        self.id = member_id if member_id is not None else next(_ids)
+        self.name = self.display_name = name or f'player{self.id}'
+        self.mention = f'<@{self.id}>'
+        self.avatar = self.display_avatar = FakeAsset(f'https://cdn.invalid/avatars/{self.id}.png')
+
+    def __repr__(self):
+        return f'<FakeMember id={self.id} name={self.name!r}>'
+
+    def __str__(self):
+        return self.display_name
+
+
+class FakeEmoji:
+    def __init__(self, name: str, emoji_id: int):
+        """Stands in for an application `discord.Emoji`"""
+        self.name = name
+        self.id = emoji_id
+        self.url = f'https://cdn.invalid/emojis/{emoji_id}.png'
+
+    def __str__(self):
+        return f'<:{self.name}:{self.id}>'
+
+
+class FakeCommand:
+    def __init__(self, name: str):
+        """Stands in for the `app_commands.Command` an interaction invoked"""
+        self.name = self.qualified_name = name
+
+
+class FakeResponse:
+    def __init__(self, latency: float = 0.0):
+        """Records the calls made to an `InteractionResponse`
+
+        Args:
+            latency (float, optional): Seconds each call waits, as if sent to Discord. Defaults to 0.0.
+
+        Attributes:
+            acknowledged_at (float | None): `time.perf_counter()` when the interaction was first answered
+        """
+        self.latency = latency
+        self.calls = []
+        self.acknowledged_at: float = None
+
+    def is_done(self):
+        return bool(self.calls)
+
+    async def send_message(self, *args, **kwargs):
+        await self._call('send_message', args, kwargs)
+
+    async def defer(self, **kwargs):
+        await self._call('defer', (), kwargs)
+
+    async def edit_message(self, **kwargs):
+        await self._call('edit_message', (), kwargs)
+
+    async def _call(self, name: str, args: tuple, kwargs: dict):
+        if self.acknowledged_at is None:
+            self.acknowledged_at = time.perf_counter()
+        self.calls.append((name, args, kwargs))
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+
+class FakeFollowup:
+    def __init__(self, latency: float = 0.0):
+        """Records the messages sent to an interaction's `Webhook`"""
+        self.latency = latency
+        self.calls = []
+
+    async def send(self, *args, **kwargs):
+        self.calls.append(('send', args, kwargs))
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+
+class FakeInteraction:
+    def __init__(self, user: FakeMember = None, *, guild_id: int = None, command: str = None,
+                 age: float = 0.0, latency: float = 0.0):
+        """Stands in for a `discord.Interaction`, recording every reply
+
+        Args:
+            user (FakeMember, optional): Who interacted. A new member if omitted.
+            guild_id (int, optional): Guild of the interaction, `None` for DMs.
+            command (str, optional): Name of the invoked command.
+            age (float, optional): Seconds since Discord created the interaction. Defaults to 0.0.
+            latency (float, optional): Seconds each reply waits, as if sent to Discord. Defaults to 0.0.
+        """
+        self.id = next(_ids)
+        self.user = user if user is not None else FakeMember()
+        self.guild_id = guild_id
+        self.command = FakeCommand(command) if command is not None else None
+        self.created_at = discord.utils.utcnow() - datetime.timedelta(seconds=age)
+        self.response = FakeResponse(latency)
+        self.followup = FakeFollowup(latency)
+        self.edits = []
+
+    async def edit_original_response(self, **kwargs):
+        self.edits.append(kwargs)
+        if self.response.latency:
+            await asyncio.sleep(self.response.latency)
+
+
+class FakeBot:
+    def __init__(self, *, rng: RollStreams = None, dice_buffers: DiceBuffers = None, offloader: Offloader = None,
+                 emojis: dict[str, int] = None, latency: float = 0.0):
+        """Stands in for `R2d20` in cogs and games, without connecting to Discord
+
+        Args:
+            rng (RollStreams, optional): Roll streams. Random seeds if omitted.
+            dice_buffers (DiceBuffers, optional): Pre-drawn dice. Empty buffers if omitted.
+            offloader (Offloader, optional): Process pool for large rolls. A pool of one worker
+                if omitted, only started by the first large roll.
+            emojis (dict[str, int], optional): Application emoji ids by name. Defaults to `EMOJI_NAMES`.
+            latency (float, optional): Seconds fetching an emoji waits, as if sent to Discord. Defaults to 0.0.
+        """
+        self.rng = rng if rng is not None else RollStreams()
+        self.dice_buffers = dice_buffers if dice_buffers is not None else DiceBuffers(self.rng.backend)
+        self.offloader = offloader if offloader is not None else Offloader(max_workers=1)
+        self.responder = Responder()
+        self.metrics = Metrics()
+        self.latency = latency
+        if emojis is None:
+            emojis = {name: next(_ids) for name in EMOJI_NAMES}
+        self._emojis = {name: FakeEmoji(name, emoji_id) for name, emoji_id in emojis.items()}
+        self._emoji_cache: dict[str, FakeEmoji] = {}
+
+    async def fetch_application_emojis(self) -> list[FakeEmoji]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return list(self._emojis.values())
+
+    async def fetch_app_emoji_by_name(self, name: str) -> FakeEmoji | None:
+        if name not in self._emoji_cache and name in self._emojis:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            self._emoji_cache[name] = self._emojis[name]
+        return self._emoji_cache.get(name)
+
+    def get_cached_emoji(self, name: str) -> FakeEmoji | None:
+        return self._emoji_cache.get(name)
+
+    async def cache_emojis(self):
+        """Fill the emoji cache, as the bot does when it starts"""
+        for emoji in await self.fetch_application_emojis():
+            self._emoji_cache[emoji.name] = emoji
+
+    async def close(self):
+        self.dice_buffers.stop()
+        self.offloader.shutdown()
+
+
+async def click(view: discord.ui.View, item: discord.ui.Item, interaction: FakeInteraction) -> bool:
+    """Press a component the way discord.py does, checking the interaction first
+
+    Returns:
+        bool: Whether the view's `interaction_check` let the click through
+    """
+    if not await view.interaction_check(interaction):
+        return False
+    await item.callback(interaction)
+    return True
@@ -0,0 +1,283 @@
+import asyncio
+import collections
+import dataclasses
+import logging
+import random
+import statistics
+import time
+from typing import Awaitable, Callable, Sequence
+
+from discord import app_commands
+
+from cogs.bones import BonesCog
+from cogs.rolls import DiceRolls
+from r2d20.games.dice.bones import rulesets
+from r2d20.utils.enums import Advantage
+from r2d20.utils.responses import RESPONSE_DEADLINE
+from r2d20.utils.watchdog import LoopBlockedException, LoopWatchdog
+from .fakes import FakeBot, FakeInteraction, FakeMember, click
+
+__all__ = ['LoadHarness', 'LoadReport']
+
+logger = logging.getLogger(__name__)
+
+NOTATIONS = [
+    'd20', 'd20+5', '2d6+3', '4d6kh3', 'd20@adv+7', 'd20@dis-1', '8d6', '(d8+3)*2-d4', '3d6min4',
+    '4df', 'd100', '2d20kl1+4', '10d10dl2+2d4-1', '6x 4d6kh3', '3x d20+6', '40d6',
+]
+STATS_NOTATIONS = ['2d6+3', '4d6kh3', 'd20@adv', '3d6', '8d6+2d4']
+SIMPLE_DICE = (4, 6, 8, 10, 12, 20, 100)
+# Relative frequency of each scenario, unless given
+DEFAULT_MIX = {'roll': 10, 'simple': 10, 'stats': 2, 'newstats': 1, 'bones': 1}
+
+
+@dataclasses.dataclass(slots=True)
+class LoadReport:
+    """Outcome of a load test
+
+    Attributes:
+        interactions (int): Interactions handled.
+        errors (int): Interactions whose handler raised.
+        missed (int): Interactions acknowledged after Discord's deadline.
+        elapsed (float): Seconds the load test ran for.
+        latency_p50 (float): Median seconds from dispatch to acknowledgement.
+        latency_p99 (float): 99th percentile seconds from dispatch to acknowledgement.
+        loop_lag_p50 (float): Median seconds the event loop was late waking up.
+        loop_lag_p99 (float): 99th percentile seconds the event loop was late waking up.
+        loop_lag_max (float): Longest the event loop was blocked.
+        loop_blocked (int): Times the event loop was blocked for longer than the watchdog allows.
+        blocking_calls (str): The calls that blocked the event loop most often.
+        scenarios (dict[str, int]): Scenarios run, by name.
+    """
+    interactions: int
+    errors: int
+    missed: int
+    elapsed: float
+    latency_p50: float
+    latency_p99: float
+    loop_lag_p50: float
+    loop_lag_p99: float
+    loop_lag_max: float
+    loop_blocked: int
+    blocking_calls: str
+    scenarios: dict[str, int]
+
+    @property
+    def interactions_per_second(self) -> float:
+        return self.interactions / self.elapsed if self.elapsed else 0.0
+
+    def asdict(self) -> dict:
+        return {**dataclasses.asdict(self), 'interactions_per_second': self.interactions_per_second}
+
+    def __str__(self):
+        return '\n'.join([
+            f"Interactions:      {self.interactions:,} in {self.elapsed:.2f}s "
+            f"({self.interactions_per_second:,.1f}/s)",
+            f"Errors:            {self.errors:,}",
+            f"Missed deadline:   {self.missed:,}",
+            f"Handler latency:   p50 {self.latency_p50 * 1000:.2f}ms, p99 {self.latency_p99 * 1000:.2f}ms",
+            f"Event loop lag:    p50 {self.loop_lag_p50 * 1000:.2f}ms, p99 {self.loop_lag_p99 * 1000:.2f}ms, "
+            f"max {self.loop_lag_max * 1000:.2f}ms",
+            f"Loop blocked:      {self.loop_blocked:,}",
+            f"Scenarios:         {', '.join(f'{name} {count:,}' for name, count in self.scenarios.items())}",
+            *([f"Blocking calls:\n{self.blocking_calls}"] if self.blocking_calls else []),
+        ])
+
+
+class LoadHarness:
+    def __init__(self, bot: FakeBot = None, *, concurrency: int = 10, guilds: int = 3, users: int = 20,
+                 mix: dict[str, int] = None, latency: float = 0.0, seed: int = None,
+                 block_threshold: float = 0.1, strict: bool = False):
+        """Drives the command handlers and game views with fake interactions on one event loop
+
+        Every interaction is timed from dispatch until it's acknowledged, the
+        way Discord measures its deadline, while a `LoopWatchdog` measures
+        event loop lag and samples the calls that block it.
+
+        Args:
+            bot (FakeBot, optional): The bot the cogs run on. A new `FakeBot` if omitted.
+            concurrency (int, optional): Scenarios run at once. Defaults to 10.
+            guilds (int, optional): Guilds the interactions come from. Defaults to 3.
+            users (int, optional): Users in each guild. Defaults to 20.
+            mix (dict[str, int], optional): Relative frequency of each scenario. Defaults to `DEFAULT_MIX`.
+            latency (float, optional): Seconds each reply waits, as if sent to Discord. Defaults to 0.0.
+            seed (int, optional): Seed of the choice of scenarios, users and notations.
+            block_threshold (float, optional): Seconds the event loop may be blocked. Defaults to 0.1.
+            strict (bool, optional): Fail the run if the event loop was blocked. Defaults to False.
+
+        Raises:
+            ValueError: Unknown scenario in `mix`
+        """
+        self.bot = bot if bot is not None else FakeBot()
+        self.rolls = DiceRolls(self.bot)
+        self.bones = BonesCog(self.bot)
+        self.concurrency = concurrency
+        self.latency = latency
+        self.block_threshold = block_threshold
+        self.strict = strict
+        self.mix = dict(mix or DEFAULT_MIX)
+        self.scenarios: dict[str, Callable[[random.Random], Awaitable[None]]] = {
+            'roll': self._roll,
+            'simple': self._simple_roll,
+            'stats': self._roll_stats,
+            'newstats': self._newstats,
+            'bones': self._bones,
+        }
+        for name in self.mix:
+            if name not in self.scenarios:
+                raise ValueError(f"Unknown scenario: {name}")
+        self.random = random.Random(seed)
+        self.members = {guild_id: [FakeMember() for _ in range(users)] for guild_id in range(1, guilds + 1)}
+        self._latencies: list[float] = []
+        self._errors = 0
+        self._missed = 0
+        self._counts: collections.Counter[str] = collections.Counter()
+
+    async def run(self, interactions: int = 1000, duration: float = None) -> LoadReport:
+        """Run scenarios until `interactions` interactions were handled or `duration` seconds passed
+
+        Returns:
+            LoadReport: Throughput, latency and event loop lag
+
+        Raises:
+            LoopBlockedException: In strict mode, the event loop was blocked
+        """
+        await self.bot.cache_emojis()
+        self.bot.dice_buffers.start()
+        await self.bones.cog_load()
+        watchdog = LoopWatchdog(self.block_threshold, samples=None)
+        watchdog.start()
+        start = time.perf_counter()
+        deadline = start + duration if duration is not None else None
+
+        async def worker(index: int):
+            rng = random.Random(self.random.getrandbits(64))
+            names, weights = zip(*self.mix.items())
+            while len(self._latencies) < interactions and (deadline is None or time.perf_counter() < deadline):
+                name = rng.choices(names, weights)[0]
+                self._counts[name] += 1
+                await self.scenarios[name](rng)
+                # Interactions arrive as separate events, so let the rest of the loop run between them
+                await asyncio.sleep(0)
+
+        try:
+            await asyncio.gather(*(worker(index) for index in range(self.concurrency)))
+        finally:
+            elapsed = time.perf_counter() - start
+            watchdog.stop()
+            await self.bones.cog_unload()
+            self.bot.dice_buffers.stop()
+        report = LoadReport(
+            interactions=len(self._latencies),
+            errors=self._errors,
+            missed=self._missed,
+            elapsed=elapsed,
+            latency_p50=_percentile(self._latencies, 50),
+            latency_p99=_percentile(self._latencies, 99),
+            loop_lag_p50=_percentile(watchdog.lags, 50),
+            loop_lag_p99=_percentile(watchdog.lags, 99),
+            loop_lag_max=max(watchdog.lags, default=0.0),
+            loop_blocked=watchdog.episodes,
+            blocking_calls=watchdog.report(),
+            scenarios=dict(self._counts),
+        )
+        if self.strict and watchdog.episodes:
+            raise LoopBlockedException(f"The event loop was blocked {watchdog.episodes} time(s)\n{report}")
+        return report
+
+    async def dispatch(self, interaction: FakeInteraction, handler: Awaitable, on_error=None):
+        """Run a handler for an interaction and time it until the interaction is acknowledged
+
+        Args:
+            interaction (FakeInteraction): The interaction being handled
+            handler (Awaitable): The handler's coroutine
+            on_error (Callable[[Exception], Awaitable], optional): Error handler, e.g. a cog's
+                `cog_app_command_error`. Errors are only counted if omitted.
+        """
+        start = time.perf_counter()
+        try:
+            await handler
+        except Exception as error:
+            self._errors += 1
+            if on_error is None:
+                logger.exception(f"Error handling interaction {interaction.id}")
+            else:
+                await on_error(error)
+        acknowledged = interaction.response.acknowledged_at or time.perf_counter()
+        latency = acknowledged - start
+        self._latencies.append(latency)
+        if latency > RESPONSE_DEADLINE:
+            self._missed += 1
+
+    async def invoke(self, cog, command: app_commands.Command, interaction: FakeInteraction, **kwargs):
+        """Invoke an app command's callback, passing errors to the cog like discord.py does"""
+        async def on_error(error: Exception):
+            await cog.cog_app_command_error(interaction, app_commands.CommandInvokeError(command, error))
+        await self.dispatch(interaction, command.callback(cog, interaction, **kwargs), on_error)
+
+    def _interaction(self, rng: random.Random, user: FakeMember = None, **kwargs) -> FakeInteraction:
+        guild_id = rng.choice(list(self.members))
+        user = user if user is not None else rng.choice(self.members[guild_id])
+        return FakeInteraction(user, guild_id=guild_id, latency=self.latency, **kwargs)
+
+    async def _roll(self, rng: random.Random):
+        await self.invoke(self.rolls, self.rolls.roll, self._interaction(rng),
+                          dice_notation=rng.choice(NOTATIONS))
+
+    async def _simple_roll(self, rng: random.Random):
+        die = rng.choice(SIMPLE_DICE)
+        kwargs = {'quantity': rng.randint(1, 4), 'modifier': rng.randint(-2, 5)}
+        if die == 20:
+            kwargs['advantage'] = rng.choice(list(Advantage))
+        await self.invoke(self.rolls, getattr(self.rolls, f'd{die}'), self._interaction(rng), **kwargs)
+
+    async def _roll_stats(self, rng: random.Random):
+        await self.invoke(self.rolls, self.rolls.roll_stats, self._interaction(rng),
+                          dice_notation=rng.choice(STATS_NOTATIONS), at_least=rng.randint(5, 15))
+
+    async def _newstats(self, rng: random.Random):
+        await self.invoke(self.rolls, self.rolls.newstats, self._interaction(rng))
+
+    async def _bones(self, rng: random.Random):
+        """A whole game: the command opening the lobby, players joining, then every turn"""
+        ruleset_name = rng.choice(list(rulesets))
+        host = self._interaction(rng, command=ruleset_name)
+
+        async def on_error(error: Exception):
+            command = self.bones.app_command.get_command(ruleset_name)
+            await self.bones.cog_app_command_error(host, app_commands.CommandInvokeError(command, error))
+        await self.dispatch(host, self.bones.run_game(host), on_error)
+        if (lobby := _sent_view(host)) is None:
+            return
+        guild_members = self.members[host.guild_id]
+        for member in rng.sample(guild_members, min(len(guild_members), rng.randint(1, 4))):
+            if member is not host.user:
+                interaction = FakeInteraction(member, guild_id=host.guild_id, latency=self.latency)
+                await self.dispatch(interaction, click(lobby, lobby.join, interaction))
+        members = {member.id: member for member in lobby.members}
+        start = FakeInteraction(host.user, guild_id=host.guild_id, latency=self.latency)
+        await self.dispatch(start, click(lobby, lobby.start, start))
+        game = _sent_view(start)
+        target_score = rulesets[ruleset_name].target_score
+        stand_at = rng.randint(target_score // 2, target_score)
+        while game is not None and not game.is_game_over:
+            player = game.current_player
+            button = game.roll if player.score < stand_at else game.stand
+            interaction = FakeInteraction(members[player.id], guild_id=host.guild_id, latency=self.latency)
+            await self.dispatch(interaction, click(game, button, interaction))
+
+
+def _sent_view(interaction: FakeInteraction):
+    """The view sent in reply to an interaction, if it was answered"""
+    for _, _, kwargs in interaction.response.calls + interaction.followup.calls:
+        if kwargs.get('view') is not None:
+            return kwargs['view']
+    return None
+
+
+def _percentile(samples: Sequence[float], percent: int) -> float:
+    if not samples:
+        return 0.0
+    if len(samples) == 1:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method='inclusive')[percent - 1]
@@ -0,0 +1,31 @@
+import gc
+import unittest
+
+from r2d20.utils.watchdog import LoopWatchdog
+
+__all__ = ['StrictLoopTestCase']
+
+
+class StrictLoopTestCase(unittest.IsolatedAsyncioTestCase):
+    """An async test case failing any test that blocks its event loop for longer
+    than `loop_block_threshold` seconds, reporting the calls that blocked it.
+
+    Objects left by earlier tests are frozen out of garbage collection while
+    the test runs, so a full collection of the whole suite's heap isn't
+    counted against the test.
+    """
+    loop_block_threshold = 0.1
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        gc.collect()
+        gc.freeze()
+        self.watchdog = LoopWatchdog(self.loop_block_threshold)
+        self.watchdog.start()
+        self.addAsyncCleanup(self._check_loop)
+
+    async def _check_loop(self):
+        self.watchdog.stop()
+        gc.unfreeze()
+        if self.watchdog.episodes:
+            self.fail(f"The event loop was blocked {self.watchdog.episodes} time(s):\n{self.watchdog.report()}")
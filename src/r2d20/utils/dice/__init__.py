@@ -1 +1,4 @@
+from .rng import *
+from .buffers import *
 from .notation import *
+from .stats import *
@@ -0,0 +1,160 @@
+import asyncio
+import collections
+import logging
+
+from .rng import RollSeed, RollStream
+
+__all__ = ['COMMON_DICE', 'DiceBuffer', 'DiceBuffers']
+
+logger = logging.getLogger(__name__)
+
+# Dice sizes with a buffer of pre-drawn results
+COMMON_DICE = (4, 6, 8, 10, 12, 20, 100)
+
+
+class DiceBuffer:
+    __slots__ = ('die', 'remaining', '_blocks', '_position')
+
+    def __init__(self, die: int):
+        """Blocks of pre-drawn results of one die size, used oldest first
+
+        Args:
+            die (int): Number of sides
+
+        Attributes:
+            remaining (int): Results left in the buffer
+        """
+        self.die = die
+        self.remaining = 0
+        self._blocks: collections.deque[tuple[RollSeed, list[int]]] = collections.deque()
+        self._position = 0
+
+    def __repr__(self):
+        return f'<DiceBuffer d{self.die} remaining={self.remaining} blocks={len(self._blocks)}>'
+
+    def add(self, seed: RollSeed, results: list[int]):
+        self._blocks.append((seed, results))
+        self.remaining += len(results)
+
+    def take(self, num_dice: int) -> tuple[list[int], RollSeed] | None:
+        """The next `num_dice` results from a single block, or `None` if the buffer ran dry
+
+        Results left over at the end of a block too short for the request are skipped.
+        """
+        while self._blocks:
+            seed, results = self._blocks[0]
+            start = self._position
+            if start + num_dice <= len(results):
+                self._position += num_dice
+                self.remaining -= num_dice
+                return results[start:self._position], seed._replace(skip=start)
+            self._blocks.popleft()
+            self.remaining -= len(results) - start
+            self._position = 0
+        return None
+
+
+class DiceBuffers:
+    def __init__(self, backend: str = 'stdlib', dice: tuple[int, ...] = COMMON_DICE,
+                 block_size: int = 1024, blocks: int = 4, low_water: int = 2):
+        """Pre-drawn results for the common dice, topped up in the background.
+
+        Rolls take results from the buffers in O(1). When a buffer drops below
+        `low_water` blocks the refill task draws whole blocks to bring it back
+        to `blocks` blocks. Rolls the buffers can't serve are drawn directly.
+
+        Args:
+            backend (str, optional): Backend drawing the blocks. Rolls from streams
+                with another backend, e.g. `secrets`, are always drawn directly.
+                Defaults to 'stdlib'.
+            dice (tuple[int, ...], optional): Die sizes to buffer. Defaults to `COMMON_DICE`.
+            block_size (int, optional): Results drawn per block. Defaults to 1024.
+            blocks (int, optional): Blocks per buffer when full. Defaults to 4.
+            low_water (int, optional): Refill a buffer when it has fewer blocks than this. Defaults to 2.
+
+        Attributes:
+            hits (collections.Counter[int]): Rolls served from each buffer
+            underflows (collections.Counter[int]): Rolls drawn directly because a buffer ran dry
+            refills (collections.Counter[int]): Blocks drawn for each buffer
+        """
+        self.stream = RollStream(backend)
+        self.block_size = block_size
+        self.blocks = blocks
+        self.low_water = low_water
+        self.buffers = {die: DiceBuffer(die) for die in dice}
+        self.hits: collections.Counter[int] = collections.Counter()
+        self.underflows: collections.Counter[int] = collections.Counter()
+        self.refills: collections.Counter[int] = collections.Counter()
+        self._wanted = asyncio.Event()
+        self._task: asyncio.Task = None
+
+    def __repr__(self):
+        return f'<DiceBuffers {list(self.buffers.values())}>'
+
+    def roll(self, die: int, num_dice: int, stream: RollStream) -> tuple[list[int], RollSeed]:
+        """Roll `num_dice` dice with `die` sides, from a buffer if possible
+
+        Args:
+            die (int): Number of sides
+            num_dice (int): Number of dice
+            stream (RollStream): Stream to draw from if the buffers can't be used
+
+        Returns:
+            tuple[list[int], RollSeed]: The results, and the seed to replay them from
+        """
+        buffer = self.buffers.get(die)
+        if buffer is not None and num_dice <= self.block_size and stream.backend == self.stream.backend:
+            taken = buffer.take(num_dice)
+            if buffer.remaining < self.low_water * self.block_size:
+                self._wanted.set()
+            if taken is not None:
+                self.hits[die] += 1
+                return taken
+            self.underflows[die] += 1
+        source, seed = stream.next()
+        return source.roll(num_dice, 1, die), seed
+
+    def refill(self):
+        """Top up every buffer below its low-water mark"""
+        for buffer in self.buffers.values():
+            self._refill(buffer)
+
+    def _refill(self, buffer: DiceBuffer):
+        if buffer.remaining >= self.low_water * self.block_size:
+            return
+        while buffer.remaining <= (self.blocks - 1) * self.block_size:
+            source, seed = self.stream.next()
+            buffer.add(seed, source.roll(self.block_size, 1, buffer.die))
+            self.refills[buffer.die] += 1
+
+    def start(self):
+        """Fill the buffers and start refilling them in the background"""
+        self.refill()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name='dice-buffers')
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> dict[str, int]:
+        """Total hits, underflows and refills, and the results left in each buffer"""
+        return {
+            'hits': sum(self.hits.values()),
+            'underflows': sum(self.underflows.values()),
+            'refills': sum(self.refills.values()),
+            **{f'remaining_d{die}': buffer.remaining for die, buffer in self.buffers.items()},
+        }
+
+    async def _run(self):
+        while True:
+            await self._wanted.wait()
+            self._wanted.clear()
+            for buffer in self.buffers.values():
+                try:
+                    self._refill(buffer)
+                except Exception:
+                    logger.exception(f"Failed to refill {buffer}")
+                # Let waiting interactions run between dice
+                await asyncio.sleep(0)
@@ -1,2 +1,10 @@
 from .models import *
+from .exceptions import *
+from .lexing import *
+from .counts import *
+from .results import *
 from .parsing import *
+from .compiling import *
+from .batch import *
+from .cost import *
+from .rendering import *
@@ -0,0 +1,122 @@
+import math
+import re
+from dataclasses import dataclass
+
+from ..rng import DiceSource, RollSeed, default_stream
+from . import vectorized
+from .compiling import PlanResult, RollPlan
+from .exceptions import NotationParseException
+from .parsing import TermPlan, normalize_notation, selection
+
+__all__ = ['BatchResult', 'check_repeat', 'roll_batch', 'split_repeat', 'vectorizes']
+
+# Most times a single roll may be repeated
+MAX_REPEAT = 100_000
+# Batches of at least this many rolls are evaluated with NumPy, if it's installed
+VECTORIZE_BATCH = 32
+# Rolls of a batch shown individually
+ROWS_SHOWN = 10
+
+_REPEAT_REGEX = re.compile(r'(\d+)x(.+)')
+
+
+def split_repeat(notation: str) -> tuple[int, str]:
+    """Split a repeat count off dice notation, e.g. "6x 4d6kh3" is 6 times "4d6kh3"
+
+    Args:
+        notation (str): dice notation, optionally prefixed with a repeat count
+
+    Returns:
+        tuple[int, str]: How many times to roll, and the (normalized) notation to roll
+    """
+    notation = normalize_notation(notation)
+    match = _REPEAT_REGEX.fullmatch(notation)
+    if match is None:
+        return 1, notation
+    return int(match.group(1)), match.group(2)
+
+
+def check_repeat(times: int):
+    """Raise `NotationParseException` unless a roll may be repeated `times` times"""
+    if not 1 <= times <= MAX_REPEAT:
+        raise NotationParseException(f"Rolls can be repeated 1 to {MAX_REPEAT:,} times")
+
+
+@dataclass(slots=True)
+class BatchResult:
+    """Outcome of rolling a `RollPlan` several times
+
+    Attributes:
+        plan (RollPlan): The plan that was rolled.
+        totals (list[int | float]): The total of each roll.
+        rows (list[PlanResult]): Each roll in full. Empty for batches evaluated with NumPy.
+        seed (RollSeed): Where the dice of the whole batch came from.
+    """
+    plan: RollPlan
+    totals: list[int | float]
+    rows: list[PlanResult]
+    seed: RollSeed
+
+    @property
+    def min(self) -> int | float:
+        return min(self.totals)
+
+    @property
+    def max(self) -> int | float:
+        return max(self.totals)
+
+    @property
+    def mean(self) -> float:
+        return math.fsum(self.totals) / len(self.totals)
+
+
+def roll_batch(plan: RollPlan, times: int, seed: RollSeed = None) -> BatchResult:
+    """Roll a plan `times` times, drawing every roll's dice from one seed
+
+    Large batches are evaluated a term at a time over every roll at once.
+
+    Args:
+        plan (RollPlan): compiled notation
+        times (int): number of rolls
+        seed (RollSeed, optional): Where to draw the dice from. Defaults to the shared stream.
+
+    Raises:
+        NotationParseException: Too many or too few rolls, or dividing by zero
+
+    Returns:
+        BatchResult: The total of every roll
+    """
+    check_repeat(times)
+    if seed is None:
+        source, seed = default_stream.next()
+    else:
+        source = seed.source()
+    if vectorizes(times):
+        totals = plan.evaluate([_roll_term_batch(term, times, source) for term in plan.terms])
+        return BatchResult(plan=plan, totals=totals.tolist(), rows=[], seed=seed)
+    rows = [plan.roll_from(source, seed) for _ in range(times)]
+    return BatchResult(plan=plan, totals=[row.total for row in rows], rows=rows, seed=seed)
+
+
+def vectorizes(times: int) -> bool:
+    """Whether a batch of `times` rolls is evaluated with NumPy, rather than one roll at a time"""
+    return vectorized.available and times >= VECTORIZE_BATCH
+
+
+def _roll_term_batch(term: TermPlan, times: int, source: DiceSource) -> 'vectorized.np.ndarray':
+    """Totals of a dice term rolled `times` times, as an array"""
+    np = vectorized.np
+    num_dice, start, stop = selection(term.pd)
+    low, high = (-1, 1) if term.pd.dice_type == 'f' else (1, term.pd.dice_type)
+    raw = source.roll_array(times * num_dice, low, high).reshape(times, num_dice)
+    if start >= stop:
+        raw = raw[:, :0]
+    elif start > 0 or stop < num_dice:
+        kth = (start, stop - 1) if stop - 1 > start else start
+        raw = np.partition(raw, kth, axis=1)[:, start:stop]
+    totals = raw.sum(axis=1)
+    if term.pd.min_max == 'min':
+        totals = np.maximum(totals, term.pd.m_score)
+    elif term.pd.min_max == 'max':
+        totals = np.minimum(totals, term.pd.m_score)
+    return totals
@@ -0,0 +1,141 @@
+import functools
+import logging
+from dataclasses import dataclass
+from typing import Callable, Sequence
+
+from ..rng import DiceSource, RollSeed, default_stream
+from .models import DiceTerm, Expression, ParsedDice
+from .parsing import (DiceNotationParser, ParsedDiceRoller, TermPlan, compile_expression, compile_term, limits,
+                      normalize_notation, selection)
+
+__all__ = [
+    'PlanResult',
+    'RollPlan',
+    'clear_plan_cache',
+    'compile_notation',
+    'configure_limits',
+    'plan_cache_info',
+]
+
+logger = logging.getLogger(__name__)
+
+PLAN_CACHE_SIZE = 1024
+
+
+@dataclass(frozen=True, slots=True)
+class RollPlan:
+    """Immutable, compiled form of a dice notation.
+
+    Attributes:
+        notation (str): The normalized notation the plan was compiled from.
+        expression (Expression): The parsed expression.
+        dice_terms (tuple[DiceTerm, ...]): The dice terms of the expression, in order.
+        terms (tuple[TermPlan, ...]): One roll plan per dice term, in order.
+        evaluate (Callable[[Sequence[int]], int | float]): Computes the total from the
+            dice term totals.
+    """
+    notation: str
+    expression: Expression
+    dice_terms: tuple[DiceTerm, ...]
+    terms: tuple[TermPlan, ...]
+    evaluate: Callable[[Sequence[int]], int | float]
+
+    @property
+    def parsed(self) -> list[ParsedDice]:
+        return [term.pd for term in self.terms]
+
+    @property
+    def num_dice(self) -> int:
+        """Dice drawn by one roll of the plan, including extra dice for advantage"""
+        return sum(selection(term.pd)[0] for term in self.terms)
+
+    def roll(self, seed: RollSeed = None) -> 'PlanResult':
+        """Roll every term of the plan
+
+        Args:
+            seed (RollSeed, optional): Where to draw the dice from, e.g. reserved from a
+                `RollStream` or recorded by an earlier roll to replay it. Defaults to the
+                next roll of the shared stream.
+
+        Returns:
+            PlanResult: the rolled terms and their totals
+        """
+        if seed is None:
+            source, seed = default_stream.next()
+        else:
+            source = seed.source()
+        return self.roll_from(source, seed)
+
+    def roll_from(self, source: DiceSource, seed: RollSeed) -> 'PlanResult':
+        """Roll every term of the plan, drawing the dice from `source`"""
+        rolled = [ParsedDiceRoller(term.pd, term, source) for term in self.terms]
+        results = [roller.total for roller in rolled]
+        return PlanResult(plan=self, rolled=rolled, results=results, total=self.evaluate(results), seed=seed)
+
+
+@dataclass(slots=True)
+class PlanResult:
+    """Outcome of rolling a `RollPlan`. Mirrors the attributes of a processed
+    `DiceNotationParser`.
+    """
+    plan: RollPlan
+    rolled: list[ParsedDiceRoller]
+    results: list[int]
+    total: int | float
+    seed: RollSeed
+
+
+def compile_notation(notation: str) -> RollPlan:
+    """Parse and compile dice notation, reusing a cached plan where possible
+
+    Args:
+        notation (str): dice notation
+
+    Raises:
+        NotationParseException: Invalid dice notation, or too many dice or sides
+
+    Returns:
+        RollPlan: the compiled notation
+    """
+    return _compile_normalized(normalize_notation(notation))
+
+
+@functools.lru_cache(maxsize=PLAN_CACHE_SIZE)
+def _compile_normalized(notation: str) -> RollPlan:
+    logger.debug(f"Compiling roll plan: {notation}")
+    parser = DiceNotationParser(notation)
+    parser._parse()
+    return RollPlan(notation=notation,
+                    expression=parser.expression,
+                    dice_terms=tuple(parser.dice_terms),
+                    terms=tuple(compile_term(pd) for pd in parser.parsed),
+                    evaluate=compile_expression(parser.expression))
+
+
+def plan_cache_info() -> functools._CacheInfo:
+    """Hit/miss counters and size of the plan cache"""
+    return _compile_normalized.cache_info()
+
+
+def clear_plan_cache():
+    """Empty the plan cache and reset its counters"""
+    _compile_normalized.cache_clear()
+
+
+def configure_limits(**kwargs):
+    """Change the `RollLimits` used when compiling notation.
+
+    Cached plans were validated against the old limits, so they are dropped.
+
+    Args:
+        kwargs (dict): New values for `RollLimits` fields
+
+    Raises:
+        TypeError: Unknown limit
+    """
+    for name, value in kwargs.items():
+        if not hasattr(limits, name):
+            raise TypeError(f"Unknown roll limit: {name}")
+        setattr(limits, name, int(value))
+    logger.info(f"Roll limits: {limits}")
+    clear_plan_cache()
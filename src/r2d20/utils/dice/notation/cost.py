@@ -0,0 +1,175 @@
+import enum
+import logging
+import math
+from dataclasses import dataclass, fields
+
+from . import batch, counts, vectorized
+from .compiling import RollPlan
+from .exceptions import NotationParseException
+from .models import BinaryOp, UnaryOp
+from .parsing import limits, postfix, selection
+from .rendering import EMBED_DESCRIPTION_LIMIT
+
+__all__ = [
+    'Admission',
+    'CostBudget',
+    'RollCost',
+    'RollCostException',
+    'admit',
+    'budget_for',
+    'configure_budget',
+    'estimate_cost',
+]
+
+logger = logging.getLogger(__name__)
+
+# Characters around each rendered die, e.g. `**6**, `
+DIE_DECORATION = 6
+# Characters around each face of a face count histogram, e.g. `**6**×, ` twice
+FACE_DECORATION = 16
+# Characters of a batch row showing only its total
+BATCH_ROW_WIDTH = 32
+
+
+class RollCostException(NotationParseException):
+    """The notation is over the cost budget"""
+
+
+@dataclass(frozen=True, slots=True)
+class RollCost:
+    """Static estimate of the cost of rolling a plan, worked out without rolling it.
+
+    Attributes:
+        dice (int): Dice drawn, including extra dice for advantage.
+        selection (int): Comparisons made keeping or dropping dice.
+        operations (int): Arithmetic operations in the expression.
+        output (int): Characters needed to show the results, up to the embed limit
+            past which they're summarised.
+    """
+    dice: int
+    selection: int
+    operations: int
+    output: int
+
+
+@dataclass(slots=True)
+class CostBudget:
+    """How much a roll may cost, and how much may be spent on the event loop
+
+    Attributes:
+        inline_dice (int): Rolls drawing fewer dice than this are run straight away.
+        inline_selection (int): Rolls making fewer comparisons than this are run straight away.
+        inline_stats (int): Odds estimated by `stats_cost` to take fewer steps than this are
+            worked out straight away.
+        max_dice (int): Most dice one roll may draw, over all of its terms.
+        max_selection (int): Most comparisons one roll may make keeping or dropping dice.
+        max_operations (int): Most arithmetic operations in one roll.
+    """
+    inline_dice: int = 10_000
+    inline_selection: int = 100_000
+    inline_stats: int = 10_000
+    max_dice: int = 2_000_000 if vectorized.available else 10_000
+    max_selection: int = 50_000_000 if vectorized.available else 1_000_000
+    max_operations: int = 1000
+
+
+class Admission(enum.Enum):
+    INLINE = 'inline'  # Cheap enough for the event loop
+    OFFLOAD = 'offload'  # Run in the process pool
+
+
+_default_budget = CostBudget()
+_guild_budgets: dict[int, CostBudget] = {}
+
+
+def estimate_cost(plan: RollPlan, times: int = 1) -> RollCost:
+    """Estimate the cost of rolling a plan from its terms and expression
+
+    Args:
+        plan (RollPlan): compiled notation
+        times (int, optional): Number of times the plan is rolled in a batch. Defaults to 1.
+
+    Returns:
+        RollCost: The estimated cost of rolling the plan `times` times
+    """
+    dice = comparisons = 0
+    output = len(plan.notation) + 24  # Room for " = " and the total
+    for term in plan.terms:
+        num_dice, start, stop = selection(term.pd)
+        dice += num_dice
+        faces, face_width = (3, 2) if term.pd.dice_type == 'f' else (term.pd.dice_type, len(str(term.pd.dice_type)))
+        if counts.available and num_dice >= limits.counts_threshold:
+            comparisons += faces
+            output += faces * (2 * face_width + len(str(num_dice)) + FACE_DECORATION)
+            continue
+        if start > 0 or stop < num_dice:
+            # NumPy partitions in linear time; otherwise the dice are sorted
+            linear = vectorized.available and num_dice >= limits.vectorize_threshold
+            comparisons += num_dice if linear else num_dice * max(1, math.ceil(math.log2(num_dice)))
+        output += num_dice * (face_width + DIE_DECORATION)
+    operations = sum(isinstance(node, (BinaryOp, UnaryOp)) for node in postfix(plan.expression))
+    if times > 1:
+        # Only the first rows of a batch are shown, and only their totals if it's vectorized
+        rows = min(times, batch.ROWS_SHOWN)
+        output = rows * (BATCH_ROW_WIDTH if batch.vectorizes(times) else output) + BATCH_ROW_WIDTH
+    # Results that don't fit in an embed are summarised
+    output = min(output, EMBED_DESCRIPTION_LIMIT)
+    return RollCost(dice=dice * times, selection=comparisons * times,
+                    operations=operations * times, output=output)
+
+
+def admit(cost: RollCost, budget: CostBudget) -> Admission:
+    """Decide where a roll should run, or refuse it
+
+    Args:
+        cost (RollCost): estimated cost of the roll
+        budget (CostBudget): budget to check it against
+
+    Raises:
+        RollCostException: The roll is over budget, with a message saying why
+
+    Returns:
+        Admission: Whether to run the roll on the event loop or in the process pool
+    """
+    if cost.dice > budget.max_dice:
+        raise RollCostException(f"That roll draws {cost.dice:,} dice, but at most {budget.max_dice:,} are allowed")
+    if cost.selection > budget.max_selection:
+        raise RollCostException(f"That roll keeps or drops from too many dice ({cost.selection:,} comparisons, "
+                                f"at most {budget.max_selection:,} are allowed)")
+    if cost.operations > budget.max_operations:
+        raise RollCostException(f"That roll has {cost.operations:,} operations, "
+                                f"but at most {budget.max_operations:,} are allowed")
+    if cost.dice < budget.inline_dice and cost.selection < budget.inline_selection:
+        return Admission.INLINE
+    return Admission.OFFLOAD
+
+
+def budget_for(guild_id: int | None) -> CostBudget:
+    """The budget for a guild, or the default budget for DMs and guilds without their own"""
+    return _guild_budgets.get(guild_id, _default_budget)
+
+
+def configure_budget(guild_id: int = None, **kwargs):
+    """Change the default budget, or give a guild its own budget.
+
+    A guild's budget starts from the default budget's values.
+
+    Args:
+        guild_id (int, optional): Guild to configure. Changes the default budget if omitted.
+        kwargs (dict): New values for `CostBudget` fields
+
+    Raises:
+        TypeError: Unknown budget field
+    """
+    names = {field.name for field in fields(CostBudget)}
+    for name in kwargs:
+        if name not in names:
+            raise TypeError(f"Unknown cost budget: {name}")
+    if guild_id is None:
+        budget = _default_budget
+    else:
+        budget = _guild_budgets.setdefault(
+            guild_id, CostBudget(**{name: getattr(_default_budget, name) for name in names}))
+    for name, value in kwargs.items():
+        setattr(budget, name, int(value))
+    logger.info(f"Cost budget for {guild_id or 'default'}: {budget}")
@@ -0,0 +1,61 @@
+import random
+from typing import Callable, Iterator
+
+from ..rng import DiceSource
+from . import vectorized
+
+__all__ = ['FaceCounts']
+
+# Sampling counts without NumPy needs `random.binomialvariate` (Python 3.12+)
+available = vectorized.available or hasattr(random, 'binomialvariate')
+
+
+class FaceCounts:
+    __slots__ = ('low', 'counts', '_num_dice')
+
+    def __init__(self, low: int, counts: list[int]):
+        """Dice results stored as the number of dice showing each face, so
+        memory and time depend on the number of sides rather than dice.
+
+        Args:
+            low (int): The lowest face, counted by `counts[0]`
+            counts (list[int]): Number of dice showing each face, lowest first
+        """
+        self.low = low
+        self.counts = counts
+        self._num_dice = sum(counts)
+
+    def __repr__(self):
+        return f'<FaceCounts {dict(self.faces())}>'
+
+    def __len__(self):
+        return self._num_dice
+
+    def faces(self) -> Iterator[tuple[int, int]]:
+        """Each face that was rolled with how many dice show it, lowest first"""
+        for index, count in enumerate(self.counts):
+            if count:
+                yield self.low + index, count
+
+    def total(self) -> int:
+        return sum((self.low + index) * count for index, count in enumerate(self.counts))
+
+    def select(self, start: int, stop: int) -> 'FaceCounts':
+        """The dice that would be at positions `start:stop` if the pool were sorted"""
+        selected = []
+        position = 0
+        for count in self.counts:
+            kept = max(0, min(position + count, stop) - max(position, start))
+            selected.append(kept)
+            position += count
+        return FaceCounts(self.low, selected)
+
+    def without(self, other: 'FaceCounts') -> 'FaceCounts':
+        """The dice in this pool that are not in `other`"""
+        return FaceCounts(self.low, [mine - theirs for mine, theirs in zip(self.counts, other.counts)])
+
+
+def compile_roll(num_dice: int, dice_type: int | str) -> Callable[[DiceSource], FaceCounts]:
+    """Build a function drawing the face counts of `num_dice` dice in O(sides)"""
+    low, num_faces = (-1, 3) if dice_type == 'f' else (1, dice_type)
+    return lambda source: FaceCounts(low, source.multinomial(num_dice, num_faces))
@@ -0,0 +1,23 @@
+__all__ = ['NotationParseException']
+
+
+class NotationParseException(Exception):
+    def __init__(self, *args, position: int = None):
+        super().__init__(*args)
+        self.position = position
+
+    @classmethod
+    def at(cls, notation: str, position: int, reason: str) -> 'NotationParseException':
+        """Create an exception pointing at the offending character of the notation
+
+        Args:
+            notation (str): The notation being parsed
+            position (int): Index of the offending character
+            reason (str): What was wrong
+
+        Returns:
+            NotationParseException: Exception with a message suitable for showing to users
+        """
+        message = (f"Invalid dice notation: {reason} at position {position + 1}\n"
+                   f"```\n{notation}\n{' ' * position}^\n```")
+        return cls(message, position=position)
@@ -0,0 +1,136 @@
+from typing import Any, NamedTuple
+
+from .exceptions import NotationParseException
+
+__all__ = ['Token', 'tokenize']
+
+NUMBER = 'number'
+DICE = 'dice'
+OPERATOR = 'operator'
+LPAREN = '('
+RPAREN = ')'
+
+OPERATOR_CHARS = '+-*/'
+WHITESPACE = ' \t\r\n'
+
+
+class Token(NamedTuple):
+    """A lexical token of dice notation.
+
+    Attributes:
+        kind (str): One of `NUMBER`, `DICE`, `OPERATOR`, `LPAREN` or `RPAREN`.
+        start (int): Index of the first character of the token.
+        end (int): Index after the last character of the token.
+        value (Any): `int` for numbers, the operator character for operators and
+            a dict of `ParsedDice` fields for dice. Dice also record `dice_end`,
+            the index after the dice type, where results get rendered.
+    """
+    kind: str
+    start: int
+    end: int
+    value: Any = None
+
+
+def tokenize(notation: str) -> list[Token]:
+    """Split dice notation into tokens in a single left-to-right pass.
+
+    Numbers are accumulated digit by digit, so no substrings are created.
+
+    Args:
+        notation (str): lower case dice notation
+
+    Raises:
+        NotationParseException: Invalid character or malformed dice
+
+    Returns:
+        list[Token]: The tokens in order of appearance
+    """
+    return _Scanner(notation).scan()
+
+
+class _Scanner:
+    def __init__(self, notation: str):
+        self.notation = notation
+        self.length = len(notation)
+        self.pos = 0
+
+    def scan(self) -> list[Token]:
+        tokens = []
+        notation, length = self.notation, self.length
+        while self.pos < length:
+            char = notation[self.pos]
+            start = self.pos
+            if char in WHITESPACE:
+                self.pos += 1
+            elif '0' <= char <= '9' or char == 'd':
+                number = self._number()
+                if self.pos < length and notation[self.pos] == 'd':
+                    tokens.append(self._dice(start, number))
+                else:
+                    tokens.append(Token(NUMBER, start, self.pos, number))
+            elif char in OPERATOR_CHARS:
+                self.pos += 1
+                tokens.append(Token(OPERATOR, start, self.pos, char))
+            elif char == '(' or char == ')':
+                self.pos += 1
+                tokens.append(Token(char, start, self.pos, char))
+            else:
+                self._fail(f"Unexpected character '{char}'")
+        return tokens
+
+    def _fail(self, reason: str, pos: int = None):
+        raise NotationParseException.at(self.notation, self.pos if pos is None else pos, reason)
+
+    def _peek(self, text: str) -> bool:
+        return self.notation.startswith(text, self.pos)
+
+    def _number(self) -> int | None:
+        """Consume consecutive digits, returning `None` if there are none"""
+        value = None
+        notation, length = self.notation, self.length
+        while self.pos < length and '0' <= notation[self.pos] <= '9':
+            value = (value or 0) * 10 + ord(notation[self.pos]) - 48
+            self.pos += 1
+        return value
+
+    def _required_number(self, after: str) -> int:
+        value = self._number()
+        if value is None:
+            self._fail(f"Expected a number after '{after}'")
+        return value
+
+    def _dice(self, start: int, num_dice: int | None) -> Token:
+        fields = {}
+        if num_dice is not None:
+            fields['num_dice'] = num_dice
+        self.pos += 1  # "d"
+        if self._peek('f'):
+            self.pos += 1
+            fields['dice_type'] = 'f'
+        else:
+            type_start = self.pos
+            fields['dice_type'] = self._required_number('d')
+            if fields['dice_type'] < 1:
+                self._fail("Dice need at least one side", type_start)
+        fields['dice_end'] = self.pos
+        # Keep/drop group
+        if self._peek('@'):
+            if self._peek('@adv') or self._peek('@dis'):
+                fields['advantage'] = self.notation[self.pos:self.pos + 4]
+                self.pos += 4
+            else:
+                self._fail("Expected '@adv' or '@dis'")
+        elif self._peek('k') or self._peek('d'):
+            fields['keep_drop'] = keep_drop = self.notation[self.pos]
+            self.pos += 1
+            if self._peek('h') or self._peek('l'):
+                fields['high_low'] = self.notation[self.pos]
+                self.pos += 1
+                keep_drop += fields['high_low']
+            fields['kd_num_dice'] = self._required_number(keep_drop)
+        # Min/max group
+        if self._peek('min') or self._peek('max'):
+            fields['min_max'] = self.notation[self.pos:self.pos + 3]
+            self.pos += 3
+            fields['m_score'] = self._required_number(fields['min_max'])
+        return Token(DICE, start, self.pos, fields)
@@ -1,6 +1,6 @@
 from dataclasses import dataclass
 
-__all__ = ["ParsedDice"]
+__all__ = ["BinaryOp", "Constant", "DiceTerm", "Expression", "ParsedDice", "UnaryOp"]
 
 
 @dataclass
@@ -19,3 +19,36 @@ class ParsedDice:
     min_max: str = None
     m_score: int = 0
     more: str = None
+
+
+@dataclass(frozen=True, slots=True)
+class Constant:
+    """A plain number in an expression"""
+    value: int
+
+
+@dataclass(frozen=True, slots=True)
+class DiceTerm:
+    """Dice to be rolled in an expression"""
+    dice: ParsedDice
+    index: int  # Order of the term among all dice terms of the expression
+    start: int  # Position of the term in the notation
+    dice_end: int  # Position after the dice type, where results are shown
+
+
+@dataclass(frozen=True, slots=True)
+class UnaryOp:
+    """A negated (or explicitly positive) sub-expression"""
+    op: str
+    operand: 'Expression'
+
+
+@dataclass(frozen=True, slots=True)
+class BinaryOp:
+    """Arithmetic on two sub-expressions"""
+    op: str
+    left: 'Expression'
+    right: 'Expression'
+
+
+Expression = Constant | DiceTerm | UnaryOp | BinaryOp
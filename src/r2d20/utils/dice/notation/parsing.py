@@ -1,20 +1,31 @@
 import logging
-import random
-import re
+import operator
+from dataclasses import dataclass
+from typing import Callable, Sequence
 
-import discord
-
-from . import ParsedDice
+from ..rng import DiceSource, RollSeed, RollStream, default_stream
+from . import BinaryOp, Constant, DiceTerm, Expression, ParsedDice, UnaryOp, counts, vectorized
+from .exceptions import NotationParseException
+from .lexing import DICE, LPAREN, NUMBER, OPERATOR, RPAREN, Token, tokenize
+from .results import DiceResult, select_array, select_dice, select_pool, to_array
 
 __all__ = [
     'DiceNotationParser',
     'NotationParseException',
     'ParsedDiceRoller',
-    'create_embed_from_notation'
+    'RollLimits',
+    'TermPlan',
+    'compile_expression',
+    'compile_term',
+    'normalize_notation',
+    'postfix',
+    'selection',
 ]
 
 logger = logging.getLogger()
 
+# Grammar of a single dice term. Parsing is done by `lexing.tokenize`,
+# this pattern is kept as the reference description of a term.
 NOTATION_PATTERN = r'''(?x)^
     (?P<num_dice>\d+)?          # Number of dice                (optional)
     d (?P<dice_type>\d+|f)      # "d" with dice type           (mandatory)
@@ -30,20 +41,48 @@ NOTATION_PATTERN = r'''(?x)^
     (?P<more>[*/+-])?           # Pssibly more dice
 '''
 
+MAX_NESTING = 32
+FUDGE_FACES = (-1, 0, 1)
+
+
+def _divide(dividend, divisor):
+    # Batches of rolls are evaluated over NumPy arrays
+    if (divisor == 0).any() if hasattr(divisor, 'any') else divisor == 0:
+        raise NotationParseException("Can't divide by zero")
+    return dividend / divisor
+
 
-class NotationParseException(Exception):
-    pass
+OPERATORS: dict[str, Callable] = {
+    '+': operator.add,
+    '-': operator.sub,
+    '*': operator.mul,
+    '/': _divide,
+}
+
+BINDING_POWER = {'+': 10, '-': 10, '*': 20, '/': 20}
+UNARY_BINDING_POWER = 30
+
+
+def normalize_notation(notation: str) -> str:
+    """Canonical form of a notation: lower case without whitespace"""
+    return ''.join(str(notation).split()).lower()
 
 
 class DiceNotationParser:
-    def __init__(self, notation: str):
+    def __init__(self, notation: str, stream: RollStream = None):
         """Parser of dice notation
 
         Args:
             notation (str): dice notation
+            stream (RollStream, optional): stream to roll the dice from. Defaults to the shared stream.
         """
+        self.stream = stream if stream is not None else default_stream
+        self.seed: RollSeed = None
         self.orig_notation: str = str(notation)
+        self.notation: str = normalize_notation(notation)
         self.parsed: list[ParsedDice] = []
+        self.dice_terms: list[DiceTerm] = []
+        self.expression: Expression = None
         self.rolled: list[ParsedDiceRoller] = []
         self.results: list[int] = []
         self.total: int = 0
@@ -57,94 +96,358 @@ class DiceNotationParser:
         logger.debug(f"Results: {self.results}")
 
     def _parse(self):
-        """Parse dice notation and add to parsed list
+        """Parse dice notation into an expression and add its dice to the parsed list
 
         Raises:
-            NotationException: Invalid dice notation
+            NotationParseException: Invalid dice notation
         """
-        notation = self.orig_notation.replace(' ', '').lower()
-        pos = 0
-        while pos < len(notation):
-            match = re.search(NOTATION_PATTERN, notation[pos:])
-            if match is None:
-                raise NotationParseException(
-                    f"Invalid dice notation: {self.orig_notation}")
-            groupdict = {}
-            for name, value in match.groupdict().items():
-                if value is None:
-                    continue
-                val = int(value) if re.match(r'^\d+', value) else value
-                groupdict[name] = val
-            pd = ParsedDice(match.group(0), **groupdict)
-            pos += len(match.group(0))
-            self.parsed.append(pd)
+        tokens = tokenize(self.notation)
+        dice_terms = _group_dice_terms(self.notation, tokens)
+        self.dice_terms = list(dice_terms.values())
+        self.parsed = [term.dice for term in self.dice_terms]
+        self.expression = _ExpressionParser(self.notation, tokens, dice_terms).parse()
 
     def _calculate_results(self):
         """Roll the parsed dice and append to results and set total"""
+        source, self.seed = self.stream.next()
         for parsed_dice in self.parsed:
-            roller = ParsedDiceRoller(parsed_dice)
+            roller = ParsedDiceRoller(parsed_dice, source=source)
             self.rolled.append(roller)
             self.results.append(roller.total)
-        self.total = sum(self.results)
-
-
-def create_embed_from_notation(notation: str) -> discord.Embed:
-    parser = DiceNotationParser(notation)
-    parser.process()
-    with_results = [insert_result(dice.pd.notation, dice.raw_results, dice.results)
-                    for dice in parser.rolled]
-    with_results = f'{"".join(with_results)} = {parser.total}'
-    embed = discord.Embed(title=str(parser.total), description=with_results)
-    return embed
-
-
-def insert_result(notation: str,
-                  raw_results: list[int],
-                  results: list[int]) -> str:
-    match = re.match(r'^\d*d(\d+|f)', notation)
-    results_copy = results.copy()
-    decorated = []
-    for raw in raw_results:
-        if raw in results_copy:
-            results_copy.remove(raw)
-            decorated.append(f"**{raw}**")
+        self.total = compile_expression(self.expression)(self.results)
+
+
+def _group_dice_terms(notation: str, tokens: list[Token]) -> dict[int, DiceTerm]:
+    """Create a `DiceTerm` for each dice token, keyed by token index.
+
+    The `ParsedDice` of each term describes the same portion of the notation
+    the original regex parser matched: the dice, any trailing constant
+    modifiers and the operator leading on to the next term.
+    """
+    dice_terms = {}
+    num_tokens = len(tokens)
+    for index, token in enumerate(tokens):
+        if token.kind != DICE:
+            continue
+        fields = dict(token.value)
+        dice_end = fields.pop('dice_end')
+        end = token.end
+        cursor = index + 1
+        while cursor + 1 < num_tokens and tokens[cursor].kind == OPERATOR and tokens[cursor + 1].kind == NUMBER:
+            cursor += 2
+        if cursor > index + 1:
+            fields['modifier'] = notation[end:tokens[cursor - 1].end]
+            end = tokens[cursor - 1].end
+        if cursor < num_tokens and tokens[cursor].kind == OPERATOR:
+            fields['more'] = tokens[cursor].value
+            end = tokens[cursor].end
+        parsed_dice = ParsedDice(notation[token.start:end], **fields)
+        dice_terms[index] = DiceTerm(parsed_dice, len(dice_terms), token.start, dice_end)
+    return dice_terms
+
+
+class _ExpressionParser:
+    def __init__(self, notation: str, tokens: list[Token], dice_terms: dict[int, DiceTerm]):
+        """Pratt parser building an `Expression` from tokens
+
+        Args:
+            notation (str): The tokenized notation, used for error messages
+            tokens (list[Token]): Tokens of the notation
+            dice_terms (dict[int, DiceTerm]): Dice terms keyed by token index
+        """
+        self.notation = notation
+        self.tokens = tokens
+        self.dice_terms = dice_terms
+        self.index = 0
+
+    def parse(self) -> Expression:
+        expression = self._expression(0, 0)
+        if self.index < len(self.tokens):
+            token = self.tokens[self.index]
+            self._fail(f"Unexpected '{self.notation[token.start]}'", token.start)
+        if not self.dice_terms:
+            self._fail("Expected at least one die", 0)
+        return expression
+
+    def _fail(self, reason: str, position: int):
+        raise NotationParseException.at(self.notation, position, reason)
+
+    def _expression(self, min_binding_power: int, depth: int) -> Expression:
+        left = self._prefix(depth)
+        while self.index < len(self.tokens):
+            token = self.tokens[self.index]
+            if token.kind != OPERATOR:
+                break
+            binding_power = BINDING_POWER[token.value]
+            if binding_power <= min_binding_power:
+                break
+            self.index += 1
+            left = BinaryOp(token.value, left, self._expression(binding_power, depth))
+        return left
+
+    def _prefix(self, depth: int) -> Expression:
+        if depth > MAX_NESTING:
+            self._fail("Too deeply nested", self.tokens[self.index - 1].start)
+        if self.index >= len(self.tokens):
+            self._fail("Expected dice or a number", len(self.notation))
+        token_index = self.index
+        token = self.tokens[token_index]
+        self.index += 1
+        if token.kind == NUMBER:
+            return Constant(token.value)
+        elif token.kind == DICE:
+            return self.dice_terms[token_index]
+        elif token.kind == LPAREN:
+            expression = self._expression(0, depth + 1)
+            if self.index >= len(self.tokens) or self.tokens[self.index].kind != RPAREN:
+                self._fail("Expected ')'", self._position())
+            self.index += 1
+            return expression
+        elif token.kind == OPERATOR and token.value in '+-':
+            return UnaryOp(token.value, self._expression(UNARY_BINDING_POWER, depth + 1))
         else:
-            decorated.append(f"~~{raw}~~")
+            self._fail("Expected dice or a number", token.start)
+
+    def _position(self) -> int:
+        if self.index < len(self.tokens):
+            return self.tokens[self.index].start
+        return len(self.notation)
+
+
+def compile_expression(expression: Expression) -> Callable[[Sequence[int]], int | float]:
+    """Compile an expression into a function of its dice term values.
+
+    The expression is flattened to postfix order, so evaluation is a loop
+    over a stack rather than recursion, however many terms there are.
+
+    Args:
+        expression (Expression): parsed expression
+
+    Returns:
+        Callable[[Sequence[int]], int | float]: evaluates the expression given
+            the total of each dice term, indexed by `DiceTerm.index`
+    """
+    if isinstance(expression, DiceTerm):
+        index = expression.index
+        return lambda values: values[index]
+    #
+    program = [_compile_instruction(node) for node in postfix(expression)]
+
+    def evaluate(values: Sequence[int]) -> int | float:
+        stack = []
+        for instruction in program:
+            instruction(stack, values)
+        return stack[0]
+    return evaluate
+
+
+def postfix(expression: Expression) -> list[Expression]:
+    """The nodes of an expression in postfix (evaluation) order"""
+    ordered = []
+    pending = [(expression, False)]
+    while pending:
+        node, expanded = pending.pop()
+        if expanded or isinstance(node, (Constant, DiceTerm)):
+            ordered.append(node)
+        elif isinstance(node, UnaryOp):
+            pending.extend([(node, True), (node.operand, False)])
+        else:
+            pending.extend([(node, True), (node.right, False), (node.left, False)])
+    return ordered
+
+
+def _compile_instruction(node: Expression) -> Callable[[list, Sequence[int]], None]:
+    if isinstance(node, Constant):
+        value = node.value
+        return lambda stack, values: stack.append(value)
+    elif isinstance(node, DiceTerm):
+        index = node.index
+        return lambda stack, values: stack.append(values[index])
+    elif isinstance(node, UnaryOp):
+        if node.op == '+':
+            return lambda stack, values: None
 
-    decorated = str(decorated).replace("'", '')
-    return f"{notation[:match.end()]}{decorated}{notation[match.end():]}"
+        def negate(stack, values):
+            stack[-1] = -stack[-1]
+        return negate
+    else:
+        func = OPERATORS[node.op]
+
+        def apply(stack, values):
+            right = stack.pop()
+            stack[-1] = func(stack[-1], right)
+        return apply
+
+
+@dataclass
+class RollLimits:
+    """Limits on the dice a single term may roll
+
+    Attributes:
+        max_num_dice (int): Most dice in one term. Higher by default when
+            NumPy is available to roll large pools.
+        max_dice_type (int): Most sides a die may have.
+        vectorize_threshold (int): Pools of at least this many dice are rolled
+            with NumPy, if it's installed.
+        counts_threshold (int): Pools of at least this many dice only record
+            how many dice landed on each face.
+    """
+    max_num_dice: int = 1_000_000 if vectorized.available else 100
+    max_dice_type: int = 1000
+    vectorize_threshold: int = 50
+    counts_threshold: int = 1000
+
+
+limits = RollLimits()
+
+
+@dataclass(frozen=True, slots=True)
+class TermPlan:
+    """Immutable, pre-validated plan for rolling a single `ParsedDice` term.
+
+    Every branch on the parsed fields is resolved once when the plan is
+    compiled, so rolling is just a few calls.
+
+    Attributes:
+        pd (ParsedDice): The term this plan was compiled from.
+        roll (Callable[[DiceSource], Sequence[int]]): Draws the raw dice from a source.
+        select (Callable[[Sequence[int]], DiceResult]): Applies keep/drop/advantage,
+            marking the kept dice and summing them.
+        clamp (Callable[[int], int]): Applies min/max to the sum.
+    """
+    pd: ParsedDice
+    roll: Callable[[DiceSource], Sequence[int]]
+    select: Callable[[Sequence[int]], DiceResult]
+    clamp: Callable[[int], int]
+
+
+def compile_term(parsed_dice: ParsedDice) -> TermPlan:
+    """Validate a parsed term and build its specialised roll/select/clamp callables
+
+    Large pools use the NumPy backend when it's available. Huge pools
+    are rolled as face counts instead of individual dice.
+
+    Args:
+        parsed_dice (ParsedDice): parsed dice
+
+    Raises:
+        NotationParseException: too many dice or sides
+
+    Returns:
+        TermPlan: plan for rolling the term
+    """
+    _validate(parsed_dice)
+    num_dice = _num_dice_rolled(parsed_dice)
+    start, stop = _kept_range(parsed_dice, num_dice)
+    if counts.available and num_dice >= limits.counts_threshold:
+        return TermPlan(pd=parsed_dice,
+                        roll=counts.compile_roll(num_dice, parsed_dice.dice_type),
+                        select=lambda faces: select_pool(faces, start, stop),
+                        clamp=_compile_clamp(parsed_dice))
+    elif vectorized.available and num_dice >= limits.vectorize_threshold:
+        return TermPlan(pd=parsed_dice,
+                        roll=vectorized.compile_roll(num_dice, parsed_dice.dice_type),
+                        select=lambda faces: select_array(faces, start, stop),
+                        clamp=_compile_clamp(parsed_dice))
+    return TermPlan(pd=parsed_dice,
+                    roll=_compile_roll(num_dice, parsed_dice.dice_type),
+                    select=lambda faces: select_dice(faces, start, stop),
+                    clamp=_compile_clamp(parsed_dice))
+
+
+def _validate(pd: ParsedDice):
+    if pd.num_dice > limits.max_num_dice:
+        raise NotationParseException("Can't roll this many dice")
+    if isinstance(pd.dice_type, int) and pd.dice_type > limits.max_dice_type:
+        raise NotationParseException("Can't roll dice this big")
+    if isinstance(pd.dice_type, int) and pd.dice_type < 1:
+        raise NotationParseException("Dice need at least one side")
+
+
+def selection(parsed_dice: ParsedDice) -> tuple[int, int, int]:
+    """How many dice a term rolls, and the slice of them that are kept once sorted
+
+    Returns:
+        tuple[int, int, int]: number of dice, start and stop of the kept slice
+    """
+    num_dice = _num_dice_rolled(parsed_dice)
+    return num_dice, *_kept_range(parsed_dice, num_dice)
+
+
+def _num_dice_rolled(pd: ParsedDice) -> int:
+    return 2 if pd.advantage else pd.num_dice
+
+
+def _kept_range(pd: ParsedDice, num_dice: int) -> tuple[int, int]:
+    """The slice of the sorted dice that are kept"""
+    num_kd = min(pd.kd_num_dice, num_dice)
+    if pd.advantage == '@adv':
+        return num_dice - 1, num_dice
+    elif pd.advantage == '@dis':
+        return 0, 1
+    elif pd.keep_drop == 'k' and pd.high_low in ['h', None]:
+        return num_dice - num_kd, num_dice
+    elif pd.keep_drop == 'k' and pd.high_low == 'l':
+        return 0, num_kd
+    elif pd.keep_drop == 'd' and pd.high_low == 'h':
+        return 0, num_dice - num_kd
+    elif pd.keep_drop == 'd' and pd.high_low in ['l', None]:
+        return num_kd, num_dice
+    else:
+        return 0, num_dice
+
+
+def _compile_roll(num_dice: int, dice_type: int | str) -> Callable[[DiceSource], Sequence[int]]:
+    low, high = (FUDGE_FACES[0], FUDGE_FACES[-1]) if dice_type == 'f' else (1, dice_type)
+    return lambda source: to_array(source.roll(num_dice, low, high))
+
+
+def _compile_clamp(pd: ParsedDice) -> Callable[[int], int]:
+    m_score = pd.m_score
+    if pd.min_max == "min":
+        return lambda total: max(total, m_score)
+    elif pd.min_max == "max":
+        return lambda total: min(total, m_score)
+    else:
+        return lambda total: total
 
 
 class ParsedDiceRoller:
-    def __init__(self, parsed_dice: ParsedDice):
+    def __init__(self, parsed_dice: ParsedDice, plan: TermPlan = None, source: DiceSource = None):
         """Validate and roll parsed dice
 
         Args:
             parsed_dice (ParsedDice): parsed dice
+            plan (TermPlan, optional): precompiled plan for `parsed_dice`.
+                Compiled (and validated) on the spot if omitted.
+            source (DiceSource, optional): source of the dice. Defaults to the
+                next roll of the shared stream.
         """
         self.pd = parsed_dice
-        self._raw_results: list[int] = []
-        self._results: list[int] = []
+        self.plan = plan if plan is not None else compile_term(parsed_dice)
+        self.source = source if source is not None else default_stream.next()[0]
+        self.result: DiceResult = None
         self._total: int = 0
-        self.validate()
         self.roll()
 
     def __repr__(self):
-        return f'<ParsedDiceRoller raw_results={self.raw_results}, results={self.results}, total={self.total}>'
+        return f'<ParsedDiceRoller result={self.result}, total={self.total}>'
 
     @property
-    def raw_results(self) -> list[int]:
-        """Raw dice rolls"""
-        return self._raw_results
+    def raw_results(self) -> list[int] | counts.FaceCounts:
+        """Raw dice rolls, as a list. Huge pools are `FaceCounts`."""
+        faces = self.result.faces
+        return faces if self.result.pooled else faces.tolist()
 
     @property
-    def results(self) -> list[int]:
-        """Individual die results after keep/drop applied"""
-        return self._results
+    def results(self) -> list[int] | counts.FaceCounts:
+        """Individual die results after keep/drop applied, in the order they were rolled"""
+        return self.result.kept_faces()
 
     @property
     def total(self) -> int:
-        """Total value of these dice with all parameters applied"""
+        """Total value of these dice with keep/drop and min/max applied.
+        Modifiers are applied by the expression the dice are part of."""
         return self._total
 
     def validate(self):
@@ -153,57 +456,10 @@ class ParsedDiceRoller:
         Raises:
             NotationException: too many dice or sides
         """
-        if self.pd.num_dice > 100:
-            raise NotationParseException("Can't roll this many dice")
-        if isinstance(self.pd.dice_type, int) and self.pd.dice_type > 1000:
-            raise NotationParseException("Can't roll dice this big")
+        _validate(self.pd)
 
     def roll(self):
         """Roll the parsed dice, applying the other parameeters and
         setting the total"""
-        num_dice = self.pd.num_dice
-        if self.pd.advantage:
-            num_dice = 2
-        #
-        if self.pd.dice_type == "f":
-            self._raw_results = [
-                random.choice([-1, 0, 1]) for _ in range(num_dice)
-            ]
-        else:
-            self._raw_results = [
-                random.randint(1, self.pd.dice_type)
-                for _ in range(num_dice)
-            ]
-        #
-        sorted_results = sorted(self._raw_results)
-        if self.pd.advantage == '@adv':
-            self._results = sorted_results[-1:]
-        elif self.pd.advantage == '@dis':
-            self._results = sorted_results[:1]
-        elif (self.pd.keep_drop == 'k' and self.pd.high_low in ['h', None]):
-            drop_lowest = len(sorted_results) - self.pd.kd_num_dice
-            self._results = sorted_results[drop_lowest:]
-        elif (self.pd.keep_drop == 'k' and self.pd.high_low == 'l'):
-            self._results = sorted_results[:self.pd.kd_num_dice]
-        elif (self.pd.keep_drop == 'd' and self.pd.high_low == 'h'):
-            drop_highest = len(sorted_results) - self.pd.kd_num_dice
-            self._results = sorted_results[:drop_highest]
-        elif (self.pd.keep_drop == 'd' and self.pd.high_low in ['l', None]):
-            self._results = sorted_results[self.pd.kd_num_dice:]
-        else:
-            self._results = self._raw_results
-        #
-        self._total = sum(self._results)
-
-        if (self.pd.min_max == "min" and self._total < self.pd.m_score) or\
-           (self.pd.min_max == "max" and self._total > self.pd.m_score):
-            self._total = self.pd.m_score
-
-        if str(self.pd.modifier).startswith("+"):
-            self._total += int(self.pd.modifier[1:])
-        elif str(self.pd.modifier).startswith("-"):
-            self._total -= int(self.pd.modifier[1:])
-        elif str(self.pd.modifier).startswith("*"):
-            self._total *= int(self.pd.modifier[1:])
-        elif str(self.pd.modifier).startswith("/"):
-            self._total /= int(self.pd.modifier[1:])
+        self.result = self.plan.select(self.plan.roll(self.source))
+        self._total = self.plan.clamp(self.result.total)
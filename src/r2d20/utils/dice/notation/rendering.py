@@ -0,0 +1,261 @@
+import math
+from typing import Iterable, Iterator
+
+import discord
+
+from ...metrics import metrics
+from ..rng import RollSeed
+from .batch import ROWS_SHOWN, BatchResult, roll_batch
+from .compiling import PlanResult, compile_notation
+from .counts import FaceCounts
+from .results import DiceResult
+
+__all__ = [
+    'EMBED_DESCRIPTION_LIMIT',
+    'EMBED_FIELD_LIMIT',
+    'RenderBuffer',
+    'create_embed_for_batch',
+    'create_embed_from_notation',
+    'decorate_face_counts',
+    'decorate_results',
+    'join_parts',
+    'render_result',
+    'write_result',
+    'write_results',
+]
+
+# Discord's limits on the length of an embed's description and of a field's value
+EMBED_DESCRIPTION_LIMIT = 4096
+EMBED_FIELD_LIMIT = 1024
+# Room left for each term still to be written, enough for e.g. `[…and 1,000,000,000 more]`
+TERM_SUMMARY_WIDTH = 26
+
+
+class RenderBuffer:
+    __slots__ = ('limit', '_parts', '_size')
+
+    def __init__(self, limit: int = EMBED_DESCRIPTION_LIMIT):
+        """Text written a piece at a time, which must stay within `limit` characters
+
+        Args:
+            limit (int, optional): Most characters the text may have. Defaults to `EMBED_DESCRIPTION_LIMIT`.
+        """
+        self.limit = limit
+        self._parts: list[str] = []
+        self._size = 0
+
+    def __str__(self):
+        return ''.join(self._parts)
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def remaining(self) -> int:
+        return self.limit - self._size
+
+    def write(self, text: str):
+        """Append text, which the caller made sure fits"""
+        self._parts.append(text)
+        self._size += len(text)
+
+
+def create_embed_from_notation(notation: str, seed: RollSeed = None) -> discord.Embed:
+    """Roll dice notation and create an embed showing each die and the total
+
+    Args:
+        notation (str): dice notation
+        seed (RollSeed, optional): Where to draw the dice from. Defaults to the shared stream.
+
+    Returns:
+        discord.Embed: Embed with the results, and the seed in its footer
+    """
+    with metrics.phase('parse'):
+        plan = compile_notation(notation)
+    with metrics.phase('roll'):
+        rolled_plan = plan.roll(seed)
+    with metrics.phase('render'):
+        embed = discord.Embed(title=str(rolled_plan.total), description=render_result(rolled_plan))
+        embed.set_footer(text=f'Seed {rolled_plan.seed}')
+    return embed
+
+
+def create_embed_for_batch(notation: str, times: int, seed: RollSeed = None) -> discord.Embed:
+    """Roll dice notation several times and create one embed summarising every roll
+
+    Args:
+        notation (str): dice notation
+        times (int): number of rolls
+        seed (RollSeed, optional): Where to draw the dice from. Defaults to the shared stream.
+
+    Returns:
+        discord.Embed: Embed with the first rolls, and the lowest, mean and highest totals
+    """
+    with metrics.phase('parse'):
+        plan = compile_notation(notation)
+    with metrics.phase('roll'):
+        rolled = roll_batch(plan, times, seed)
+    with metrics.phase('render'):
+        return _batch_embed(plan.notation, rolled, times)
+
+
+def _batch_embed(notation: str, rolled: BatchResult, times: int) -> discord.Embed:
+    buffer = RenderBuffer()
+    # Keep room for the line counting the rolls that aren't shown
+    reserve = len(f'\n…and {times:,} more')
+    shown = 0
+    for index, total in enumerate(rolled.totals[:ROWS_SHOWN], 1):
+        row = f'{index}. ' if index == 1 else f'\n{index}. '
+        if buffer.remaining - reserve < len(row):
+            break
+        buffer.write(row)
+        if rolled.rows:
+            if not write_result(buffer, rolled.rows[index - 1], reserve):
+                break
+        elif buffer.remaining - reserve >= len(str(total)):
+            buffer.write(str(total))
+        else:
+            break
+        shown = index
+    if shown < times:
+        buffer.write(f'\n…and {times - shown:,} more')
+    embed = discord.Embed(title=f'{times}x {notation}', description=str(buffer))
+    embed.add_field(name='Min', value=str(rolled.min))
+    embed.add_field(name='Mean', value=f'{rolled.mean:.2f}')
+    embed.add_field(name='Max', value=str(rolled.max))
+    embed.set_footer(text=f'Seed {rolled.seed}')
+    return embed
+
+
+def render_result(rolled_plan: PlanResult, limit: int = EMBED_DESCRIPTION_LIMIT) -> str:
+    """The notation with each term's dice after it, followed by the total, in at most `limit` characters"""
+    buffer = RenderBuffer(limit)
+    if not write_result(buffer, rolled_plan):
+        # No room for the notation, so only show the total
+        return f'… = {rolled_plan.total}'
+    return str(buffer)
+
+
+def write_result(buffer: RenderBuffer, rolled_plan: PlanResult, reserve: int = 0) -> bool:
+    """Write the notation with each term's dice after it, followed by the total
+
+    Terms whose dice don't fit are summarised, so the roll fits if its notation does.
+
+    Args:
+        buffer (RenderBuffer): Where to write the roll
+        rolled_plan (PlanResult): The roll
+        reserve (int, optional): Characters to leave free in the buffer. Defaults to 0.
+
+    Returns:
+        bool: Whether the roll was written. Nothing is written if even its summary doesn't fit.
+    """
+    plan = rolled_plan.plan
+    ends = [dice_term.dice_end for dice_term in plan.dice_terms]
+    pieces = [plan.notation[start:end] for start, end in zip([0, *ends], [*ends, len(plan.notation)])]
+    tail = f' = {rolled_plan.total}'
+    # The text after each piece that can't be summarised
+    fixed = len(tail) + reserve
+    after = []
+    for piece in reversed(pieces):
+        after.append(fixed)
+        fixed += len(piece)
+    after.reverse()
+    terms = len(rolled_plan.rolled)
+    if buffer.remaining < fixed + terms * TERM_SUMMARY_WIDTH:
+        return False
+    for index, (piece, dice) in enumerate(zip(pieces, rolled_plan.rolled)):
+        buffer.write(piece)
+        # Share the room left between the remaining terms
+        share = (buffer.remaining - after[index]) // (terms - index)
+        write_results(buffer, dice.result, buffer.remaining - share)
+    buffer.write(pieces[-1])
+    buffer.write(tail)
+    return True
+
+
+def write_results(buffer: RenderBuffer, result: DiceResult, reserve: int = 0):
+    """Write one term's dice with kept dice in bold and dropped dice struck through
+
+    Dice that don't fit are shown as a histogram of their faces instead or,
+    if that doesn't fit either, cut short with "…and N more".
+
+    Args:
+        buffer (RenderBuffer): Where to write the dice
+        result (DiceResult): The dice, with the kept ones marked
+        reserve (int, optional): Characters to leave free in the buffer. Defaults to 0.
+    """
+    limit = buffer.remaining - reserve
+    if result.pooled:
+        text, _ = join_parts(_face_count_parts(*result.face_counts()), limit)
+    else:
+        text, complete = join_parts(_dice_parts(result), limit)
+        if not complete:
+            histogram, complete = join_parts(_face_count_parts(*result.face_counts()), limit)
+            if complete:
+                text = histogram
+    buffer.write(text)
+
+
+def join_parts(parts: Iterable[tuple[str, int]], limit: int, *,
+               separator: str = ', ', opening: str = '[', closing: str = ']') -> tuple[str, bool]:
+    """Join parts in one pass, stopping with "…and N more" once they don't fit in `limit` characters
+
+    Args:
+        parts (Iterable[tuple[str, int]]): Each part, with the number of dice it shows
+        limit (int): Most characters the joined parts may have
+        separator (str, optional): Text between parts. Defaults to ', '.
+        opening (str, optional): Text before the parts. Defaults to '['.
+        closing (str, optional): Text after the parts. Defaults to ']'.
+
+    Returns:
+        tuple[str, bool]: The joined parts, and whether every part fitted
+    """
+    written: list[tuple[str, int]] = []
+    size = len(opening) + len(closing)
+    parts = iter(parts)
+    for part, count in parts:
+        part_size = len(part) + (len(separator) if written else 0)
+        if size + part_size > limit:
+            remaining = count + sum(count for _, count in parts)
+            break
+        written.append((part, count))
+        size += part_size
+    else:
+        return f'{opening}{separator.join(part for part, _ in written)}{closing}', True
+    # Make room for the summary
+    while written:
+        summary = f'{separator if len(written) > 1 else ""}…and {remaining:,} more'
+        if size + len(summary) <= limit:
+            break
+        part, count = written.pop()
+        size -= len(part) + (len(separator) if written else 0)
+        remaining += count
+    summary = f'{separator if written else ""}…and {remaining:,} more'
+    return f'{opening}{separator.join(part for part, _ in written)}{summary}{closing}', False
+
+
+def decorate_results(result: DiceResult) -> str:
+    """Show dice results with kept dice in bold and dropped dice struck through"""
+    if result.pooled:
+        return decorate_face_counts(*result.face_counts())
+    return join_parts(_dice_parts(result), math.inf)[0]
+
+
+def decorate_face_counts(raw_results: FaceCounts, results: FaceCounts) -> str:
+    """Show a histogram of how many dice landed on each face, e.g. `[**1**×3, ~~2~~×1]`"""
+    return join_parts(_face_count_parts(raw_results, results), math.inf)[0]
+
+
+def _dice_parts(result: DiceResult) -> Iterator[tuple[str, int]]:
+    for face, kept in result.dice():
+        yield (f"**{face}**" if kept else f"~~{face}~~"), 1
+
+
+def _face_count_parts(raw_results: FaceCounts, results: FaceCounts) -> Iterator[tuple[str, int]]:
+    dropped = raw_results.without(results)
+    for index, (kept_count, dropped_count) in enumerate(zip(results.counts, dropped.counts)):
+        face = raw_results.low + index
+        if kept_count:
+            yield f"**{face}**×{kept_count}", kept_count
+        if dropped_count:
+            yield f"~~{face}~~×{dropped_count}", dropped_count
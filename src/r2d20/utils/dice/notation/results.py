@@ -0,0 +1,136 @@
+import heapq
+from array import array
+from typing import Iterator, Sequence
+
+from . import vectorized
+from .counts import FaceCounts
+
+__all__ = ['DiceResult', 'select_dice']
+
+# Type code of the arrays holding faces: signed for fudge dice, wide enough for d1000
+FACE_TYPECODE = 'h'
+
+
+class DiceResult:
+    __slots__ = ('faces', 'kept', 'total')
+
+    def __init__(self, faces: Sequence[int] | FaceCounts, kept: int | FaceCounts, total: int):
+        """The dice of one term in the order they were rolled, and which of them were kept
+
+        Args:
+            faces (Sequence[int] | FaceCounts): Every die rolled, as an `array` or NumPy array.
+                Huge pools are `FaceCounts`.
+            kept (int | FaceCounts): Bitmask of the positions of the kept dice, bit 0
+                being the first die. The kept `FaceCounts` for huge pools.
+            total (int): Sum of the kept dice, before min/max
+        """
+        self.faces = faces
+        self.kept = kept
+        self.total = total
+
+    def __repr__(self):
+        return f'<DiceResult dice={len(self)} kept={self.num_kept} total={self.total}>'
+
+    def __len__(self):
+        return len(self.faces)
+
+    @property
+    def pooled(self) -> bool:
+        """Whether only the number of dice showing each face was recorded"""
+        return isinstance(self.faces, FaceCounts)
+
+    @property
+    def num_kept(self) -> int:
+        return len(self.kept) if self.pooled else self.kept.bit_count()
+
+    def dice(self) -> Iterator[tuple[int, bool]]:
+        """Each die with whether it was kept, in the order they were rolled"""
+        faces = self.faces
+        if vectorized.available and isinstance(faces, vectorized.np.ndarray):
+            faces = faces.tolist()
+        # One pass over the bits, rather than shifting the mask for every die
+        bits = format(self.kept, f'0{len(faces)}b')[::-1]
+        return ((face, bit == '1') for face, bit in zip(faces, bits))
+
+    def kept_faces(self) -> list[int] | FaceCounts:
+        """The kept dice, in the order they were rolled"""
+        if self.pooled:
+            return self.kept
+        return [face for face, kept in self.dice() if kept]
+
+    def face_counts(self) -> tuple[FaceCounts, FaceCounts]:
+        """The number of dice, and of kept dice, showing each face"""
+        if self.pooled:
+            return self.faces, self.kept
+        low = min(self.faces)
+        raw_counts = [0] * (max(self.faces) - low + 1)
+        kept_counts = raw_counts.copy()
+        for face, kept in self.dice():
+            raw_counts[face - low] += 1
+            if kept:
+                kept_counts[face - low] += 1
+        return FaceCounts(low, raw_counts), FaceCounts(low, kept_counts)
+
+    @classmethod
+    def from_indices(cls, faces: Sequence[int], indices: Sequence[int]) -> 'DiceResult':
+        """A result keeping the dice at `indices`"""
+        mask = 0
+        for index in indices:
+            mask |= 1 << index
+        return cls(faces, mask, sum(faces[index] for index in indices))
+
+
+def select_dice(faces: Sequence[int], start: int, stop: int) -> DiceResult:
+    """Keep the dice that would be at positions `start:stop` if the dice were sorted
+
+    Keep/drop always anchors the slice at one end, so only the kept dice are
+    selected, in O(n log k), instead of sorting them all. Of equal dice the
+    first ones rolled are kept.
+
+    Args:
+        faces (Sequence[int]): the dice rolled
+        start (int): start of the kept slice of the sorted dice
+        stop (int): stop of the kept slice of the sorted dice
+
+    Returns:
+        DiceResult: The dice, with the kept ones marked
+    """
+    num_dice = len(faces)
+    if start == 0 and stop == num_dice:
+        return DiceResult(faces, (1 << num_dice) - 1, sum(faces))
+    elif start >= stop:
+        return DiceResult(faces, 0, 0)
+    elif start == 0:
+        indices = heapq.nsmallest(stop, range(num_dice), key=faces.__getitem__)
+    elif stop == num_dice:
+        indices = heapq.nlargest(num_dice - start, range(num_dice), key=faces.__getitem__)
+    else:
+        indices = sorted(range(num_dice), key=faces.__getitem__)[start:stop]
+    return DiceResult.from_indices(faces, indices)
+
+
+def select_array(faces: 'vectorized.np.ndarray', start: int, stop: int) -> DiceResult:
+    """Like `select_dice`, for a NumPy array, with the kept dice found by a linear time partition"""
+    np = vectorized.np
+    num_dice = len(faces)
+    if start == 0 and stop == num_dice:
+        return DiceResult(faces, (1 << num_dice) - 1, int(faces.sum()))
+    elif start >= stop:
+        return DiceResult(faces, 0, 0)
+    kth = (start, stop - 1) if stop - 1 > start else start
+    indices = np.argpartition(faces, kth)[start:stop]
+    mask = np.zeros(num_dice, dtype=bool)
+    mask[indices] = True
+    bitmask = int.from_bytes(np.packbits(mask, bitorder='little').tobytes(), 'little')
+    return DiceResult(faces, bitmask, int(faces[indices].sum()))
+
+
+def select_pool(faces: FaceCounts, start: int, stop: int) -> DiceResult:
+    """Like `select_dice`, for face counts, in O(sides)"""
+    kept = faces if start == 0 and stop == len(faces) else faces.select(start, stop)
+    return DiceResult(faces, kept, kept.total())
+
+
+def to_array(faces: list[int]) -> array:
+    """Pack faces into a compact array"""
+    return array(FACE_TYPECODE, faces)
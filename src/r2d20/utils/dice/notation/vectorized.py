@@ -0,0 +1,19 @@
+from typing import Callable
+
+from ..rng import DiceSource
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+__all__ = []
+
+# Without NumPy the pure Python rollers in `parsing` are used instead
+available = np is not None
+
+
+def compile_roll(num_dice: int, dice_type: int | str) -> Callable[[DiceSource], 'np.ndarray']:
+    """Build a function drawing `num_dice` dice in one call"""
+    low, high = (-1, 1) if dice_type == 'f' else (1, dice_type)
+    return lambda source: source.roll_array(num_dice, low, high)
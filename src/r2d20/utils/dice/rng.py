@@ -0,0 +1,264 @@
+import abc
+import logging
+import random
+import secrets
+import weakref
+from typing import NamedTuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+__all__ = [
+    'BACKENDS',
+    'DiceSource',
+    'NumpySource',
+    'RollSeed',
+    'RollStream',
+    'RollStreams',
+    'StdlibSource',
+    'default_stream',
+]
+
+logger = logging.getLogger(__name__)
+
+# Most draws taken from one generator before its stream moves on to the next
+# offset, which bounds the draws skipped to replay a roll
+BLOCK_DRAWS = 4096
+
+
+class DiceSource(abc.ABC):
+    """Draws dice for one or more rolls. Each backend draws a whole block of dice per call.
+
+    Attributes:
+        draws (int | None): Uniform draws made so far, one per die rolled, or `None`
+            once a draw that can't be counted was made, e.g. `multinomial`
+    """
+    __slots__ = ('draws', '__weakref__')
+
+    def __init__(self):
+        self.draws = 0
+
+    @abc.abstractmethod
+    def roll(self, num_dice: int, low: int, high: int) -> list[int]:
+        """`num_dice` dice showing `low` to `high` (inclusive)"""
+
+    @abc.abstractmethod
+    def advance(self, draws: int):
+        """Skip `draws` uniform draws, as if that many dice had been rolled"""
+
+    @abc.abstractmethod
+    def roll_array(self, num_dice: int, low: int, high: int) -> 'np.ndarray':
+        """Like `roll`, as a NumPy array"""
+
+    @abc.abstractmethod
+    def multinomial(self, num_dice: int, num_faces: int) -> list[int]:
+        """How many of `num_dice` fair dice landed on each of `num_faces` faces"""
+
+
+class StdlibSource(DiceSource):
+    __slots__ = ('_random',)
+
+    def __init__(self, generator: random.Random):
+        super().__init__()
+        self._random = generator
+
+    def roll(self, num_dice: int, low: int, high: int) -> list[int]:
+        # Every die takes one `random()` whatever its faces, so the draws can be counted and skipped
+        if self.draws is not None:
+            self.draws += num_dice
+        return self._random.choices(range(low, high + 1), k=num_dice)
+
+    def advance(self, draws: int):
+        draw = self._random.random
+        for _ in range(draws):
+            draw()
+
+    def roll_array(self, num_dice: int, low: int, high: int) -> 'np.ndarray':
+        return self._numpy().roll_array(num_dice, low, high)
+
+    def multinomial(self, num_dice: int, num_faces: int) -> list[int]:
+        self.draws = None
+        if np is not None:
+            return self._numpy().multinomial(num_dice, num_faces)
+        counts = []
+        remaining = num_dice
+        for index in range(num_faces - 1):
+            count = self._random.binomialvariate(remaining, 1 / (num_faces - index)) if remaining else 0
+            counts.append(count)
+            remaining -= count
+        counts.append(remaining)
+        return counts
+
+    def _numpy(self) -> 'NumpySource':
+        """Bulk draws come from a NumPy generator seeded by this one, so they stay replayable"""
+        self.draws = None
+        return NumpySource(np.random.default_rng(self._random.getrandbits(64)))
+
+
+class NumpySource(DiceSource):
+    __slots__ = ('_generator',)
+
+    def __init__(self, generator: 'np.random.Generator'):
+        super().__init__()
+        self._generator = generator
+
+    def roll(self, num_dice: int, low: int, high: int) -> list[int]:
+        return self.roll_array(num_dice, low, high).tolist()
+
+    def advance(self, draws: int):
+        self._generator.bit_generator.advance(draws)
+
+    def roll_array(self, num_dice: int, low: int, high: int) -> 'np.ndarray':
+        # Scaling one double per die, rather than `integers`, takes exactly one 64-bit draw each
+        if self.draws is not None:
+            self.draws += num_dice
+        return (self._generator.random(num_dice) * (high - low + 1)).astype(np.int64) + low
+
+    def multinomial(self, num_dice: int, num_faces: int) -> list[int]:
+        self.draws = None
+        return self._generator.multinomial(num_dice, [1 / num_faces] * num_faces).tolist()
+
+
+def _stdlib_source(seed: int, offset: int) -> DiceSource:
+    return StdlibSource(random.Random((seed << 64) | offset))
+
+
+def _numpy_source(seed: int, offset: int) -> DiceSource:
+    return NumpySource(np.random.Generator(np.random.PCG64([seed, offset])))
+
+
+def _secrets_source(seed: int, offset: int) -> DiceSource:
+    return StdlibSource(random.SystemRandom())
+
+
+# Functions making the generator at an offset of a seeded stream
+BACKENDS = {
+    'stdlib': _stdlib_source,
+    'secrets': _secrets_source,
+}
+if np is not None:
+    BACKENDS['numpy'] = _numpy_source
+
+# Generators still drawing for their streams, so a roll reserved from one draws from it
+# instead of making and advancing its own
+_live_sources: weakref.WeakValueDictionary[tuple[str, int, int], DiceSource] = weakref.WeakValueDictionary()
+
+
+class RollSeed(NamedTuple):
+    """Where a roll's dice came from. Rolling the same notation from the same
+    seed gives the same results, except with the `secrets` backend.
+
+    A roll draws from the generator at `offset` of its stream, after the
+    `draws` made by the rolls before it. Dice taken from a pre-drawn block
+    also skip the dice before them, i.e. they are
+    `seed.source().roll(seed.skip + num_dice, low, high)[seed.skip:]`.
+    """
+    backend: str
+    seed: int
+    offset: int
+    skip: int = 0
+    draws: int = 0
+
+    def __str__(self):
+        draws = f'@{self.draws}' if self.draws else ''
+        skip = f'+{self.skip}' if self.skip else ''
+        return f'{self.backend}:{self.seed:x}:{self.offset}{draws}{skip}'
+
+    @property
+    def replayable(self) -> bool:
+        return self.backend != 'secrets'
+
+    def source(self) -> DiceSource:
+        """A source drawing the same dice as the original roll"""
+        key = (self.backend, self.seed, self.offset)
+        source = _live_sources.get(key)
+        if source is not None and source.draws == self.draws:
+            return source
+        source = BACKENDS[self.backend](self.seed, self.offset)
+        if self.draws and self.replayable:
+            source.advance(self.draws)
+            source.draws = self.draws
+        return source
+
+
+class RollStream:
+    def __init__(self, backend: str = 'stdlib', seed: int = None, offset: int = 0):
+        """Seeded stream of dice sources.
+
+        Rolls draw in turn from one generator, derived from the stream's seed
+        and an offset, until it has made `BLOCK_DRAWS` draws and the stream
+        moves on to the next offset. Each roll records the offset and the
+        draws before it, so it can be replayed from its `RollSeed` without
+        replaying the rolls before it.
+
+        Args:
+            backend (str, optional): Name of a backend in `BACKENDS`. Defaults to 'stdlib'.
+            seed (int, optional): Seed of the stream. Random if omitted.
+            offset (int, optional): Offset of the next roll. Defaults to 0.
+
+        Raises:
+            ValueError: Unknown backend
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown random number backend: {backend}")
+        self.backend = backend
+        self.seed = secrets.randbits(64) if seed is None else int(seed)
+        self.offset = offset
+        # The generator rolls are drawing from, and the last roll given it
+        self._source: DiceSource = None
+        self._last: RollSeed = None
+
+    def __repr__(self):
+        return f'<RollStream {self.backend}:{self.seed:x} offset={self.offset}>'
+
+    def reserve(self) -> RollSeed:
+        """The seed of the next roll, to draw its dice elsewhere, e.g. in another process"""
+        source = self._source
+        # Move on if the last roll hasn't drawn yet, as it may still draw from the same place
+        if (source is None or source.draws is None or source.draws >= BLOCK_DRAWS
+                or source.draws == self._last.draws):
+            source = self._source = BACKENDS[self.backend](self.seed, self.offset)
+            _live_sources[(self.backend, self.seed, self.offset)] = source
+            self.offset += 1
+        self._last = RollSeed(self.backend, self.seed, self.offset - 1, draws=source.draws)
+        return self._last
+
+    def next(self) -> tuple[DiceSource, RollSeed]:
+        """The source for the next roll, and the seed to replay it from. The source
+        is shared with the rolls after it, so draw from it before taking the next.
+        """
+        seed = self.reserve()
+        return self._source, seed
+
+
+class RollStreams:
+    def __init__(self, backend: str = 'stdlib', game_backend: str = None, seeds: dict[int, int] = None):
+        """The roll streams of a bot, one per guild plus one per game
+
+        Args:
+            backend (str, optional): Backend of guild streams. Defaults to 'stdlib'.
+            game_backend (str, optional): Backend of game streams, e.g. 'secrets' for
+                tournaments. Defaults to `backend`.
+            seeds (dict[int, int], optional): Fixed seeds for some guilds
+        """
+        self.backend = backend
+        self.game_backend = game_backend or backend
+        self.seeds = dict(seeds or {})
+        self._guilds: dict[int | None, RollStream] = {}
+
+    def for_guild(self, guild_id: int | None) -> RollStream:
+        """The stream for a guild, or for DMs when `guild_id` is `None`"""
+        stream = self._guilds.get(guild_id)
+        if stream is None:
+            stream = self._guilds[guild_id] = RollStream(self.backend, self.seeds.get(guild_id))
+            logger.debug(f"New roll stream for guild {guild_id}: {stream}")
+        return stream
+
+    def for_game(self, seed: int = None) -> RollStream:
+        """A new stream for a single game"""
+        return RollStream(self.game_backend, seed)
+
+
+default_stream = RollStream()
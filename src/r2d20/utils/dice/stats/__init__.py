@@ -0,0 +1,5 @@
+from .pmf import *
+from .order_stats import *
+from .cache import *
+from .engine import *
+from .rendering import *
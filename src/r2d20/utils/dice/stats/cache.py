@@ -0,0 +1,296 @@
+import asyncio
+import logging
+import pathlib
+import sqlite3
+import threading
+import time
+from array import array
+from collections import Counter, OrderedDict
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from ..notation import Constant, DiceTerm, Expression, UnaryOp, selection
+from .pmf import PMF
+
+__all__ = ['DistributionCache', 'canonical_key', 'configure_distribution_cache']
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MEMORY_BYTES = 64 * 1024 * 1024
+DEFAULT_DISK_BYTES = 256 * 1024 * 1024
+# Seconds a lookup waits on a locked file before counting as a miss
+READ_TIMEOUT = 0.05
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS distributions (
+    key TEXT PRIMARY KEY,
+    dense INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    vals BLOB,
+    probs BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+)
+"""
+
+
+def canonical_key(expression: Expression) -> tuple[str, int]:
+    """Key identifying the distribution of an expression, ignoring how it's written.
+
+    Plain dice of the same type added together are pooled, so "d6+d6" and
+    "2d6" share a key. Constants added to the whole expression are left out
+    of the key and returned separately, so "d20+5" and "d20+7" share one too.
+
+    Args:
+        expression (Expression): parsed expression
+
+    Returns:
+        tuple[str, int]: The key and the constant to add to its distribution
+    """
+    pools = Counter()
+    terms = Counter()
+    offset = 0
+    pending = [(expression, 1)]
+    while pending:
+        node, sign = pending.pop()
+        if isinstance(node, Constant):
+            offset += sign * node.value
+        elif isinstance(node, DiceTerm):
+            num_dice, start, stop = selection(node.dice)
+            if start == 0 and stop == num_dice and not node.dice.min_max:
+                pools[sign, str(node.dice.dice_type)] += num_dice
+            else:
+                terms[sign, f'{num_dice}d{node.dice.dice_type}[{start}:{stop}]'
+                            f'{node.dice.min_max or ""}{node.dice.m_score if node.dice.min_max else ""}'] += 1
+        elif isinstance(node, UnaryOp):
+            pending.append((node.operand, -sign if node.op == '-' else sign))
+        elif node.op in '+-':
+            pending.append((node.left, sign))
+            pending.append((node.right, -sign if node.op == '-' else sign))
+        else:
+            terms[sign, f'({_nested_key(node.left)}{node.op}{_nested_key(node.right)})'] += 1
+    parts = [f'{"+" if sign > 0 else "-"}{count}d{dice_type}' for (sign, dice_type), count in pools.items()]
+    parts += [f'{"+" if sign > 0 else "-"}{count}*{term}' for (sign, term), count in terms.items()]
+    return ''.join(sorted(parts)), offset
+
+
+def _nested_key(expression: Expression) -> str:
+    key, offset = canonical_key(expression)
+    return f'{key}{offset:+d}'
+
+
+class DistributionCache:
+    def __init__(self, path: str = None, *,
+                 memory_bytes: int = DEFAULT_MEMORY_BYTES, disk_bytes: int = DEFAULT_DISK_BYTES):
+        """Two tier cache of distributions keyed by `canonical_key`.
+
+        The first tier is an in-process LRU. The second is an optional SQLite
+        file of packed float64 PMFs that several bot processes can share.
+        Both tiers evict their least recently used entries once they hold
+        more than their budget of bytes. Lookups read the file through their
+        own read-only connection, which never waits on a write in WAL mode.
+        Distributions put in the cache, and when distributions read from disk
+        were last used, are written in a thread when on the event loop.
+
+        Args:
+            path (str, optional): SQLite file for the second tier. Memory only if omitted.
+            memory_bytes (int, optional): Budget for the in-process tier.
+            disk_bytes (int, optional): Budget for the on-disk tier.
+
+        Attributes:
+            hits (int): Lookups answered from memory
+            disk_hits (int): Lookups answered from disk
+            misses (int): Lookups that weren't cached
+        """
+        self.path = path
+        self.memory_bytes = int(memory_bytes)
+        self.disk_bytes = int(disk_bytes)
+        self.hits = self.disk_hits = self.misses = 0
+        self._memory: OrderedDict[str, PMF] = OrderedDict()
+        self._memory_used = 0
+        # Guards the in-process tier, and separately each connection, so memory hits don't wait on disk
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        self._writes: set[asyncio.Task] = set()
+        # Keys read from disk whose `last_used` hasn't been written yet
+        self._used: dict[str, float] = {}
+        self._connection: sqlite3.Connection = None
+        self._reader: sqlite3.Connection = None
+        if path is not None:
+            self._connection = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(f"PRAGMA mmap_size={self.disk_bytes}")
+            self._connection.execute(_SCHEMA)
+            self._connection.commit()
+            self._reader = sqlite3.connect(f'{pathlib.Path(path).resolve().as_uri()}?mode=ro', uri=True,
+                                           check_same_thread=False, timeout=READ_TIMEOUT)
+            self._reader.execute(f"PRAGMA mmap_size={self.disk_bytes}")
+
+    def __repr__(self):
+        return (f'<DistributionCache path={self.path} entries={len(self._memory)} hits={self.hits} '
+                f'disk_hits={self.disk_hits} misses={self.misses}>')
+
+    def get(self, key: str) -> PMF | None:
+        with self._lock:
+            pmf = self._memory.get(key)
+            if pmf is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return pmf
+        pmf = self._load(key)
+        with self._lock:
+            if pmf is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, pmf)
+            # The first use since the last write schedules writing them all
+            first = not self._used
+            self._used[key] = time.time()
+        if first:
+            self._write(self._store_used)
+        return pmf
+
+    def put(self, key: str, pmf: PMF):
+        """Remember a distribution, and store it on disk. On the event loop
+        the disk write is left to a thread; see `flush`.
+        """
+        with self._lock:
+            self._remember(key, pmf)
+        self._write(self._store, key, pmf)
+
+    async def flush(self):
+        """Wait for the disk writes in progress"""
+        if self._writes:
+            await asyncio.gather(*self._writes)
+
+    def close(self):
+        with self._read_lock:
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
+        with self._disk_lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def _write(self, func, *args):
+        """Call `func(*args)` in a thread when on the event loop, otherwise straight away"""
+        if self._connection is None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            func(*args)
+            return
+        task = loop.create_task(asyncio.to_thread(func, *args))
+        self._writes.add(task)
+        task.add_done_callback(self._writes.discard)
+
+    def _remember(self, key: str, pmf: PMF):
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return
+        self._memory[key] = pmf
+        self._memory_used += _size(pmf)
+        while self._memory_used > self.memory_bytes and len(self._memory) > 1:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_used -= _size(evicted)
+
+    def _load(self, key: str) -> PMF | None:
+        with self._read_lock:
+            if self._reader is None:
+                return None
+            try:
+                row = self._reader.execute(
+                    "SELECT dense, offset, vals, probs FROM distributions WHERE key = ?", (key,)).fetchone()
+            except sqlite3.Error:
+                logger.warning("Failed to read a distribution from disk", exc_info=True)
+                return None
+        if row is None:
+            return None
+        dense, offset, values, probs = row
+        probs = _unpack(probs)
+        if dense:
+            return PMF.dense(offset, probs)
+        return PMF(tuple(int(value) if value.is_integer() else value for value in _unpack(values).tolist()), probs)
+
+    def _store(self, key: str, pmf: PMF):
+        size = _size(pmf)
+        if size > self.disk_bytes:
+            return
+        values = None if pmf.is_dense else _pack([float(value) for value in pmf.values])
+        offset = pmf.values[0] if pmf.is_dense else 0
+        with self._disk_lock:
+            if self._connection is None:
+                return
+            try:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO distributions VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, pmf.is_dense, offset, values, _pack(pmf.probs), size, time.time()))
+                self._evict_disk()
+                self._connection.commit()
+            except sqlite3.Error:
+                logger.exception("Failed to store distribution on disk")
+
+    def _store_used(self):
+        with self._lock:
+            used, self._used = self._used, {}
+        with self._disk_lock:
+            if self._connection is None or not used:
+                return
+            try:
+                self._connection.executemany("UPDATE distributions SET last_used = ? WHERE key = ?",
+                                             [(last_used, key) for key, last_used in used.items()])
+                self._connection.commit()
+            except sqlite3.Error:
+                logger.exception("Failed to record when distributions were used")
+
+    def _evict_disk(self):
+        used, = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM distributions").fetchone()
+        if used <= self.disk_bytes:
+            return
+        for key, size in self._connection.execute(
+                "SELECT key, size FROM distributions ORDER BY last_used").fetchall():
+            self._connection.execute("DELETE FROM distributions WHERE key = ?", (key,))
+            used -= size
+            if used <= self.disk_bytes:
+                break
+
+
+def _size(pmf: PMF) -> int:
+    return len(pmf) * (8 if pmf.is_dense else 16)
+
+
+def _pack(probs) -> bytes:
+    if np is not None:
+        return np.asarray(probs, dtype=np.float64).tobytes()
+    return array('d', probs).tobytes()
+
+
+def _unpack(blob: bytes):
+    if np is not None:
+        return np.frombuffer(blob, dtype=np.float64)
+    probs = array('d')
+    probs.frombytes(blob)
+    return probs
+
+
+distribution_cache = DistributionCache()
+
+
+def configure_distribution_cache(path: str = None, **kwargs):
+    """Replace the shared distribution cache, e.g. to add an on-disk tier
+
+    Args:
+        path (str, optional): SQLite file for the second tier. Memory only if omitted.
+        kwargs (dict): `memory_bytes` and/or `disk_bytes` budgets
+    """
+    global distribution_cache
+    distribution_cache.close()
+    distribution_cache = DistributionCache(path, **kwargs)
+    logger.info(f"Distribution cache: {distribution_cache}")
@@ -0,0 +1,190 @@
+import functools
+import logging
+from typing import NamedTuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from ..notation import (BinaryOp, Constant, DiceTerm, Expression, ParsedDice, RollPlan, UnaryOp, compile_notation,
+                        postfix, selection)
+from . import cache
+from .order_stats import keep_pmf, keep_work
+from .pmf import FFT_THRESHOLD, PMF, DistributionException
+
+__all__ = ['TermKey', 'distribution', 'stats_cost', 'term_key', 'term_pmf']
+
+logger = logging.getLogger(__name__)
+
+TERM_CACHE_SIZE = 256
+# Roughly how many probabilities NumPy updates in the time Python updates one
+VECTORIZED_STEPS = 1000
+
+
+class TermKey(NamedTuple):
+    """Everything that affects the distribution of a dice term. Terms which
+    only differ in how they're written or in their modifiers share a key.
+    """
+    num_dice: int  # Dice rolled
+    dice_type: int | str
+    start: int  # Slice of the sorted dice that are kept
+    stop: int
+    min_max: str | None
+    m_score: int
+
+
+def term_key(parsed_dice: ParsedDice) -> TermKey:
+    num_dice, start, stop = selection(parsed_dice)
+    min_max = parsed_dice.min_max
+    return TermKey(num_dice, parsed_dice.dice_type, start, stop,
+                   min_max, parsed_dice.m_score if min_max else 0)
+
+
+def distribution(notation: str) -> PMF:
+    """Exact distribution of the total of some dice notation
+
+    Args:
+        notation (str): dice notation
+
+    Raises:
+        NotationParseException: Invalid dice notation
+        DistributionException: The distribution is too large to work out
+
+    Returns:
+        PMF: Probability of each possible total
+    """
+    plan = compile_notation(notation)
+    key, offset = cache.canonical_key(plan.expression)
+    pmf = cache.distribution_cache.get(key)
+    if pmf is not None:
+        return pmf.shift(offset)
+    pmf = _evaluate(plan.expression)
+    cache.distribution_cache.put(key, pmf.shift(-offset))
+    return pmf
+
+
+def _evaluate(expression: Expression) -> PMF:
+    stack: list[PMF] = []
+    for node in postfix(expression):
+        if isinstance(node, Constant):
+            stack.append(PMF.point(node.value))
+        elif isinstance(node, DiceTerm):
+            stack.append(term_pmf(term_key(node.dice)))
+        elif isinstance(node, UnaryOp):
+            if node.op == '-':
+                stack[-1] = stack[-1].negate()
+        else:
+            right = stack.pop()
+            stack[-1] = _apply(node, stack[-1], right)
+    return stack[0]
+
+
+def _apply(node: BinaryOp, left: PMF, right: PMF) -> PMF:
+    if node.op == '+':
+        return left.add(right)
+    elif node.op == '-':
+        return left.add(right.negate())
+    elif node.op == '*':
+        return left.combine(right, lambda a, b: a * b)
+    elif 0 in right.values and right.probs[right.values.index(0)] > 0:
+        raise DistributionException("The odds can't be worked out when dividing by zero is possible")
+    return left.combine(right, lambda a, b: a / b)
+
+
+class _Cost(NamedTuple):
+    size: int  # Most possible values
+    integer: bool  # Only whole numbers are possible
+    work: int  # Steps taken in Python, counting vectorized steps as a fraction of one
+
+
+def stats_cost(plan: RollPlan) -> int:
+    """Estimate the work of working out the distribution of a plan, without working it out.
+
+    Adding whole numbers convolves their distributions, multiplying, dividing
+    or adding fractions pairs every value of one side with every value of the
+    other, and keeping or dropping dice is bounded by `keep_work`.
+
+    Args:
+        plan (RollPlan): compiled notation
+
+    Returns:
+        int: Roughly the number of probabilities updated in Python
+    """
+    stack: list[_Cost] = []
+    for node in postfix(plan.expression):
+        if isinstance(node, Constant):
+            stack.append(_Cost(1, isinstance(node.value, int), 0))
+        elif isinstance(node, DiceTerm):
+            stack.append(_term_cost(term_key(node.dice)))
+        elif isinstance(node, BinaryOp):
+            right = stack.pop()
+            stack[-1] = _apply_cost(node.op, stack[-1], right)
+    return stack[0].work
+
+
+def _term_cost(key: TermKey) -> _Cost:
+    low, high = _face_range(key.dice_type)
+    faces = high - low + 1
+    if key.start == 0 and key.stop == key.num_dice:
+        size = key.num_dice * (faces - 1) + 1
+        # Repeated doubling convolves about twice per bit of the number of dice
+        work = 2 * key.num_dice.bit_length() * _convolve_work(size // 2 + 1, size // 2 + 1)
+    elif key.start == 0 or key.stop == key.num_dice:
+        keep = min(key.stop - key.start, key.num_dice)
+        size = keep * (faces - 1) + 1
+        work = keep_work(faces, keep) // (VECTORIZED_STEPS if np is not None else 1)
+    else:
+        return _Cost(1, True, 0)
+    return _Cost(size, True, work + size if key.min_max else work)
+
+
+def _apply_cost(op: str, left: _Cost, right: _Cost) -> _Cost:
+    work = left.work + right.work
+    if op in '+-' and left.integer and right.integer:
+        return _Cost(left.size + right.size - 1, True, work + _convolve_work(left.size, right.size))
+    pairs = left.size * right.size
+    return _Cost(pairs, op != '/' and left.integer and right.integer, work + pairs)
+
+
+def _convolve_work(size: int, other_size: int) -> int:
+    if np is None:
+        return size * other_size
+    if min(size, other_size) < FFT_THRESHOLD:
+        return size * other_size // VECTORIZED_STEPS
+    total = size + other_size
+    return total * total.bit_length() // VECTORIZED_STEPS
+
+
+@functools.lru_cache(maxsize=TERM_CACHE_SIZE)
+def term_pmf(key: TermKey) -> PMF:
+    """Distribution of a single dice term, cached by its `TermKey`"""
+    logger.debug(f"Computing distribution of {key}")
+    low, high = _face_range(key.dice_type)
+    if key.start == 0 and key.stop == key.num_dice:
+        pmf = sum_pmf(key.num_dice, key.dice_type)
+    elif key.stop == key.num_dice:
+        pmf = keep_pmf(key.num_dice, low, high, key.stop - key.start, True)
+    elif key.start == 0:
+        pmf = keep_pmf(key.num_dice, low, high, key.stop, False)
+    else:
+        raise DistributionException("Only the highest or lowest dice can be kept")
+    if key.min_max == 'min':
+        pmf = pmf.clamp(low=key.m_score)
+    elif key.min_max == 'max':
+        pmf = pmf.clamp(high=key.m_score)
+    return pmf
+
+
+def _face_range(dice_type: int | str) -> tuple[int, int]:
+    return (-1, 1) if dice_type == 'f' else (1, dice_type)
+
+
+def die_pmf(dice_type: int | str) -> PMF:
+    return PMF.uniform(*_face_range(dice_type))
+
+
+@functools.lru_cache(maxsize=TERM_CACHE_SIZE)
+def sum_pmf(num_dice: int, dice_type: int | str) -> PMF:
+    """Distribution of the sum of `num_dice` dice"""
+    return die_pmf(dice_type).repeat(num_dice)
@@ -0,0 +1,124 @@
+import functools
+import logging
+import math
+from typing import MutableSequence
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .pmf import PMF, DistributionException
+
+__all__ = ['keep_pmf', 'keep_work']
+
+logger = logging.getLogger(__name__)
+
+KEEP_CACHE_SIZE = 256
+# Most probability updates for one keep/drop distribution
+MAX_WORK = 500_000_000 if np is not None else 5_000_000
+
+
+@functools.lru_cache(maxsize=KEEP_CACHE_SIZE)
+def keep_pmf(num_dice: int, low: int, high: int, keep: int, highest: bool) -> PMF:
+    """Exact distribution of the sum of the highest (or lowest) `keep` of
+    `num_dice` dice, each showing `low` to `high` with equal probability.
+
+    Args:
+        num_dice (int): Dice rolled
+        low (int): Lowest face of the dice
+        high (int): Highest face of the dice
+        keep (int): Number of dice kept
+        highest (bool): Keep the highest dice, otherwise the lowest
+
+    Raises:
+        DistributionException: Too much work to compute exactly
+
+    Returns:
+        PMF: Probability of each possible sum of the kept dice
+    """
+    keep = max(0, min(keep, num_dice))
+    if not highest:
+        # The lowest dice of a pool are the highest dice of the negated pool
+        return keep_pmf(num_dice, -high, -low, keep, True).negate()
+    logger.debug(f"Computing distribution of highest {keep} of {num_dice}d[{low}..{high}]")
+    if keep == 0:
+        return PMF.point(0)
+    return PMF.dense(keep * low, _keep_highest(num_dice, high - low + 1, keep))
+
+
+def keep_work(num_faces: int, keep: int) -> int:
+    """Bound on the probability updates for keeping `keep` dice with `num_faces` faces"""
+    return num_faces * keep * (keep + 1) // 2 * (keep * (num_faces - 1) + 1)
+
+
+def _keep_highest(num_dice: int, num_faces: int, keep: int) -> MutableSequence[float]:
+    """Distribution of the sum of the highest `keep` dice, as offsets from the lowest face.
+
+    The faces are visited from highest to lowest. At each face, the number
+    of still unassigned dice landing on it is binomial. The state is the
+    number of dice assigned so far, which (while fewer than `keep`) are all
+    kept. Once `keep` dice are assigned the rest don't affect the sum, so
+    the state moves straight to `done`.
+    """
+    width = keep * (num_faces - 1) + 1
+    if keep_work(num_faces, keep) > MAX_WORK:
+        raise DistributionException("There are too many dice to work out the odds of keeping or dropping them")
+    active: list[MutableSequence[float] | None] = [None] * keep
+    active[0] = _zeros(width)
+    active[0][0] = 1.0
+    done = _zeros(width)
+    for step in range(num_faces):
+        remaining_faces = num_faces - step
+        face_offset = num_faces - 1 - step
+        next_active: list[MutableSequence[float] | None] = [None] * keep
+        for assigned, sums in enumerate(active):
+            if sums is None:
+                continue
+            needed = keep - assigned
+            probs = _binomial_head(num_dice - assigned, 1 / remaining_faces, needed)
+            for count, prob in enumerate(probs[:needed]):
+                if prob:
+                    if next_active[assigned + count] is None:
+                        next_active[assigned + count] = _zeros(width)
+                    _add_shifted(next_active[assigned + count], sums, count * face_offset, prob)
+            if probs[needed]:
+                _add_shifted(done, sums, needed * face_offset, probs[needed])
+        active = next_active
+    return done
+
+
+def _binomial_head(trials: int, prob: float, cutoff: int) -> list[float]:
+    """Binomial probabilities of 0 to `cutoff - 1` successes, followed by
+    the probability of `cutoff` or more.
+    """
+    if prob >= 1.0:
+        head = [0.0] * cutoff
+        if trials < cutoff:
+            head[trials] = 1.0
+            return head + [0.0]
+        return head + [1.0]
+    log_prob, log_fail = math.log(prob), math.log1p(-prob)
+    head = []
+    for count in range(cutoff):
+        if count > trials:
+            head.append(0.0)
+            continue
+        log_comb = math.lgamma(trials + 1) - math.lgamma(count + 1) - math.lgamma(trials - count + 1)
+        head.append(math.exp(log_comb + count * log_prob + (trials - count) * log_fail))
+    return head + [max(0.0, 1.0 - math.fsum(head))]
+
+
+def _zeros(size: int) -> MutableSequence[float]:
+    return np.zeros(size) if np is not None else [0.0] * size
+
+
+def _add_shifted(target: MutableSequence[float], source: MutableSequence[float], shift: int, weight: float):
+    """Add `source * weight` to `target`, moved along by `shift`"""
+    size = len(target) - shift
+    if np is not None:
+        target[shift:] += source[:size] * weight
+    else:
+        for index in range(size):
+            if source[index]:
+                target[index + shift] += source[index] * weight
@@ -0,0 +1,240 @@
+import bisect
+import itertools
+import math
+from typing import Callable, Iterator, Sequence
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from ..notation.exceptions import NotationParseException
+
+__all__ = ['DistributionException', 'PMF']
+
+# Most possible totals a distribution may have
+MAX_SUPPORT = 1_000_000
+# Most multiplications for combining two distributions value by value, or
+# convolving them without NumPy
+MAX_PAIRWISE = 2_000_000
+# Distributions shorter than this are convolved directly, longer ones by FFT
+FFT_THRESHOLD = 64
+# Fractional values are rounded to this many decimal places, so the same
+# value reached by different sums of fractions is counted once
+DECIMAL_PLACES = 9
+
+
+class DistributionException(NotationParseException):
+    """The distribution can't be computed exactly"""
+
+
+class PMF:
+    __slots__ = ('values', 'probs', '_cumulative')
+
+    def __init__(self, values: Sequence[int | float], probs: Sequence[float]):
+        """Probability mass function of a discrete random variable.
+
+        Integer distributions are usually dense, with `values` being a `range`
+        (which may include impossible values with probability 0).
+
+        Args:
+            values (Sequence[int | float]): Possible values in ascending order
+            probs (Sequence[float]): Probability of each value
+        """
+        self.values = values
+        self.probs = probs
+        self._cumulative: list[float] = None
+
+    def __repr__(self):
+        return f'<PMF {self.min}..{self.max} mean={self.mean():.4g}>'
+
+    def __len__(self):
+        return len(self.values)
+
+    @classmethod
+    def point(cls, value: int | float) -> 'PMF':
+        """A value that's certain"""
+        return cls(range(value, value + 1) if isinstance(value, int) else (value,), [1.0])
+
+    @classmethod
+    def uniform(cls, low: int, high: int) -> 'PMF':
+        """Every integer from `low` to `high` (inclusive) is equally likely, like a die"""
+        size = high - low + 1
+        return cls(range(low, high + 1), [1 / size] * size)
+
+    @classmethod
+    def dense(cls, offset: int, probs: Sequence[float]) -> 'PMF':
+        return cls(range(offset, offset + len(probs)), probs)
+
+    @property
+    def is_dense(self) -> bool:
+        return isinstance(self.values, range)
+
+    @property
+    def min(self) -> int | float:
+        return next(value for value, _ in self.items())
+
+    @property
+    def max(self) -> int | float:
+        return next(value for value, prob in zip(reversed(self.values), reversed(self.probs)) if prob > 0)
+
+    def items(self) -> Iterator[tuple[int | float, float]]:
+        """Each possible value with its probability"""
+        return ((value, prob) for value, prob in zip(self.values, self.probs) if prob > 0)
+
+    def mean(self) -> float:
+        return math.fsum(value * prob for value, prob in zip(self.values, self.probs))
+
+    def variance(self) -> float:
+        mean = self.mean()
+        return math.fsum((value - mean) ** 2 * prob for value, prob in zip(self.values, self.probs))
+
+    def std(self) -> float:
+        return math.sqrt(self.variance())
+
+    def cumulative(self) -> list[float]:
+        """Probability of each value or less"""
+        if self._cumulative is None:
+            self._cumulative = list(itertools.accumulate(self.probs))
+        return self._cumulative
+
+    def percentile(self, percent: float) -> int | float:
+        """The smallest value at least `percent`% of outcomes are less than or equal to"""
+        cumulative = self.cumulative()
+        target = percent / 100 * cumulative[-1]
+        # Guard against rounding leaving the target just above the final sum
+        index = min(bisect.bisect_left(cumulative, target - 1e-12), len(cumulative) - 1)
+        return self.values[index]
+
+    def at_least(self, value: int | float) -> float:
+        """Probability of rolling `value` or more"""
+        index = bisect.bisect_left(self.values, value)
+        if index == 0:
+            return 1.0
+        return max(0.0, 1.0 - self.cumulative()[index - 1])
+
+    def negate(self) -> 'PMF':
+        if self.is_dense:
+            return PMF.dense(-self.values[-1], list(reversed(self.probs)))
+        return PMF(tuple(-value for value in reversed(self.values)), list(reversed(self.probs)))
+
+    def shift(self, offset: int | float) -> 'PMF':
+        """Distribution of this variable plus a constant"""
+        if not offset:
+            return self
+        if self.is_dense and isinstance(offset, int):
+            return PMF.dense(self.values[0] + offset, self.probs)
+        return PMF(tuple(_normalize(value + offset) for value in self.values), self.probs)
+
+    def clamp(self, low: int = None, high: int = None) -> 'PMF':
+        """Raise values below `low` to `low` and lower values above `high` to `high`"""
+        def clamp_value(value):
+            if low is not None and value < low:
+                return low
+            if high is not None and value > high:
+                return high
+            return value
+        return self.map(clamp_value)
+
+    def map(self, func: Callable[[int | float], int | float]) -> 'PMF':
+        """Distribution of `func` applied to this variable"""
+        masses = {}
+        for value, prob in self.items():
+            result = _normalize(func(value))
+            masses[result] = masses.get(result, 0.0) + prob
+        return _from_masses(masses)
+
+    def combine(self, other: 'PMF', func: Callable[[int | float, int | float], int | float]) -> 'PMF':
+        """Distribution of `func` applied to this and another independent variable"""
+        if len(self) * len(other) > MAX_PAIRWISE:
+            raise DistributionException("There are too many possible totals to work out the odds")
+        masses = {}
+        other_items = list(other.items())
+        for value, prob in self.items():
+            for other_value, other_prob in other_items:
+                result = _normalize(func(value, other_value))
+                masses[result] = masses.get(result, 0.0) + prob * other_prob
+        return _from_masses(masses)
+
+    def add(self, other: 'PMF') -> 'PMF':
+        """Distribution of the sum of this and another independent variable"""
+        if len(self) == 1 or len(other) == 1:
+            if self.is_dense and other.is_dense:
+                return PMF.dense(self.values[0] + other.values[0], self.probs if len(other) == 1 else other.probs)
+            return self.combine(other, lambda a, b: a + b)
+        elif not (_is_integer(self) and _is_integer(other)):
+            return self.combine(other, lambda a, b: a + b)
+        offset, probs = self.values[0], _dense_probs(self)
+        other_offset, other_probs = other.values[0], _dense_probs(other)
+        return PMF.dense(offset + other_offset, convolve(probs, other_probs))
+
+    def repeat(self, times: int) -> 'PMF':
+        """Distribution of the sum of `times` independent copies of this variable"""
+        result = PMF.point(0)
+        power = self
+        while times:
+            if times & 1:
+                result = result.add(power)
+            times >>= 1
+            if times:
+                power = power.add(power)
+        return result
+
+
+def convolve(probs: Sequence[float], other_probs: Sequence[float]) -> Sequence[float]:
+    """Convolve two dense probability sequences, using FFT for long ones when NumPy is installed
+
+    Raises:
+        DistributionException: The result would be too large
+    """
+    size = len(probs) + len(other_probs) - 1
+    if size > MAX_SUPPORT:
+        raise DistributionException("There are too many possible totals to work out the odds")
+    if np is not None:
+        if min(len(probs), len(other_probs)) < FFT_THRESHOLD:
+            return np.convolve(probs, other_probs)
+        fft_size = 1 << (size - 1).bit_length()
+        result = np.fft.irfft(np.fft.rfft(probs, fft_size) * np.fft.rfft(other_probs, fft_size), fft_size)[:size]
+        np.clip(result, 0.0, None, out=result)
+        return result / result.sum()
+    if len(probs) * len(other_probs) > MAX_PAIRWISE:
+        raise DistributionException("Working out these odds needs NumPy installed")
+    result = [0.0] * size
+    for index, prob in enumerate(probs):
+        if prob:
+            for other_index, other_prob in enumerate(other_probs, start=index):
+                result[other_index] += prob * other_prob
+    return result
+
+
+def _is_integer(pmf: PMF) -> bool:
+    return pmf.is_dense or all(isinstance(value, int) for value in pmf.values)
+
+
+def _dense_probs(pmf: PMF) -> Sequence[float]:
+    if pmf.is_dense:
+        return pmf.probs
+    offset = pmf.values[0]
+    size = pmf.values[-1] - offset + 1
+    if size > MAX_SUPPORT:
+        raise DistributionException("There are too many possible totals to work out the odds")
+    probs = [0.0] * size
+    for value, prob in zip(pmf.values, pmf.probs):
+        probs[value - offset] = prob
+    return probs
+
+
+def _normalize(value: int | float) -> int | float:
+    """Whole numbers as `int` so they can be convolved, and fractions rounded"""
+    if isinstance(value, float):
+        value = round(value, DECIMAL_PLACES)
+        if value.is_integer():
+            return int(value)
+    return value
+
+
+def _from_masses(masses: dict[int | float, float]) -> PMF:
+    values = sorted(masses)
+    if all(isinstance(value, int) for value in values) and values[-1] - values[0] + 1 == len(values):
+        return PMF.dense(values[0], [masses[value] for value in values])
+    return PMF(tuple(values), [masses[value] for value in values])
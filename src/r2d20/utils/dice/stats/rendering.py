@@ -0,0 +1,60 @@
+import discord
+
+from ..notation import normalize_notation
+from .engine import distribution
+from .pmf import PMF
+
+__all__ = ['create_embed_for_stats']
+
+MAX_CHART_ROWS = 20
+CHART_WIDTH = 20
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def create_embed_for_stats(notation: str, at_least: int | float = None) -> discord.Embed:
+    """Create an embed describing the exact odds of some dice notation
+
+    Args:
+        notation (str): dice notation
+        at_least (int | float, optional): Also show the chance of rolling this or more
+
+    Returns:
+        discord.Embed: Embed with a chart of the distribution and its statistics
+    """
+    pmf = distribution(notation)
+    embed = discord.Embed(title=f"Odds for {normalize_notation(notation)}",
+                          description=f"```\n{chart(pmf)}\n```")
+    embed.add_field(name='Mean', value=f'{pmf.mean():.2f}')
+    embed.add_field(name='Std dev', value=f'{pmf.std():.2f}')
+    embed.add_field(name='Range', value=f'{_number(pmf.min)} to {_number(pmf.max)}')
+    percentiles = ', '.join(f'{percent}%: {_number(pmf.percentile(percent))}' for percent in PERCENTILES)
+    embed.add_field(name='Percentiles', value=percentiles, inline=False)
+    if at_least is not None:
+        embed.add_field(name=f'Chance of {_number(at_least)} or more',
+                        value=f'{pmf.at_least(at_least):.2%}', inline=False)
+    return embed
+
+
+def chart(pmf: PMF) -> str:
+    """Text bar chart of a distribution, grouping totals into ranges if there are many"""
+    items = list(pmf.items())
+    if len(items) > MAX_CHART_ROWS:
+        bucket_size = -(-len(items) // MAX_CHART_ROWS)
+        rows = []
+        for index in range(0, len(items), bucket_size):
+            bucket = items[index:index + bucket_size]
+            label = f'{_number(bucket[0][0])}-{_number(bucket[-1][0])}'
+            rows.append((label, sum(prob for _, prob in bucket)))
+    else:
+        rows = [(_number(value), prob) for value, prob in items]
+    label_width = max(len(label) for label, _ in rows)
+    highest = max(prob for _, prob in rows)
+    lines = []
+    for label, prob in rows:
+        bar = '█' * round(prob / highest * CHART_WIDTH)
+        lines.append(f'{label:>{label_width}} {bar:<{CHART_WIDTH}} {prob:6.2%}')
+    return '\n'.join(lines)
+
+
+def _number(value: int | float) -> str:
+    return f'{round(value, 2):g}' if isinstance(value, float) else str(value)
@@ -0,0 +1,295 @@
+import bisect
+import functools
+import logging
+import math
+import time
+from typing import Any, Awaitable, Callable, Iterator
+
+import discord
+from discord import Interaction, app_commands
+
+__all__ = ['Histogram', 'Metrics', 'MetricsServer', 'MetricsTree', 'Timer', 'metrics', 'timed_callback']
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds of the latency buckets, from a fast parse to a reply that missed Discord's deadline
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Help text of each metric, in the order they are exported
+METRIC_HELP = {
+    'r2d20_command_seconds': "Time from receiving an app command to it finishing",
+    'r2d20_view_seconds': "Time taken by a button callback",
+    'r2d20_phase_seconds': "Time taken by each phase of a reply, by command",
+    'r2d20_command_errors_total': "App commands that raised, by exception type",
+    'r2d20_loop_lag_seconds': "How late the event loop woke a sleeping task",
+    'r2d20_loop_blocked_total': "Times the event loop was blocked for longer than the watchdog allows",
+    'r2d20_games_open': "Lobbies and games open, by game and state",
+    'r2d20_games_closed_total': "Lobbies and games closed, by game and how they ended",
+}
+
+Labels = tuple[tuple[str, str], ...]
+
+
+class Histogram:
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds: tuple[float, ...] = LATENCY_BUCKETS):
+        """Counts of observations falling in each bucket, as Prometheus histograms export them
+
+        Args:
+            bounds (tuple[float, ...], optional): Upper bound of each bucket, ascending.
+                Defaults to `LATENCY_BUCKETS`.
+        """
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def __repr__(self):
+        return f'<Histogram count={self.count} sum={self.sum:.3f}>'
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by interpolating within its bucket, like Prometheus' `histogram_quantile`"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                if index == len(self.bounds):
+                    return self.bounds[-1]
+                low = self.bounds[index - 1] if index else 0.0
+                return low + (self.bounds[index] - low) * (rank - seen) / count
+            seen += count
+        return self.bounds[-1]
+
+    def cumulative(self) -> Iterator[tuple[str, int]]:
+        """Each bucket's `le` label with the observations up to it"""
+        total = 0
+        for bound, count in zip(self.bounds + (math.inf,), self.counts):
+            total += count
+            yield ('+Inf' if bound == math.inf else repr(bound)), total
+
+
+class Timer:
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram: Histogram):
+        """Context manager recording the seconds spent in its block in a histogram, even if it raises"""
+        self.histogram = histogram
+        self.start = 0.0
+
+    def __enter__(self) -> 'Timer':
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> bool:
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+class Metrics:
+    def __init__(self):
+        """Latency histograms, counters and gauges, kept in memory and exported in Prometheus' text format
+
+        Attributes:
+            histograms (dict[str, dict[Labels, Histogram]]): Histograms by metric name and labels
+            counters (dict[str, dict[Labels, int]]): Counters by metric name and labels
+            gauges (dict[str, dict[Labels, float]]): Gauges by metric name and labels
+        """
+        self.histograms: dict[str, dict[Labels, Histogram]] = {}
+        self.counters: dict[str, dict[Labels, int]] = {}
+        self.gauges: dict[str, dict[Labels, float]] = {}
+        # Phase histograms by phase and command, so timing a phase doesn't build its labels
+        self._phases: dict[tuple[str, str | None], Histogram] = {}
+
+    def __repr__(self):
+        return (f'<Metrics histograms={len(self.histograms)} counters={len(self.counters)} '
+                f'gauges={len(self.gauges)}>')
+
+    def observe(self, name: str, value: float, **labels: str):
+        """Record a value in the histogram `name` with these labels"""
+        self._histogram(name, tuple(sorted(labels.items()))).observe(value)
+
+    def increment(self, name: str, amount: int = 1, **labels: str):
+        """Add to the counter `name` with these labels"""
+        series = self.counters.setdefault(name, {})
+        key = tuple(sorted(labels.items()))
+        series[key] = series.get(key, 0) + amount
+
+    def set_gauge(self, name: str, value: float, **labels: str):
+        """Set the gauge `name` with these labels"""
+        self.gauges.setdefault(name, {})[tuple(sorted(labels.items()))] = value
+
+    def time(self, name: str, **labels: str) -> Timer:
+        """Record the seconds spent in the block in the histogram `name`, even if it raises"""
+        return Timer(self._histogram(name, tuple(sorted(labels.items()))))
+
+    def phase(self, phase: str, interaction: Interaction = None) -> Timer:
+        """Time a phase of a reply: `parse`, `roll`, `render`, `stats`, `offload` (a whole job in
+        the process pool) or `discord` (a round trip to Discord's API), labelled with the command
+        being replied to if the interaction is given
+        """
+        command = _command_name(interaction) if interaction is not None else None
+        if (histogram := self._phases.get((phase, command))) is None:
+            labels = (('phase', phase),) if command is None else (('command', command), ('phase', phase))
+            histogram = self._phases[phase, command] = self._histogram('r2d20_phase_seconds', labels)
+        return Timer(histogram)
+
+    def render(self) -> str:
+        """Every metric in Prometheus' text exposition format"""
+        lines = []
+        for name in sorted(self.histograms, key=_export_order):
+            lines.extend(_header(name, 'histogram'))
+            for labels, histogram in sorted(self.histograms[name].items()):
+                for le, count in histogram.cumulative():
+                    lines.append(f'{name}_bucket{_format_labels(labels + (("le", le),))} {count}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {histogram.sum!r}')
+                lines.append(f'{name}_count{_format_labels(labels)} {histogram.count}')
+        for name in sorted(self.counters, key=_export_order):
+            lines.extend(_header(name, 'counter'))
+            for labels, value in sorted(self.counters[name].items()):
+                lines.append(f'{name}{_format_labels(labels)} {value}')
+        for name in sorted(self.gauges, key=_export_order):
+            lines.extend(_header(name, 'gauge'))
+            for labels, value in sorted(self.gauges[name].items()):
+                lines.append(f'{name}{_format_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def summary(self, name: str, label: str) -> list[tuple[str, int, float, float]]:
+        """Count, median and 99th percentile of the histogram `name` for each value of `label`
+
+        Returns:
+            list[tuple[str, int, float, float]]: One row per label value, busiest first
+        """
+        merged: dict[str, Histogram] = {}
+        for labels, histogram in self.histograms.get(name, {}).items():
+            value = dict(labels).get(label, '')
+            total = merged.setdefault(value, Histogram(histogram.bounds))
+            total.counts = [mine + theirs for mine, theirs in zip(total.counts, histogram.counts)]
+            total.sum += histogram.sum
+            total.count += histogram.count
+        rows = [(value, histogram.count, histogram.quantile(0.5), histogram.quantile(0.99))
+                for value, histogram in merged.items()]
+        return sorted(rows, key=lambda row: row[1], reverse=True)
+
+    def reset(self):
+        self.histograms.clear()
+        self.counters.clear()
+        self.gauges.clear()
+        self._phases.clear()
+
+    def _histogram(self, name: str, key: Labels) -> Histogram:
+        series = self.histograms.setdefault(name, {})
+        if (histogram := series.get(key)) is None:
+            histogram = series[key] = Histogram()
+        return histogram
+
+
+# Shared by the bot, its cogs and its views
+metrics = Metrics()
+
+
+def timed_callback(view: str):
+    """Time a view's button callback in `r2d20_view_seconds`, labelled by view and callback name.
+    Apply it beneath `discord.ui.button`.
+
+    The time is recorded in the client's `metrics`, since views may import this module under
+    another name than the bot does.
+    """
+    def decorator(func: Callable[..., Awaitable[Any]]):
+        @functools.wraps(func)
+        async def wrapper(self, interaction: Interaction, item: discord.ui.Item):
+            registry = getattr(getattr(interaction, 'client', None), 'metrics', metrics)
+            with registry.time('r2d20_view_seconds', view=view, action=func.__name__):
+                return await func(self, interaction, item)
+        return wrapper
+    return decorator
+
+
+class MetricsTree(app_commands.CommandTree):
+    """Command tree timing every app command and counting the errors they raise"""
+    metrics = metrics
+
+    async def interaction_check(self, interaction: Interaction) -> bool:
+        interaction.extras['received_at'] = time.perf_counter()
+        return True
+
+    async def on_error(self, interaction: Interaction, error: app_commands.AppCommandError):
+        command = _command_name(interaction)
+        if isinstance(error, app_commands.CommandInvokeError):
+            error_type = type(error.original).__name__
+        else:
+            error_type = type(error).__name__
+        self.metrics.increment('r2d20_command_errors_total', command=command, error=error_type)
+        self.record(interaction, 'error')
+        await super().on_error(interaction, error)
+
+    def record(self, interaction: Interaction, outcome: str):
+        """Record how long a command took, if it was timed"""
+        if (received_at := interaction.extras.get('received_at')) is not None:
+            self.metrics.observe('r2d20_command_seconds', time.perf_counter() - received_at,
+                                 command=_command_name(interaction), outcome=outcome)
+
+
+class MetricsServer:
+    def __init__(self, metrics: Metrics = metrics, host: str = '127.0.0.1', port: int = 9100):
+        """Serves the metrics at `/metrics` for Prometheus to scrape
+
+        Args:
+            metrics (Metrics, optional): The metrics to serve. Defaults to the shared metrics.
+            host (str, optional): Address to listen on. Defaults to localhost only.
+            port (int, optional): Port to listen on. Defaults to 9100.
+        """
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self._runner = None
+
+    async def start(self):
+        from aiohttp import web
+        app = web.Application()
+        app.router.add_get('/metrics', self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info(f"Serving metrics on http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle(self, request):
+        from aiohttp import web
+        return web.Response(text=self.metrics.render(), content_type='text/plain', charset='utf-8',
+                            headers={'X-Content-Type-Options': 'nosniff'})
+
+
+def _command_name(interaction: Interaction) -> str:
+    return interaction.command.qualified_name if interaction.command is not None else 'unknown'
+
+
+def _export_order(name: str) -> tuple[int, str]:
+    return (list(METRIC_HELP).index(name) if name in METRIC_HELP else len(METRIC_HELP)), name
+
+
+def _header(name: str, metric_type: str) -> list[str]:
+    lines = [f'# TYPE {name} {metric_type}']
+    if name in METRIC_HELP:
+        lines.insert(0, f'# HELP {name} {METRIC_HELP[name]}')
+    return lines
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
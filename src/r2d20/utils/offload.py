@@ -0,0 +1,199 @@
+import asyncio
+import collections
+import concurrent.futures
+import logging
+import multiprocessing
+import os
+import signal
+import statistics
+import time
+from typing import Any, Callable
+
+__all__ = ['JobTimeoutException', 'OffloadBusyException', 'OffloadException', 'Offloader']
+
+logger = logging.getLogger(__name__)
+
+# Latest job timings kept for the statistics
+LATENCY_SAMPLES = 1000
+# Extra time allowed for a worker to report its own timeout before giving up on it
+DEADLINE_GRACE = 0.5
+
+
+class OffloadException(Exception):
+    """A job couldn't be run in the process pool"""
+
+
+class OffloadBusyException(OffloadException):
+    """Too many jobs are already waiting for a worker"""
+
+
+class JobTimeoutException(OffloadException):
+    """A job wasn't finished by its deadline"""
+
+
+class Offloader:
+    def __init__(self, max_workers: int = None, max_queue: int = 32, timeout: float = 10.0,
+                 initializer: Callable[[], Any] = None):
+        """Runs CPU heavy work in a pool of processes so it can't stall the event loop.
+
+        At most `max_workers` jobs are handed to the pool at once. Up to
+        `max_queue` more wait for a worker, and any beyond that are rejected
+        straight away. Each job must finish within its timeout, which
+        includes the time spent waiting. Workers enforce the deadline
+        themselves where the platform supports `signal.setitimer`, so
+        abandoned jobs don't keep a worker busy.
+
+        Args:
+            max_workers (int, optional): Worker processes. Defaults to the number of CPUs, up to 4.
+            max_queue (int, optional): Most jobs waiting for a worker. Defaults to 32.
+            timeout (float, optional): Seconds a job may take by default. Defaults to 10.
+            initializer (Callable[[], Any], optional): Called in each worker when it starts.
+                Must be picklable.
+
+        Attributes:
+            completed (int): Jobs that finished, successfully or not
+            failed (int): Jobs that raised an exception other than a timeout
+            timed_out (int): Jobs that missed their deadline
+            rejected (int): Jobs turned away because the queue was full
+        """
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.initializer = initializer
+        self.completed = self.failed = self.timed_out = self.rejected = 0
+        self._executor: concurrent.futures.ProcessPoolExecutor = None
+        self._slots = asyncio.Semaphore(self.max_workers)
+        self._waiting = 0
+        self._running = 0
+        self._waits = collections.deque(maxlen=LATENCY_SAMPLES)
+        self._latencies = collections.deque(maxlen=LATENCY_SAMPLES)
+
+    def __repr__(self):
+        return (f'<Offloader workers={self.max_workers} waiting={self._waiting} running={self._running} '
+                f'completed={self.completed}>')
+
+    @property
+    def queue_depth(self) -> int:
+        """Jobs waiting for a worker"""
+        return self._waiting
+
+    async def run(self, func: Callable[..., Any], *args, timeout: float = None, inline: bool = False) -> Any:
+        """Run `func(*args)` in a worker process and wait for the result
+
+        Args:
+            func (Callable[..., Any]): Module level function to call. It, its arguments
+                and its result must be picklable.
+            timeout (float, optional): Seconds the job may take, including waiting for a worker.
+                Defaults to the offloader's timeout.
+            inline (bool, optional): Call `func` directly instead, for work that's cheap. Defaults to False.
+
+        Raises:
+            OffloadBusyException: The queue is full
+            JobTimeoutException: The job wasn't finished in time
+
+        Returns:
+            Any: The result of `func`
+        """
+        if inline:
+            return func(*args)
+        if self._waiting >= self.max_queue:
+            self.rejected += 1
+            raise OffloadBusyException("I'm too busy to work that out right now, try again in a moment")
+        timeout = self.timeout if timeout is None else timeout
+        queued = time.monotonic()
+        deadline = queued + timeout
+        if self._slots.locked():
+            self._waiting += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), timeout)
+            except TimeoutError:
+                self.timed_out += 1
+                raise JobTimeoutException("That took too long to work out") from None
+            finally:
+                self._waiting -= 1
+        else:
+            await self._slots.acquire()
+        started = time.monotonic()
+        self._waits.append(started - queued)
+        self._running += 1
+        try:
+            future = self._get_executor().submit(_call_with_deadline, deadline - started, func, args)
+            try:
+                return await asyncio.wait_for(asyncio.wrap_future(future), deadline - started + DEADLINE_GRACE)
+            except TimeoutError:
+                raise JobTimeoutException("That took too long to work out") from None
+        except JobTimeoutException:
+            self.timed_out += 1
+            raise
+        except concurrent.futures.process.BrokenProcessPool:
+            logger.exception("Process pool broke, it will be replaced")
+            self._executor = None
+            self.failed += 1
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self._running -= 1
+            self._slots.release()
+            self.completed += 1
+            self._latencies.append(time.monotonic() - queued)
+
+    def stats(self) -> dict[str, int | float]:
+        """Counters and timings for sizing the pool
+
+        Returns:
+            dict[str, int | float]: Queue depth, job counts, and the median and
+                99th percentile of recent wait and total job times in seconds
+        """
+        return {
+            'workers': self.max_workers,
+            'waiting': self._waiting,
+            'running': self._running,
+            'completed': self.completed,
+            'failed': self.failed,
+            'timed_out': self.timed_out,
+            'rejected': self.rejected,
+            'wait_p50': _percentile(self._waits, 50),
+            'wait_p99': _percentile(self._waits, 99),
+            'latency_p50': _percentile(self._latencies, 50),
+            'latency_p99': _percentile(self._latencies, 99),
+        }
+
+    def shutdown(self):
+        """Stop the workers, abandoning any queued jobs"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _get_executor(self) -> concurrent.futures.ProcessPoolExecutor:
+        if self._executor is None:
+            # Forking a process with a running event loop and threads isn't safe
+            self._executor = concurrent.futures.ProcessPoolExecutor(
+                self.max_workers, mp_context=multiprocessing.get_context('spawn'), initializer=self.initializer)
+        return self._executor
+
+
+def _call_with_deadline(timeout: float, func: Callable[..., Any], args: tuple) -> Any:
+    """Run in a worker, interrupting `func` if it's still going after `timeout` seconds"""
+    if timeout <= 0:
+        raise JobTimeoutException("That took too long to work out")
+    if not hasattr(signal, 'setitimer'):
+        return func(*args)
+    previous = signal.signal(signal.SIGALRM, _alarm)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return func(*args)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _alarm(signum, frame):
+    raise JobTimeoutException("That took too long to work out")
+
+
+def _percentile(samples: collections.deque, percent: int) -> float:
+    if len(samples) < 2:
+        return samples[0] if samples else 0.0
+    return statistics.quantiles(samples, n=100, method='inclusive')[percent - 1]
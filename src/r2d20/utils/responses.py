@@ -0,0 +1,137 @@
+import asyncio
+import collections
+import logging
+import statistics
+from typing import Any, Awaitable
+
+import discord
+from discord import Interaction
+
+from .metrics import metrics
+
+__all__ = ['Responder', 'reply_error']
+
+logger = logging.getLogger(__name__)
+
+# Discord fails an interaction that isn't acknowledged within this many seconds
+RESPONSE_DEADLINE = 3.0
+# Latest acknowledgement margins kept for the statistics
+MARGIN_SAMPLES = 1000
+
+
+class Responder:
+    def __init__(self, safety_margin: float = 0.75):
+        """Replies to interactions, deferring when the reply may miss Discord's deadline.
+
+        Replies predicted to be slow are deferred straight away and sent as
+        a followup. Others are sent directly, unless the work is still going
+        `safety_margin` seconds before the deadline, when it is deferred
+        after all.
+
+        Args:
+            safety_margin (float, optional): Seconds before the deadline to give up
+                waiting and defer. Defaults to 0.75.
+
+        Attributes:
+            paths (collections.Counter[str]): Replies by how they were delivered:
+                `direct`, `deferred` (predicted slow) or `late` (deferred at the last moment)
+            missed (int): Interactions that expired before being acknowledged
+        """
+        self.safety_margin = safety_margin
+        self.paths: collections.Counter[str] = collections.Counter()
+        self.missed = 0
+        self._margins = collections.deque(maxlen=MARGIN_SAMPLES)
+
+    def __repr__(self):
+        return f'<Responder paths={dict(self.paths)} missed={self.missed}>'
+
+    async def send(self, interaction: Interaction, reply: Awaitable[dict[str, Any]] | dict[str, Any], *,
+                   slow: bool = False, ephemeral: bool = False):
+        """Acknowledge an interaction in time and send the reply once it's ready
+
+        Args:
+            interaction (Interaction): Interaction to reply to
+            reply (Awaitable[dict[str, Any]] | dict[str, Any]): The keyword arguments of the
+                message, e.g. `{'embed': embed, 'view': view}`, or an awaitable producing them
+            slow (bool, optional): The reply is expected to take a while. Defaults to False.
+            ephemeral (bool, optional): Only show the reply to the user. Defaults to False.
+        """
+        if slow:
+            try:
+                await self._defer(interaction, 'deferred', ephemeral)
+            except BaseException:
+                # The caller made the coroutine, so close it rather than leave it never awaited
+                if asyncio.iscoroutine(reply):
+                    reply.close()
+                raise
+            kwargs = reply if isinstance(reply, dict) else await reply
+            with metrics.phase('discord', interaction):
+                await interaction.followup.send(**kwargs, ephemeral=ephemeral)
+            return
+        if isinstance(reply, dict):
+            kwargs = reply
+        else:
+            task = asyncio.ensure_future(reply)
+            remaining = RESPONSE_DEADLINE - self.safety_margin - _age(interaction)
+            done, _ = await asyncio.wait((task,), timeout=max(0.0, remaining))
+            if not done:
+                try:
+                    await self._defer(interaction, 'late', ephemeral)
+                except BaseException:
+                    task.cancel()
+                    raise
+                kwargs = await task
+                with metrics.phase('discord', interaction):
+                    await interaction.followup.send(**kwargs, ephemeral=ephemeral)
+                return
+            kwargs = task.result()
+        self._record(interaction, 'direct')
+        try:
+            with metrics.phase('discord', interaction):
+                await interaction.response.send_message(**kwargs, ephemeral=ephemeral)
+        except discord.NotFound:
+            self.missed += 1
+            raise
+
+    def stats(self) -> dict[str, int | float]:
+        """How replies were delivered, and how close they came to the deadline
+
+        Returns:
+            dict[str, int | float]: Count of each path and of missed interactions,
+                and the lowest and median seconds to spare when acknowledging
+        """
+        margins = self._margins
+        return {
+            **{path: self.paths[path] for path in ('direct', 'deferred', 'late')},
+            'missed': self.missed,
+            'margin_min': min(margins, default=0.0),
+            'margin_p50': statistics.median(margins) if margins else 0.0,
+        }
+
+    async def _defer(self, interaction: Interaction, path: str, ephemeral: bool):
+        self._record(interaction, path)
+        try:
+            with metrics.phase('discord', interaction):
+                await interaction.response.defer(ephemeral=ephemeral, thinking=True)
+        except discord.NotFound:
+            self.missed += 1
+            raise
+
+    def _record(self, interaction: Interaction, path: str):
+        margin = RESPONSE_DEADLINE - _age(interaction)
+        self.paths[path] += 1
+        self._margins.append(margin)
+        logger.debug(f"Replying to interaction {interaction.id} ({path}) with {margin:.3f}s to spare")
+
+
+async def reply_error(interaction: Interaction, message: str, ephemeral: bool = False):
+    """Send an error message, as a followup if the interaction was already acknowledged"""
+    if interaction.response.is_done():
+        await interaction.followup.send(message, ephemeral=ephemeral)
+    else:
+        await interaction.response.send_message(message, ephemeral=ephemeral)
+
+
+def _age(interaction: Interaction) -> float:
+    """Seconds since Discord created the interaction"""
+    return (discord.utils.utcnow() - interaction.created_at).total_seconds()
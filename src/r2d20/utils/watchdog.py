@@ -0,0 +1,141 @@
+import asyncio
+import collections
+import logging
+import sys
+import threading
+import time
+import traceback
+
+from .metrics import Metrics
+
+__all__ = ['LoopBlockedException', 'LoopWatchdog', 'Stack']
+
+logger = logging.getLogger(__name__)
+
+# Innermost frames kept of each blocking stack
+STACK_DEPTH = 8
+# Latest loop lags kept for the statistics
+LAG_SAMPLES = 1000
+
+Stack = tuple[tuple[str, int, str], ...]
+
+
+class LoopBlockedException(Exception):
+    """The event loop was blocked for longer than allowed"""
+
+
+class LoopWatchdog:
+    def __init__(self, threshold: float = 0.1, interval: float = 0.02, *, depth: int = STACK_DEPTH,
+                 samples: int | None = LAG_SAMPLES, metrics: Metrics = None):
+        """Measures event loop lag, and samples the loop's stack from another thread whenever it's blocked.
+
+        A heartbeat task on the loop wakes every `interval` seconds and
+        records how late it woke. A watchdog thread checks the heartbeat
+        just as often, and while it's more than `threshold` seconds late
+        it samples what the loop's thread is running with
+        `sys._current_frames`. Samples are counted by call stack, so the
+        counts show which calls block the loop and for roughly how long.
+
+        Args:
+            threshold (float, optional): Seconds late that counts as blocked. Defaults to 0.1.
+            interval (float, optional): Seconds between heartbeats and between samples. Defaults to 0.02.
+            depth (int, optional): Innermost frames kept of each stack. Defaults to `STACK_DEPTH`.
+            samples (int | None, optional): Latest lags kept, `None` to keep them all. Defaults to `LAG_SAMPLES`.
+            metrics (Metrics, optional): Also record lags in `r2d20_loop_lag_seconds`, and blocks in
+                `r2d20_loop_blocked_total`.
+
+        Attributes:
+            blocked (collections.Counter[Stack]): Samples taken while blocked, by stack
+            episodes (int): Times the loop became blocked
+            lags (collections.deque[float]): Seconds each heartbeat woke late
+        """
+        self.threshold = threshold
+        self.interval = interval
+        self.depth = depth
+        self.metrics = metrics
+        self.blocked: collections.Counter[Stack] = collections.Counter()
+        self.episodes = 0
+        self.lags: collections.deque[float] = collections.deque(maxlen=samples)
+        self._beat = 0.0
+        self._loop_thread: int = None
+        self._task: asyncio.Task = None
+        self._thread: threading.Thread = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f'<LoopWatchdog threshold={self.threshold} episodes={self.episodes} samples={self.blocked.total()}>'
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self):
+        """Start watching the running event loop. Must be called from the loop's thread."""
+        if self.running:
+            return
+        self._loop_thread = threading.get_ident()
+        self._beat = time.perf_counter()
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._heartbeat(), name='loop-watchdog')
+        self._thread = threading.Thread(target=self._watch, name='loop-watchdog', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def call_sites(self, limit: int = None) -> list[tuple[Stack, int]]:
+        """The stacks sampled while blocked with their counts, most frequent first"""
+        with self._lock:
+            return self.blocked.most_common(limit)
+
+    def report(self, limit: int = 5) -> str:
+        """The most frequent blocking stacks, each with roughly how long the loop was blocked there"""
+        lines = []
+        for stack, count in self.call_sites(limit):
+            lines.append(f"{count} sample(s), ~{count * self.interval:.2f}s:")
+            lines.append(format_stack(stack))
+        return '\n'.join(lines)
+
+    async def _heartbeat(self):
+        while True:
+            start = self._beat = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - start - self.interval)
+            self.lags.append(lag)
+            if self.metrics is not None:
+                self.metrics.observe('r2d20_loop_lag_seconds', lag)
+
+    def _watch(self):
+        blocked = False
+        while not self._stopping.wait(self.interval):
+            late = time.perf_counter() - self._beat - self.interval
+            if late < self.threshold:
+                blocked = False
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            stack = tuple((summary.filename, summary.lineno, summary.name)
+                          for summary in traceback.extract_stack(frame, limit=self.depth))
+            del frame
+            with self._lock:
+                self.blocked[stack] += 1
+                if not blocked:
+                    self.episodes += 1
+            if not blocked:
+                blocked = True
+                if self.metrics is not None:
+                    self.metrics.increment('r2d20_loop_blocked_total')
+                logger.warning(f"Event loop blocked for {late:.3f}s, in:\n{format_stack(stack)}")
+
+
+def format_stack(stack: Stack) -> str:
+    """A stack like a traceback, innermost call last"""
+    return '\n'.join(f'  File "{filename}", line {lineno}, in {name}' for filename, lineno, name in stack)
@@ -0,0 +1,63 @@
+import unittest
+
+from r2d20.games.dice.bones import BonesEngine, BonesRules, IllegalMoveException, rulesets
+
+
+def scripted(*results: int):
+    """A roller returning `results` in order"""
+    results = iter(results)
+    return lambda sides: next(results)
+
+
+class TestBonesEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.rules = BonesRules(title='Test', dice_sides=4, init_dice=1, init_dice_sides=6, target_score=10)
+
+    def test_turns(self):
+        engine = BonesEngine(self.rules, [(1, 'a'), (2, 'b')], scripted(5, 6, 4, 4))
+        self.assertEqual([player.score for player in engine.players], [5, 6])
+        self.assertEqual(engine.current_player.name, 'a')
+        self.assertEqual(engine.roll(), 4)
+        engine.stand()
+        self.assertEqual(engine.current_player.id, 2)
+        # Reaching the target ends the turn
+        engine.roll()
+        self.assertTrue(engine.is_over)
+        self.assertIsNone(engine.current_player)
+        self.assertEqual([player.name for player in engine.winners], ['b'])
+        self.assertEqual(list(engine.dice(engine.players[1])), [(6, 6), (4, 4)])
+        with self.assertRaises(IllegalMoveException):
+            engine.stand()
+
+    def test_bust(self):
+        engine = BonesEngine(self.rules, [(1, 'a'), (2, 'b')], scripted(6, 6, 3, 4))
+        engine.roll()
+        engine.roll()
+        self.assertTrue(engine.players[0].bust)
+        engine.stand()
+        self.assertEqual(engine.winners, [engine.players[1]])
+
+    def test_variant_target(self):
+        rules = BonesRules(title='Test', dice_sides=4, init_dice=1, init_dice_sides=6, target_score=10,
+                           variant_rules=True)
+        engine = BonesEngine(rules, [(1, 'a'), (2, 'b')], scripted(6, 6, 4, 4, 1))
+        engine.roll()
+        self.assertEqual(engine.target_score, 11)
+        engine.roll()
+        engine.roll()
+        # 11 was under the old target, but meets the new one
+        self.assertFalse(engine.players[1].bust)
+        self.assertEqual(len(engine.winners), 1)
+        self.assertEqual(engine.winners[0].id, 2)
+
+    def test_everyone_busts(self):
+        engine = BonesEngine(self.rules, [(1, 'a')], scripted(6, 3, 4))
+        engine.roll()
+        engine.roll()
+        self.assertEqual(engine.winners, [])
+
+    def test_player_records(self):
+        engine = BonesEngine(rulesets['baldurs_bones'], [(1, 'a')])
+        self.assertFalse(hasattr(engine.players[0], '__dict__'))
+        self.assertEqual(len(engine.players[0].rolls), 3)
@@ -0,0 +1,80 @@
+import random
+import unittest
+
+from r2d20.games.dice.bones import BonesEngine, rulesets
+from r2d20.games.dice.bones.simulation import SimulationStrategy, np, parse_strategy, simulate, tournament
+
+
+@unittest.skipUnless(np is not None, "NumPy is not installed")
+class TestSimulation(unittest.TestCase):
+
+    def test_matches_engine(self):
+        """The vectorised games follow the engine's rules"""
+        for name in ('baldurs_bones', 'variant_knuckles'):
+            with self.subTest(ruleset=name):
+                rules = rulesets[name]
+                margin = rules.dice_sides - 2
+                engine_games = 4000
+                wins = [0.0] * 3
+                busts = [0] * 3
+                raised = 0
+                rng = random.Random(1)
+                for _ in range(engine_games):
+                    engine = BonesEngine(rules, [(seat, str(seat)) for seat in range(3)],
+                                         lambda sides: rng.randint(1, sides))
+                    while not engine.is_over:
+                        target = engine.target_score
+                        if engine.current_player.score < target - margin:
+                            engine.roll()
+                        else:
+                            engine.stand()
+                        raised += engine.target_score - target
+                    for winner in engine.winners:
+                        wins[winner.id] += 1 / len(engine.winners)
+                    for player in engine.players:
+                        busts[player.id] += player.bust
+                strategy = parse_strategy(f'threshold:{margin}', rules, 3)
+                result = simulate(rules, 3, [strategy], 100_000, np.random.default_rng(1))
+                for seat in range(3):
+                    self.assertAlmostEqual(result.wins[seat] / result.games, wins[seat] / engine_games, delta=0.03)
+                    self.assertAlmostEqual(result.busts[seat] / result.games, busts[seat] / engine_games,
+                                           delta=0.03)
+                self.assertAlmostEqual(result.target_raised / result.games, raised / engine_games, delta=0.05)
+
+    def test_totals(self):
+        rules = rulesets['baldurs_bones']
+        result = simulate(rules, 4, [parse_strategy('random:0.5', rules, 4)], 10_000, np.random.default_rng(2))
+        self.assertAlmostEqual(sum(result.wins) + result.everyone_bust, result.games)
+        self.assertEqual(sum(result.lengths), result.games)
+        self.assertEqual(result.strategies, ('random:0.5',) * 4)
+
+    def test_optimal_beats_threshold(self):
+        rules = rulesets['baldurs_bones']
+        strategies = [parse_strategy(spec, rules, 2) for spec in ('threshold:4', 'optimal')]
+        result = simulate(rules, 2, strategies, 50_000, np.random.default_rng(3))
+        self.assertGreater(result.wins[1], result.wins[0])
+
+    def test_tournament(self):
+        results = list(tournament(['kobolds_knuckles'], [2, 3], ['optimal'], 2500, batch_size=1000, workers=1,
+                                  seed=5))
+        self.assertEqual(sorted(batch for batch, _ in results), list(range(6)))
+        self.assertEqual(sum(result.games for _, result in results), 5000)
+        again = list(tournament(['kobolds_knuckles'], [2, 3], ['optimal'], 2500, batch_size=1000, workers=1,
+                                seed=5))
+        self.assertEqual([result.wins for _, result in results], [result.wins for _, result in again])
+        merged = results[0][1]
+        merged.merge(results[1][1])
+        self.assertEqual(merged.games, 2000)
+        rows = list(merged.rows(0))
+        self.assertIn({'metric': 'ties', 'value': merged.ties},
+                      [{'metric': row['metric'], 'value': row['value']} for row in rows])
+
+    def test_unknown_strategy(self):
+        with self.assertRaises(ValueError):
+            parse_strategy('cautious', rulesets['baldurs_bones'], 2)
+
+    def test_incomplete_strategy(self):
+        class Cautious(SimulationStrategy):
+            name = 'cautious'
+        with self.assertRaises(TypeError):
+            Cautious(rulesets['baldurs_bones'], 2)
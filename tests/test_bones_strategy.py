@@ -0,0 +1,121 @@
+import functools
+import os
+import tempfile
+import unittest
+
+from r2d20.games.dice.bones import BonesGame, BonesRules, BonesStrategy, load_strategy, rulesets
+from r2d20.games.lobby import LobbyView
+from r2d20.testing import FakeBot, FakeInteraction, StrictLoopTestCase, click
+
+
+def reference_hints(rules: BonesRules):
+    """The same model as the solver, written as plain recursion"""
+    sides = rules.dice_sides
+
+    def next_target(score, target):
+        return target + 1 if rules.variant_rules and score == target else target
+
+    @functools.cache
+    def opening():
+        scores = {0: 1.0}
+        for _ in range(rules.init_dice):
+            rolled = {}
+            for total, chance in scores.items():
+                for face in range(1, rules.init_dice_sides + 1):
+                    rolled[total + face] = rolled.get(total + face, 0.0) + chance / rules.init_dice_sides
+            scores = rolled
+        return scores
+
+    @functools.cache
+    def stand(score, best, after, target):
+        return 0.0 if score < best else all_fail(after, next_target(score, target), score)
+
+    @functools.cache
+    def roll(score, best, after, target):
+        return sum(value(score + face, best, after, target) for face in range(1, sides + 1)) / sides
+
+    @functools.cache
+    def value(score, best, after, target):
+        if score > target:
+            return 0.0
+        if score == target:
+            return stand(score, best, after, target)
+        return max(stand(score, best, after, target), roll(score, best, after, target))
+
+    @functools.cache
+    def fails(score, best, after, target):
+        """A player on `score` doesn't beat `best`, and nor do the players after them"""
+        if score > target:
+            return all_fail(after, target, best)
+        if score == target or roll(score, best, after, target) <= stand(score, best, after, target):
+            return all_fail(after, next_target(score, target), best) if score <= best else 0.0
+        return sum(fails(score + face, best, after, target) for face in range(1, sides + 1)) / sides
+
+    @functools.cache
+    def all_fail(players, target, best):
+        if players == 0:
+            return 1.0
+        return sum(chance * fails(score, best, players - 1, target) for score, chance in opening().items())
+
+    return stand, roll
+
+
+class TestBonesStrategy(unittest.TestCase):
+
+    def test_matches_reference(self):
+        for variant in (False, True):
+            rules = BonesRules(title='Test', dice_sides=3, init_dice=1, init_dice_sides=3, target_score=7,
+                               variant_rules=variant)
+            strategy = BonesStrategy.solve(rules, max_players=4)
+            stand, roll = reference_hints(rules)
+            for after in range(4):
+                for target in range(7, 7 + (4 - after if variant else 1)):
+                    for best in range(target + 1):
+                        for score in range(target):
+                            with self.subTest(variant=variant, after=after, target=target, best=best, score=score):
+                                hint = strategy.hint(score, best, after, target)
+                                self.assertAlmostEqual(hint.stand_chance, stand(score, best, after, target))
+                                self.assertAlmostEqual(hint.roll_chance, roll(score, best, after, target))
+
+    def test_last_player(self):
+        strategy = BonesStrategy.solve(rulesets['baldurs_bones'])
+        self.assertTrue(strategy.hint(16, 17, 0, 21).roll)
+        hint = strategy.hint(17, 17, 0, 21)
+        self.assertFalse(hint.roll)
+        self.assertEqual(hint.chance, 1.0)
+        self.assertEqual(strategy.hint(22, 0, 0, 21).chance, 0.0)
+
+    def test_cache(self):
+        rules = rulesets['variant_knuckles']
+        with tempfile.TemporaryDirectory() as path:
+            solved = load_strategy(rules, 4, path)
+            self.assertEqual(len(os.listdir(path)), 1)
+            cached = load_strategy(rules, 4, path)
+            self.assertIsNot(cached, solved)
+            for hint, expected in zip(cached.hint(6, 7, 2, 11), solved.hint(6, 7, 2, 11)):
+                self.assertAlmostEqual(hint, expected, places=6)
+            # Other rules don't share a cache file
+            load_strategy(rulesets['kobolds_knuckles'], 4, path)
+            self.assertEqual(len(os.listdir(path)), 2)
+
+
+class TestHintButton(StrictLoopTestCase):
+
+    async def test_hint(self):
+        host = FakeInteraction()
+        lobby = LobbyView(host)
+        await click(lobby, lobby.join, FakeInteraction())
+        strategy = BonesStrategy.solve(rulesets['baldurs_bones'])
+        game = BonesGame(FakeBot(), lobby=lobby, ruleset_name='baldurs_bones', strategy=strategy)
+        self.assertIn(game.hint, game.children)
+        interaction = FakeInteraction(host.user)
+        await click(game, game.hint, interaction)
+        name, args, kwargs = interaction.response.calls[0]
+        self.assertEqual(name, 'send_message')
+        self.assertTrue(kwargs['ephemeral'])
+        self.assertIn('chance to win', args[0])
+        game.stop()
+
+        plain = BonesGame(FakeBot(), lobby=lobby, ruleset_name='baldurs_bones')
+        self.assertNotIn(plain.hint, plain.children)
+        plain.stop()
@@ -0,0 +1,85 @@
+import unittest
+
+from r2d20.utils.dice.notation import batch, vectorized
+from r2d20.utils.dice.notation.batch import check_repeat, roll_batch, split_repeat
+from r2d20.utils.dice.notation.compiling import compile_notation
+from r2d20.utils.dice.notation.cost import estimate_cost
+from r2d20.utils.dice.notation.exceptions import NotationParseException
+from r2d20.utils.dice.rng import RollStream
+
+
+class TestRollBatch(unittest.TestCase):
+
+    def test_split_repeat(self):
+        cases = {
+            "6x 4d6kh3": (6, "4d6kh3"),
+            "10X d20+5": (10, "d20+5"),
+            "4d6kh3": (1, "4d6kh3"),
+            "2x(d8+3)*2": (2, "(d8+3)*2"),
+        }
+        for notation, expected in cases.items():
+            with self.subTest(value=notation):
+                self.assertEqual(split_repeat(notation), expected)
+
+    def test_check_repeat(self):
+        check_repeat(1)
+        check_repeat(batch.MAX_REPEAT)
+        for times in (0, -1, batch.MAX_REPEAT + 1):
+            with self.subTest(value=times):
+                with self.assertRaises(NotationParseException):
+                    check_repeat(times)
+
+    def test_bounds(self):
+        cases = {
+            "4d6kh3": (3, 18),
+            "d20@adv+5": (6, 25),
+            "(d8+3)*2-d4": (4, 21),
+            "3d6min4": (4, 18),
+            "10d4max12": (10, 12),
+            "4df": (-4, 4),
+        }
+        for times in (6, 1000):
+            for notation, (low, high) in cases.items():
+                with self.subTest(value=(times, notation)):
+                    rolled = roll_batch(compile_notation(notation), times, RollStream(seed=7).reserve())
+                    self.assertEqual(len(rolled.totals), times)
+                    self.assertGreaterEqual(rolled.min, low)
+                    self.assertLessEqual(rolled.max, high)
+                    self.assertTrue(low <= rolled.mean <= high)
+                    self.assertEqual(len(rolled.rows), 0 if batch.vectorizes(times) else times)
+
+    def test_replay(self):
+        plan = compile_notation("4d6kh3+d20")
+        for times in (6, 1000):
+            with self.subTest(value=times):
+                first = roll_batch(plan, times, RollStream(seed=99).reserve())
+                self.assertEqual(first.totals, roll_batch(plan, times, first.seed).totals)
+
+    @unittest.skipUnless(vectorized.available, "NumPy is not installed")
+    def test_vectorized_distribution(self):
+        rolled = roll_batch(compile_notation("4d6kh3"), 20_000, RollStream(seed=3).reserve())
+        # The mean of 4d6 keep highest 3 is about 12.24
+        self.assertAlmostEqual(rolled.mean, 12.24, delta=0.1)
+
+    def test_divide_by_zero(self):
+        for times in (6, 1000):
+            with self.subTest(value=times):
+                with self.assertRaises(NotationParseException):
+                    roll_batch(compile_notation("d6/(d4*0)"), times)
+
+    def test_genstats(self):
+        stats = sorted(roll_batch(compile_notation("4d6kh3"), 6).totals)
+        self.assertEqual(len(stats), 6)
+        self.assertTrue(all(3 <= stat <= 18 for stat in stats))
+
+    def test_cost(self):
+        plan = compile_notation("4d6kh3")
+        single = estimate_cost(plan)
+        repeated = estimate_cost(plan, 6)
+        self.assertEqual(repeated.dice, 6 * single.dice)
+        self.assertEqual(repeated.selection, 6 * single.selection)
+        self.assertLessEqual(estimate_cost(plan, batch.MAX_REPEAT).output, 4096)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import asyncio
+
+from r2d20.testing import StrictLoopTestCase
+from r2d20.utils.dice.buffers import DiceBuffers
+from r2d20.utils.dice.rng import BACKENDS, RollStream
+
+
+class TestDiceBuffers(StrictLoopTestCase):
+
+    async def test_take_and_replay(self):
+        for backend in BACKENDS:
+            if backend == 'secrets':
+                continue
+            with self.subTest(value=backend):
+                buffers = DiceBuffers(backend, dice=(20,), block_size=8, blocks=2, low_water=1)
+                buffers.refill()
+                self.assertEqual(buffers.buffers[20].remaining, 16)
+                stream = RollStream(backend)
+                results = [buffers.roll(20, 3, stream) for _ in range(4)]
+                # The third roll doesn't fit in the rest of the first block, so it starts the second
+                self.assertEqual([seed.skip for _, seed in results[:3]], [0, 3, 0])
+                self.assertEqual(buffers.hits[20], 4)
+                for rolls, seed in results[:3]:
+                    replayed = seed.source().roll(seed.skip + 3, 1, 20)[seed.skip:]
+                    self.assertEqual(rolls, replayed)
+
+    async def test_replay_mixed_sizes(self):
+        for backend in BACKENDS:
+            if backend == 'secrets':
+                continue
+            with self.subTest(value=backend):
+                buffers = DiceBuffers(backend, dice=(20,), block_size=8, blocks=2, low_water=1)
+                buffers.refill()
+                stream = RollStream(backend)
+                results = [(num_dice, *buffers.roll(20, num_dice, stream)) for num_dice in (1, 2, 1, 4, 1, 3)]
+                self.assertEqual([seed.skip for _, _, seed in results], [0, 1, 3, 4, 0, 1])
+                for num_dice, rolls, seed in results:
+                    replayed = seed.source().roll(seed.skip + num_dice, 1, 20)[seed.skip:]
+                    self.assertEqual(rolls, replayed)
+
+    async def test_underflow(self):
+        buffers = DiceBuffers(dice=(6,), block_size=4, blocks=1, low_water=1)
+        stream = RollStream()
+        rolls, seed = buffers.roll(6, 2, stream)
+        self.assertEqual(buffers.underflows[6], 1)
+        self.assertEqual(seed.backend, stream.backend)
+        self.assertEqual(seed.offset, 0)
+        self.assertTrue(all(1 <= die <= 6 for die in rolls))
+        # Dice without a buffer, too many dice, and other backends are drawn directly
+        buffers.refill()
+        for die, num_dice, backend in ((7, 1, 'stdlib'), (6, 5, 'stdlib'), (6, 1, 'secrets')):
+            with self.subTest(value=(die, num_dice, backend)):
+                self.assertEqual(len(buffers.roll(die, num_dice, RollStream(backend))[0]), num_dice)
+        self.assertEqual(buffers.hits[6], 0)
+        self.assertEqual(buffers.underflows[6], 1)
+
+    async def test_background_refill(self):
+        buffers = DiceBuffers(dice=(4,), block_size=10, blocks=3, low_water=2)
+        buffers.start()
+        try:
+            self.assertEqual(buffers.refills[4], 3)
+            for _ in range(12):
+                buffers.roll(4, 1, RollStream())
+            await asyncio.sleep(0)
+            await asyncio.sleep(0)
+            self.assertEqual(buffers.refills[4], 4)
+            self.assertGreaterEqual(buffers.buffers[4].remaining, 20)
+            self.assertEqual(buffers.stats()['underflows'], 0)
+        finally:
+            buffers.stop()
@@ -0,0 +1,183 @@
+import unittest
+
+from r2d20.utils.dice.notation.compiling import (clear_plan_cache, compile_notation, configure_limits,
+                                                 normalize_notation, plan_cache_info)
+from r2d20.utils.dice.notation.cost import (Admission, CostBudget, RollCostException, admit, budget_for,
+                                            configure_budget, estimate_cost)
+from r2d20.utils.dice.notation.counts import FaceCounts
+from r2d20.utils.dice.notation.parsing import NotationParseException, ParsedDice, limits
+from r2d20.utils.dice.notation.results import DiceResult, select_array, select_dice, to_array
+from r2d20.utils.dice.notation import vectorized
+
+
+class TestCompileNotation(unittest.TestCase):
+
+    def setUp(self):
+        clear_plan_cache()
+
+    def test_normalize(self):
+        test_cases = [
+            ("d20+5", "d20+5"),
+            (" D20 + 5 ", "d20+5"),
+            ("4d6\tKH3", "4d6kh3"),
+        ]
+        for notation, expected in test_cases:
+            with self.subTest(value=notation):
+                self.assertEqual(normalize_notation(notation), expected)
+
+    def test_cache_hits(self):
+        plan = compile_notation("d20+5")
+        self.assertIs(compile_notation("D20 + 5"), plan)
+        info = plan_cache_info()
+        self.assertEqual((info.hits, info.misses), (1, 1))
+
+    def test_parsed_terms(self):
+        plan = compile_notation("2d20kl1min5+2-4d4")
+        self.assertListEqual(plan.parsed, [
+            ParsedDice(notation="2d20kl1min5+2-", num_dice=2, dice_type=20,
+                       keep_drop="k", high_low="l", kd_num_dice=1, min_max="min",
+                       m_score=5, modifier="+2", more="-"),
+            ParsedDice(notation="4d4", num_dice=4, dice_type=4),
+        ])
+
+    def test_roll_bounds(self):
+        test_cases = [
+            ("d20+5", 6, 25),
+            ("4d6kh3", 3, 18),
+            ("4d6dl1", 3, 18),
+            ("2d20@adv+7", 8, 27),
+            ("3d6max10", 3, 10),
+            ("d4min3*2", 6, 8),
+            ("4df", -4, 4),
+        ]
+        for notation, low, high in test_cases:
+            plan = compile_notation(notation)
+            with self.subTest(value=notation):
+                for _ in range(50):
+                    self.assertTrue(low <= plan.roll().total <= high)
+
+    def test_invalid_not_cached(self):
+        for case in ["4d6k", f"{limits.max_num_dice + 1}d6", f"d{limits.max_dice_type + 1}"]:
+            with self.subTest(value=case):
+                with self.assertRaises(NotationParseException):
+                    compile_notation(case)
+        self.assertEqual(plan_cache_info().currsize, 0)
+
+    def test_configure_limits(self):
+        original = limits.max_num_dice
+        try:
+            compile_notation("20d6")
+            configure_limits(max_num_dice=10)
+            with self.assertRaises(NotationParseException):
+                compile_notation("20d6")
+        finally:
+            configure_limits(max_num_dice=original)
+
+    def test_large_pool_keep(self):
+        result = compile_notation("100d6kh3").roll()
+        self.assertEqual(len(result.rolled[0].raw_results), 100)
+        self.assertEqual(len(result.rolled[0].results), 3)
+        self.assertEqual(result.total, sum(result.rolled[0].results))
+
+
+class TestFaceCounts(unittest.TestCase):
+
+    def test_select(self):
+        # Sorted pool: 1 1 1 2 3 3 3 3 6
+        pool = FaceCounts(1, [3, 1, 4, 0, 0, 1])
+        test_cases = [
+            ((0, 9), [3, 1, 4, 0, 0, 1]),
+            ((6, 9), [0, 0, 2, 0, 0, 1]),
+            ((0, 2), [2, 0, 0, 0, 0, 0]),
+            ((2, 5), [1, 1, 1, 0, 0, 0]),
+            ((4, 4), [0, 0, 0, 0, 0, 0]),
+        ]
+        for (start, stop), expected in test_cases:
+            with self.subTest(value=(start, stop)):
+                self.assertListEqual(pool.select(start, stop).counts, expected)
+
+    def test_totals(self):
+        pool = FaceCounts(-1, [2, 5, 4])
+        self.assertEqual(len(pool), 11)
+        self.assertEqual(pool.total(), 2)
+        self.assertListEqual(pool.without(pool.select(0, 2)).counts, [0, 5, 4])
+
+
+class TestDiceResult(unittest.TestCase):
+
+    def test_select_dice(self):
+        faces = to_array([3, 1, 3, 6, 1])
+        cases = {
+            (0, 5): [3, 1, 3, 6, 1],
+            (2, 5): [3, 3, 6],  # keep highest 3, the first 3s rolled
+            (0, 2): [1, 1],
+            (4, 5): [6],
+            (0, 1): [1],
+            (3, 3): [],
+        }
+        for (start, stop), expected in cases.items():
+            with self.subTest(value=(start, stop)):
+                result = select_dice(faces, start, stop)
+                self.assertListEqual(result.kept_faces(), expected)
+                self.assertEqual(result.total, sum(expected))
+                self.assertEqual(result.num_kept, len(expected))
+        self.assertEqual(select_dice(faces, 2, 5).kept, 0b01101)
+
+    def test_dice(self):
+        result = DiceResult.from_indices(to_array([4, 2, 5]), [0, 2])
+        self.assertListEqual(list(result.dice()), [(4, True), (2, False), (5, True)])
+        self.assertEqual(result.total, 9)
+        raw, kept = result.face_counts()
+        self.assertListEqual(raw.counts, [1, 0, 1, 1])
+        self.assertListEqual(kept.counts, [0, 0, 1, 1])
+
+    @unittest.skipUnless(vectorized.available, "NumPy is not installed")
+    def test_select_array(self):
+        faces = vectorized.np.array([3, 1, 3, 6, 1, 5, 2] * 20)
+        for start, stop in [(0, 140), (130, 140), (0, 10), (139, 140), (5, 5)]:
+            with self.subTest(value=(start, stop)):
+                result = select_array(faces, start, stop)
+                expected = sorted(faces.tolist())[start:stop]
+                self.assertListEqual(sorted(result.kept_faces()), expected)
+                self.assertEqual(result.total, sum(expected))
+
+    def test_roller(self):
+        result = compile_notation("4d6kh3").roll()
+        roller = result.rolled[0]
+        self.assertIsInstance(roller.result, DiceResult)
+        self.assertEqual(len(roller.raw_results), 4)
+        self.assertEqual(sorted(roller.results), sorted(roller.raw_results)[1:])
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+class TestRollCost(unittest.TestCase):
+
+    def test_estimate(self):
+        cost = estimate_cost(compile_notation("4d6kh3+d20@adv*2-3"))
+        self.assertEqual(cost.dice, 6)
+        self.assertEqual(cost.selection, 4 * 2 + 2 * 1)
+        self.assertEqual(cost.operations, 3)
+        self.assertGreater(cost.output, len("4d6kh3[**6**, **5**, **4**, ~~1~~]+d20@adv[**20**, ~~3~~]*2-3 = 40"))
+        self.assertEqual(estimate_cost(compile_notation("2d6")).selection, 0)
+
+    def test_admit(self):
+        budget = CostBudget(inline_dice=10, max_dice=20)
+        self.assertIs(admit(estimate_cost(compile_notation("9d6")), budget), Admission.INLINE)
+        self.assertIs(admit(estimate_cost(compile_notation("5d6+5d6")), budget), Admission.OFFLOAD)
+        with self.assertRaisesRegex(RollCostException, "draws 21 dice, but at most 20"):
+            admit(estimate_cost(compile_notation("10d6+11d6")), budget)
+        budget = CostBudget(max_operations=2)
+        with self.assertRaisesRegex(RollCostException, "3 operations"):
+            admit(estimate_cost(compile_notation("1+2+3+d4")), budget)
+
+    def test_guild_budget(self):
+        configure_budget(1234, max_dice=5)
+        self.assertEqual(budget_for(1234).max_dice, 5)
+        self.assertEqual(budget_for(1234).max_operations, budget_for(None).max_operations)
+        self.assertNotEqual(budget_for(None).max_dice, 5)
+        self.assertIs(budget_for(4321), budget_for(None))
+        with self.assertRaises(TypeError):
+            configure_budget(1234, max_sides=5)
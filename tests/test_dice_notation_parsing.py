@@ -1,6 +1,7 @@
 import unittest
 
-from r2d20.utils.dice.notation.parsing import NOTATION_PATTERN, DiceNotationParser, ParsedDice
+from r2d20.utils.dice.notation.parsing import (NOTATION_PATTERN, DiceNotationParser, NotationParseException,
+                                               ParsedDice, compile_expression)
 
 
 class TestDiceNotationParser(unittest.TestCase):
@@ -44,6 +45,39 @@ class TestDiceNotationParser(unittest.TestCase):
                     parser._parse()
 
 
+    def test_parseFailPositions(self):
+        test_cases = [
+            ("4d6k", 4),
+            ("d20+", 4),
+            ("(d20", 4),
+            ("d20)", 3),
+            ("d20 x", 3),
+            ("2d6+(", 5),
+            ("d0", 1),
+            ("2d6+3d00kh1", 6),
+        ]
+        for case, position in test_cases:
+            with self.subTest(value=case):
+                with self.assertRaises(NotationParseException) as context:
+                    DiceNotationParser(notation=case)._parse()
+                self.assertEqual(context.exception.position, position)
+
+    def test_evaluate(self):
+        test_cases = [
+            ("d20-d4", [10, 3], 7),
+            ("d20+5*2", [10], 20),
+            ("(d6+1)*2", [3], 8),
+            ("2*(d4+d4)/4", [1, 3], 2),
+            ("-d4+10", [4], 6),
+            ("d6-(d4-2)", [6, 1], 7),
+        ]
+        for notation, values, expected in test_cases:
+            with self.subTest(value=notation):
+                parser = DiceNotationParser(notation=notation)
+                parser._parse()
+                self.assertEqual(compile_expression(parser.expression)(values), expected)
+
+
 class TestNotationPattern(unittest.TestCase):
 
     def test_matches_notation(self):
@@ -0,0 +1,57 @@
+import unittest
+
+from r2d20.utils.dice.notation import vectorized
+from r2d20.utils.dice.notation.compiling import compile_notation
+from r2d20.utils.dice.notation.counts import FaceCounts
+from r2d20.utils.dice.notation.rendering import (EMBED_DESCRIPTION_LIMIT, RenderBuffer, create_embed_for_batch,
+                                                 decorate_results, join_parts, render_result, write_results)
+from r2d20.utils.dice.notation.results import select_dice, select_pool
+from r2d20.utils.dice.rng import RollStream
+
+
+class TestRendering(unittest.TestCase):
+
+    def test_decorate_results(self):
+        self.assertEqual(decorate_results(select_dice([6, 1, 4, 1], 1, 4)), "[**6**, **1**, **4**, ~~1~~]")
+        self.assertEqual(decorate_results(select_dice([], 0, 0)), "[]")
+        pool = FaceCounts(1, [3, 0, 1])
+        self.assertEqual(decorate_results(select_pool(pool, 1, 4)), "[**1**×2, ~~1~~×1, **3**×1]")
+
+    def test_join_parts(self):
+        parts = [(str(index), 1) for index in range(100)]
+        text, complete = join_parts(parts, 30)
+        self.assertFalse(complete)
+        self.assertLessEqual(len(text), 30)
+        self.assertTrue(text.startswith("[0, 1, "))
+        self.assertRegex(text, r"…and \d+ more\]$")
+        shown = text.count(",")
+        self.assertIn(f"…and {100 - shown} more", text)
+        self.assertEqual(join_parts(parts[:3], 30), ("[0, 1, 2]", True))
+
+    def test_histogram_fallback(self):
+        raw = [1, 2, 3, 4, 5, 6] * 200
+        buffer = RenderBuffer(200)
+        write_results(buffer, select_dice(raw, 1000, 1200))
+        self.assertEqual(str(buffer), "[~~1~~×200, ~~2~~×200, ~~3~~×200, ~~4~~×200, ~~5~~×200, **6**×200]")
+
+    def test_bounded(self):
+        notations = ["100d20", "100d1000dl10+100d1000", "(d8+3)*2-100d4"]
+        if vectorized.available:
+            notations += ["1000d1000dl10+1000d1000", "1000000d6kh3"]
+        for notation in notations:
+            with self.subTest(value=notation):
+                rolled = compile_notation(notation).roll(RollStream(seed=5).reserve())
+                for limit in (EMBED_DESCRIPTION_LIMIT, 150):
+                    rendered = render_result(rolled, limit)
+                    self.assertLessEqual(len(rendered), limit)
+                    self.assertTrue(rendered.endswith(f" = {rolled.total}"))
+                    self.assertTrue(rendered.startswith(notation[:2]))
+
+    def test_batch_bounded(self):
+        embed = create_embed_for_batch("100d20", 40, RollStream(seed=5).reserve())
+        self.assertLessEqual(len(embed.description), EMBED_DESCRIPTION_LIMIT)
+        self.assertRegex(embed.description, r"…and \d+ more$")
+
+
+if __name__ == '__main__':
+    unittest.main()
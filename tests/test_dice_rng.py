@@ -0,0 +1,88 @@
+import unittest
+
+from r2d20.utils.dice.notation import counts
+from r2d20.utils.dice.notation.compiling import compile_notation
+from r2d20.utils.dice.notation.parsing import DiceNotationParser
+from r2d20.utils.dice.rng import BACKENDS, BLOCK_DRAWS, DiceSource, RollSeed, RollStream, RollStreams
+
+
+class TestRollStream(unittest.TestCase):
+
+    def test_replay(self):
+        notations = ["4d6kh3+d20@adv", "60d6kl10", "4df"]
+        if counts.available:
+            notations.append("5000d20dl100")
+        for backend in BACKENDS:
+            if backend == 'secrets':
+                continue
+            stream = RollStream(backend, seed=1234)
+            for notation in notations:
+                with self.subTest(value=(backend, notation)):
+                    plan = compile_notation(notation)
+                    first = plan.roll(stream.reserve())
+                    replayed = plan.roll(first.seed)
+                    self.assertEqual(first.total, replayed.total)
+                    self.assertEqual([str(roller.raw_results) for roller in first.rolled],
+                                     [str(roller.raw_results) for roller in replayed.rolled])
+
+    def test_offsets(self):
+        stream = RollStream('stdlib', seed=42)
+        seeds = [stream.reserve() for _ in range(3)]
+        self.assertEqual([seed.offset for seed in seeds], [0, 1, 2])
+        # Any roll can be replayed without the ones before it
+        self.assertEqual(RollStream('stdlib', seed=42, offset=2).next()[0].roll(10, 1, 20),
+                         seeds[2].source().roll(10, 1, 20))
+        self.assertNotEqual(seeds[0].source().roll(10, 1, 20), seeds[1].source().roll(10, 1, 20))
+        self.assertEqual(str(RollSeed('stdlib', 255, 3)), 'stdlib:ff:3')
+
+    def test_shared_generator(self):
+        """Rolls drawn one after another share a generator, and replay from their draws"""
+        for backend in BACKENDS:
+            if backend == 'secrets':
+                continue
+            with self.subTest(value=backend):
+                stream = RollStream(backend, seed=8)
+                plans = [compile_notation(notation) for notation in ("d20+5", "4d6kh3", "3d8", "d20+5")]
+                rolls = [plan.roll(stream.reserve()) for plan in plans]
+                self.assertEqual({roll.seed.offset for roll in rolls}, {0})
+                self.assertEqual([roll.seed.draws for roll in rolls], [0, 1, 5, 8])
+                for plan, roll in reversed(list(zip(plans, rolls))):
+                    self.assertEqual(plan.roll(roll.seed).rolled[0].raw_results, roll.rolled[0].raw_results)
+                # A roll reserved but not drawn yet keeps its place to itself
+                pending = stream.reserve()
+                self.assertNotEqual(stream.reserve().offset, pending.offset)
+                source, seed = stream.next()
+                self.assertEqual(source.roll(BLOCK_DRAWS, 1, 6), seed.source().roll(BLOCK_DRAWS, 1, 6))
+                self.assertNotEqual(stream.reserve().offset, seed.offset)
+
+    def test_bounds(self):
+        for backend in BACKENDS:
+            with self.subTest(value=backend):
+                source, _ = RollStream(backend).next()
+                self.assertTrue(all(1 <= die <= 6 for die in source.roll(1000, 1, 6)))
+                self.assertEqual(set(source.roll(1000, -1, 1)), {-1, 0, 1})
+                if counts.available:
+                    self.assertEqual(sum(source.multinomial(1000, 6)), 1000)
+
+    def test_incomplete_source(self):
+        class RollOnly(DiceSource):
+            def roll(self, num_dice, low, high):
+                return [low] * num_dice
+        with self.assertRaises(TypeError):
+            RollOnly()
+
+    def test_parser_records_seed(self):
+        parser = DiceNotationParser("2d6+1", stream=RollStream('stdlib', seed=7))
+        parser.process()
+        self.assertEqual(parser.seed, RollSeed('stdlib', 7, 0))
+        self.assertEqual(compile_notation("2d6+1").roll(parser.seed).total, parser.total)
+
+    def test_streams(self):
+        streams = RollStreams(game_backend='secrets', seeds={1: 99})
+        self.assertIs(streams.for_guild(1), streams.for_guild(1))
+        self.assertEqual(streams.for_guild(1).seed, 99)
+        self.assertIsNot(streams.for_guild(2), streams.for_guild(None))
+        game = streams.for_game()
+        self.assertFalse(game.reserve().replayable)
+        with self.assertRaises(ValueError):
+            RollStream('dice bag')
@@ -0,0 +1,217 @@
+import itertools
+import os
+import tempfile
+import unittest
+from collections import Counter
+
+from r2d20.testing import StrictLoopTestCase
+from r2d20.utils.dice.stats.cache import DistributionCache, canonical_key
+from r2d20.utils.dice.stats.engine import distribution, stats_cost, term_key, term_pmf
+from r2d20.utils.dice.stats.order_stats import keep_pmf
+from r2d20.utils.dice.stats.pmf import PMF, DistributionException
+from r2d20.utils.dice.notation.compiling import compile_notation
+from r2d20.utils.dice.notation.cost import CostBudget
+
+
+class TestDistribution(unittest.TestCase):
+
+    def test_mean_and_variance(self):
+        test_cases = [
+            ("d20", 10.5, 33.25),
+            ("2d6+3", 10, 35 / 6),
+            ("d20-d4", 8, 33.25 + 1.25),
+            ("(d6+1)*2", 9, 35 / 3),
+            ("4df", 0, 8 / 3),
+            ("3d6min8", 10.824074, None),
+        ]
+        for notation, mean, variance in test_cases:
+            with self.subTest(value=notation):
+                pmf = distribution(notation)
+                self.assertAlmostEqual(pmf.mean(), mean, places=6)
+                if variance is not None:
+                    self.assertAlmostEqual(pmf.variance(), variance, places=6)
+
+    def test_keep_drop(self):
+        pmf = distribution("4d6kh3")
+        self.assertAlmostEqual(pmf.at_least(18), 21 / 1296)
+        self.assertAlmostEqual(pmf.at_least(3), 1.0)
+        self.assertAlmostEqual(distribution("d20@adv").at_least(20), 39 / 400)
+        self.assertAlmostEqual(distribution("d20@dis").at_least(20), 1 / 400)
+
+    def test_percentile(self):
+        pmf = distribution("2d6")
+        self.assertEqual(pmf.percentile(50), 7)
+        self.assertEqual(pmf.percentile(100), 12)
+        self.assertEqual(pmf.percentile(0), 2)
+
+    def test_shared_terms(self):
+        plan_a, plan_b = compile_notation("d20+5"), compile_notation("1d20+7")
+        key = term_key(plan_a.parsed[0])
+        self.assertEqual(key, term_key(plan_b.parsed[0]))
+        self.assertIs(term_pmf(key), term_pmf(term_key(plan_b.parsed[0])))
+
+    def test_divide_by_zero(self):
+        with self.assertRaises(DistributionException):
+            distribution("d20/(d4-1)")
+
+    def test_fractions_counted_once(self):
+        pmf = distribution("d6/d6+d6")
+        self.assertEqual(len(set(pmf.values)), len(pmf.values))
+        self.assertAlmostEqual(sum(pmf.probs), 1.0)
+        # 1/3 + 2 and 4/3 + 1 come out slightly differently in floating point
+        probs = [prob for value, prob in pmf.items() if abs(value - 7 / 3) < 1e-6]
+        self.assertEqual(len(probs), 1)
+        self.assertAlmostEqual(probs[0], 3 / 216)
+
+    def test_convolution_matches_direct(self):
+        large = PMF.uniform(1, 100).repeat(3)
+        direct = PMF.uniform(1, 100).combine(PMF.uniform(1, 100), lambda a, b: a + b)
+        direct = direct.combine(PMF.uniform(1, 100), lambda a, b: a + b)
+        for value in (3, 50, 151, 299, 300):
+            self.assertAlmostEqual(large.at_least(value), direct.at_least(value), places=9)
+
+    def test_offloaded(self):
+        """Odds which take too long for the event loop are worked out in the process pool"""
+        budget = CostBudget().inline_stats
+        for notation in ("d20", "4d6kh3", "d20@adv", "100d6", "(d6+1)*2", "3d6min8"):
+            with self.subTest(value=notation):
+                self.assertLess(stats_cost(compile_notation(notation)), budget)
+        for notation in ("d1000/d1000", "d1000*d1000", "1000d1000", "20d1000kh9", "99d200kh20"):
+            with self.subTest(value=notation):
+                self.assertGreaterEqual(stats_cost(compile_notation(notation)), budget)
+
+
+class TestKeepPmf(unittest.TestCase):
+
+    def test_matches_brute_force(self):
+        test_cases = [
+            (4, 1, 6, 3, True),
+            (5, 1, 4, 2, False),
+            (3, 1, 8, 1, True),
+            (6, 1, 3, 5, False),
+            (4, -1, 1, 2, True),
+        ]
+        for num_dice, low, high, keep, highest in test_cases:
+            with self.subTest(value=(num_dice, low, high, keep, highest)):
+                counts = Counter()
+                for outcome in itertools.product(range(low, high + 1), repeat=num_dice):
+                    ordered = sorted(outcome)
+                    counts[sum(ordered[-keep:] if highest else ordered[:keep])] += 1
+                outcomes = (high - low + 1) ** num_dice
+                expected = {value: count / outcomes for value, count in counts.items()}
+                actual = dict(keep_pmf(num_dice, low, high, keep, highest).items())
+                self.assertEqual(set(actual), set(expected))
+                for value, prob in expected.items():
+                    self.assertAlmostEqual(actual[value], prob, places=12)
+
+    def test_memoized(self):
+        self.assertIs(keep_pmf(8, 1, 10, 6, True), keep_pmf(8, 1, 10, 6, True))
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+class TestDistributionCache(unittest.TestCase):
+
+    def test_canonical_key(self):
+        test_cases = [
+            ("d6+d6", "2d6", True),
+            ("d20+5", "d20+7", True),
+            ("d8+2d6", "2d6+d8", True),
+            ("d6-d6", "0*d6", False),
+            ("4d6kh3", "4d6", False),
+            ("2*d6", "d6*2", False),
+            ("d6+d6min2", "2d6", False),
+        ]
+        for first, second, same in test_cases:
+            with self.subTest(value=(first, second)):
+                first_key, _ = canonical_key(compile_notation(first).expression)
+                second_key, _ = canonical_key(compile_notation(second).expression)
+                self.assertEqual(first_key == second_key, same)
+        self.assertEqual(canonical_key(compile_notation("d20+5-2").expression)[1], 3)
+
+    def test_shifted_lookup(self):
+        pmf = distribution("d20+5")
+        self.assertEqual((pmf.min, pmf.max), (6, 25))
+        pmf = distribution("d20-3")
+        self.assertEqual((pmf.min, pmf.max), (-2, 17))
+        self.assertAlmostEqual(pmf.mean(), 7.5)
+
+    def test_disk_tier(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'cache.sqlite3')
+            writer = DistributionCache(path)
+            writer.put('+3d6', distribution("3d6"))
+            writer.put('+1*(+1d4/+1d2+0)', distribution("d4/d2"))
+            writer.close()
+            reader = DistributionCache(path)
+            dense = reader.get('+3d6')
+            self.assertEqual(reader.disk_hits, 1)
+            self.assertEqual(list(dense.values), list(range(3, 19)))
+            self.assertAlmostEqual(dense.at_least(18), 1 / 216)
+            sparse = reader.get('+1*(+1d4/+1d2+0)')
+            self.assertEqual(sparse.values, distribution("d4/d2").values)
+            self.assertIsNotNone(reader.get('+3d6'))
+            self.assertEqual(reader.hits, 1)
+            self.assertIsNone(reader.get('+1d6'))
+            reader.close()
+
+    def test_evicts_by_bytes(self):
+        cache = DistributionCache(memory_bytes=200)
+        cache.put('+3d6', distribution("3d6"))
+        cache.put('+4d6', distribution("4d6"))
+        self.assertIsNone(cache.get('+3d6'))
+        self.assertIsNotNone(cache.get('+4d6'))
+        with tempfile.TemporaryDirectory() as directory:
+            cache = DistributionCache(os.path.join(directory, 'cache.sqlite3'), disk_bytes=200)
+            cache.put('+3d6', distribution("3d6"))
+            cache.put('+4d6', distribution("4d6"))
+            cache._memory.clear()
+            self.assertIsNone(cache.get('+3d6'))
+            self.assertIsNotNone(cache.get('+4d6'))
+            cache.close()
+
+
+class TestDistributionCacheWrites(StrictLoopTestCase):
+
+    async def test_written_in_thread(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'cache.sqlite3')
+            cache = DistributionCache(path)
+            pmf = distribution("3d6")
+            cache.put('+3d6', pmf)
+            self.assertEqual(len(cache._writes), 1)
+            self.assertIs(cache.get('+3d6'), pmf)
+            await cache.flush()
+            self.assertFalse(cache._writes)
+            cache.close()
+            reader = DistributionCache(path)
+            self.assertIsNotNone(reader.get('+3d6'))
+            self.assertEqual(reader.disk_hits, 1)
+            reader.close()
+
+    async def test_read_without_writing(self):
+        """Disk hits on the event loop only read, leaving when they were used to a thread"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'cache.sqlite3')
+            writer = DistributionCache(path)
+            writer.put('+3d6', distribution("3d6"))
+            await writer.flush()
+            writer.close()
+            cache = DistributionCache(path)
+            stored, = cache._connection.execute("SELECT last_used FROM distributions").fetchone()
+            self.assertIsNotNone(cache.get('+3d6'))
+            self.assertEqual(cache.disk_hits, 1)
+            self.assertEqual(len(cache._writes), 1)
+            await cache.flush()
+            used, = cache._connection.execute("SELECT last_used FROM distributions").fetchone()
+            self.assertGreaterEqual(used, stored)
+            self.assertFalse(cache._used)
+            # A broken file is a miss rather than an error
+            cache._connection.execute("DROP TABLE distributions")
+            cache._connection.commit()
+            with self.assertLogs('r2d20.utils.dice.stats.cache', 'WARNING'):
+                self.assertIsNone(cache.get('+4d6'))
+            self.assertEqual(cache.misses, 1)
+            cache.close()
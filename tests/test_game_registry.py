@@ -0,0 +1,92 @@
+import asyncio
+
+from r2d20.games.dice.bones import BonesGame
+from r2d20.games.lobby import LobbyView
+from r2d20.games.registry import GameLimitException, GameRegistry, SessionState
+from r2d20.testing import FakeBot, FakeInteraction, StrictLoopTestCase, click
+from r2d20.utils.metrics import Metrics
+
+
+class TestGameRegistry(StrictLoopTestCase):
+
+    def setUp(self):
+        self.bot = FakeBot()
+
+    def open(self, registry: GameRegistry, guild_id: int = 1) -> tuple[FakeInteraction, LobbyView]:
+        interaction = FakeInteraction(guild_id=guild_id)
+        lobby = LobbyView(interaction, timeout=None)
+        registry.open(interaction, 'baldurs_bones', lobby,
+                      lambda lobby: BonesGame(self.bot, lobby=lobby, ruleset_name='baldurs_bones', timeout=None))
+        return interaction, lobby
+
+    async def test_limits(self):
+        registry = GameRegistry(max_games=3, max_games_per_guild=2)
+        self.open(registry, 1)
+        self.open(registry, 1)
+        with self.assertRaises(GameLimitException):
+            self.open(registry, 1)
+        self.open(registry, 2)
+        with self.assertRaises(GameLimitException):
+            self.open(registry, 3)
+        self.assertEqual((registry.count(), registry.count(1), registry.count(2), registry.count(3)), (3, 2, 1, 0))
+        self.assertEqual(len(registry.sessions(1)), 2)
+
+    async def test_lifecycle(self):
+        metrics = Metrics()
+        registry = GameRegistry(metrics=metrics)
+        host, lobby = self.open(registry)
+        session = lobby.session
+        await click(lobby, lobby.join, FakeInteraction(guild_id=1))
+        members = {member.id: member for member in lobby.members}
+        start = FakeInteraction(host.user, guild_id=1)
+        await click(lobby, lobby.start, start)
+        self.assertIs(session.state, SessionState.PLAYING)
+        name, _, kwargs = start.response.calls[0]
+        self.assertEqual(name, 'edit_message')
+        game = kwargs['view']
+        self.assertIsInstance(game, BonesGame)
+        self.assertIs(session.view, game)
+        self.assertEqual(registry.stats()['playing'], 1)
+        while not game.is_game_over:
+            await click(game, game.stand, FakeInteraction(members[game.current_player.id]))
+        self.assertIs(session.state, SessionState.FINISHED)
+        self.assertEqual(len(registry), 0)
+        self.assertEqual(registry.stats(), {'lobby': 0, 'playing': 0, 'guilds': 0, 'finished': 1,
+                                            'timed_out': 0, 'failed': 0})
+        gauges = metrics.gauges['r2d20_games_open']
+        self.assertEqual(gauges[(('game', 'baldurs_bones'), ('state', 'playing'))], 0)
+        self.assertEqual(metrics.counters['r2d20_games_closed_total'][
+            (('game', 'baldurs_bones'), ('state', 'finished'))], 1)
+
+    async def test_timeout(self):
+        registry = GameRegistry(lobby_timeout=0.05, game_timeout=0.05)
+        registry.start()
+        try:
+            quiet, _ = self.open(registry)
+            busy, lobby = self.open(registry)
+            for _ in range(4):
+                await asyncio.sleep(0.03)
+                await click(lobby, lobby.join, FakeInteraction(guild_id=1))
+            self.assertEqual(registry.count(), 1)
+            self.assertEqual(quiet.edits[0]['embed'].footer.text, 'Lobby timed out.')
+            self.assertEqual(busy.edits, [])
+            await asyncio.sleep(0.1)
+            self.assertEqual(registry.count(), 0)
+            self.assertEqual(registry.closed[SessionState.TIMED_OUT], 2)
+        finally:
+            await registry.stop()
+
+    async def test_shorter_game_timeout(self):
+        """A game timing out sooner than its lobby would is rescheduled when it starts"""
+        registry = GameRegistry(lobby_timeout=10.0, game_timeout=0.05)
+        registry.start()
+        try:
+            host, lobby = self.open(registry)
+            await click(lobby, lobby.join, FakeInteraction(guild_id=1))
+            await click(lobby, lobby.start, FakeInteraction(host.user, guild_id=1))
+            self.assertIs(lobby.session.state, SessionState.PLAYING)
+            await asyncio.sleep(0.15)
+            self.assertIs(lobby.session.state, SessionState.TIMED_OUT)
+            self.assertEqual(registry.count(), 0)
+        finally:
+            await registry.stop()
@@ -0,0 +1,95 @@
+import asyncio
+
+from r2d20.games.lobby import ROSTER_PAGE_SIZE, LobbyView
+from r2d20.testing import FakeInteraction, FakeMember, StrictLoopTestCase, click
+
+
+class TestLobby(StrictLoopTestCase):
+
+    async def fill(self, lobby: LobbyView, players: int) -> list[FakeMember]:
+        members = [FakeMember() for _ in range(players)]
+        for member in members:
+            await click(lobby, lobby.join, FakeInteraction(member))
+            # Fake replies don't yield to the loop, so let it run between clicks like Discord would
+            await asyncio.sleep(0)
+        return members
+
+    async def test_capacity(self):
+        lobby = LobbyView(FakeInteraction(), max_players=3, update_window=0.0)
+        members = await self.fill(lobby, 2)
+        self.assertTrue(lobby.join.disabled)
+        self.assertEqual(lobby.join.label, 'Full')
+        late = FakeInteraction()
+        await click(lobby, lobby.join, late)
+        self.assertEqual(late.response.calls[0][1], ('The lobby is full.',))
+        self.assertEqual(len(lobby.members), 3)
+        await click(lobby, lobby.leave, FakeInteraction(members[0]))
+        self.assertFalse(lobby.join.disabled)
+        self.assertEqual(lobby.join.label, 'Join')
+        lobby.stop()
+
+    async def test_host_stays(self):
+        host = FakeInteraction()
+        lobby = LobbyView(host, update_window=0.0)
+        leave = FakeInteraction(host.user)
+        await click(lobby, lobby.leave, leave)
+        self.assertTrue(leave.response.calls[0][2]['ephemeral'])
+        self.assertEqual(lobby.members, [host.user])
+        lobby.stop()
+
+    async def test_lock_released_before_replying(self):
+        """Refusals are sent without holding up other clicks"""
+        host = FakeInteraction()
+        lobby = LobbyView(host, max_players=2, update_window=0.0)
+        member, = await self.fill(lobby, 1)
+        for name, button, interaction in (('join', lobby.join, FakeInteraction(latency=0.05)),
+                                          ('leave', lobby.leave, FakeInteraction(host.user, latency=0.05))):
+            with self.subTest(button=name):
+                refused = asyncio.create_task(click(lobby, button, interaction))
+                await asyncio.sleep(0.01)
+                self.assertEqual(interaction.response.calls[0][0], 'send_message')
+                self.assertFalse(lobby.lock.locked())
+                await refused
+        await click(lobby, lobby.leave, FakeInteraction(member))
+        self.assertEqual(lobby.members, [host.user])
+        lobby.stop()
+
+    async def test_pages(self):
+        lobby = LobbyView(FakeInteraction(), max_players=500, update_window=0.0)
+        self.assertNotIn(lobby.next_page, lobby.children)
+        members = await self.fill(lobby, 499)
+        self.assertEqual(lobby.page_count, -(-500 // ROSTER_PAGE_SIZE))
+        self.assertIn(lobby.next_page, lobby.children)
+        self.assertTrue(lobby.previous_page.disabled)
+        embed = lobby.embed
+        self.assertEqual(len(embed.fields), 1)
+        self.assertEqual(embed.fields[0].name, 'Players (500/500)')
+        self.assertEqual(len(embed.fields[0].value.splitlines()), ROSTER_PAGE_SIZE)
+        self.assertLess(len(embed), 6000)
+
+        await click(lobby, lobby.next_page, FakeInteraction())
+        self.assertEqual(lobby.page, 1)
+        first_line = lobby.embed.fields[0].value.splitlines()[0]
+        self.assertEqual(first_line, f'`{ROSTER_PAGE_SIZE + 1}.` {members[ROSTER_PAGE_SIZE - 1].display_name}')
+        # Leaving moves everyone after them up a place
+        await click(lobby, lobby.leave, FakeInteraction(members[0]))
+        first_line = lobby.embed.fields[0].value.splitlines()[0]
+        self.assertEqual(first_line, f'`{ROSTER_PAGE_SIZE + 1}.` {members[ROSTER_PAGE_SIZE].display_name}')
+        self.assertEqual(lobby.members[1], members[1])
+
+        for _ in range(lobby.page_count + 1):
+            await click(lobby, lobby.next_page, FakeInteraction())
+        self.assertEqual(lobby.page, lobby.page_count - 1)
+        self.assertTrue(lobby.next_page.disabled)
+        lobby.stop()
+
+    async def test_page_kept_in_range(self):
+        lobby = LobbyView(FakeInteraction(), max_players=50, update_window=0.0)
+        members = await self.fill(lobby, ROSTER_PAGE_SIZE)
+        await click(lobby, lobby.next_page, FakeInteraction())
+        self.assertEqual(lobby.page, 1)
+        await click(lobby, lobby.leave, FakeInteraction(members[-1]))
+        self.assertEqual(lobby.page, 0)
+        self.assertNotIn(lobby.next_page, lobby.children)
+        self.assertNotIn('Page', str(lobby.embed.footer.text))
+        lobby.stop()
@@ -0,0 +1,76 @@
+import asyncio
+
+from r2d20.games.dice.bones import BonesGame
+from r2d20.games.lobby import LobbyView
+from r2d20.games.updates import MessageUpdater
+from r2d20.testing import FakeBot, FakeInteraction, FakeMember, StrictLoopTestCase, click
+
+
+class TestMessageUpdater(StrictLoopTestCase):
+
+    async def test_burst(self):
+        state = {'count': 0}
+        updater = MessageUpdater(lambda: {'content': str(state['count'])}, window=0.05)
+        clicks = [FakeInteraction() for _ in range(5)]
+        for interaction in clicks:
+            state['count'] += 1
+            await updater.update(interaction)
+        self.assertEqual(clicks[0].response.calls, [('edit_message', (), {'content': '1'})])
+        for interaction in clicks[1:]:
+            self.assertEqual(interaction.response.calls, [('defer', (), {})])
+        self.assertTrue(updater.pending)
+        await asyncio.sleep(0.08)
+        self.assertEqual(clicks[-1].edits, [{'content': '5'}])
+        self.assertEqual([interaction.edits for interaction in clicks[:-1]], [[]] * 4)
+        self.assertEqual((updater.edits, updater.coalesced), (2, 4))
+        # The window closes once a window passes without clicks
+        await asyncio.sleep(0.08)
+        quiet = FakeInteraction()
+        await updater.update(quiet)
+        self.assertEqual(quiet.response.calls[0][0], 'edit_message')
+        updater.cancel()
+
+    async def test_final(self):
+        updater = MessageUpdater(lambda: {'content': 'done'}, window=0.05)
+        first, second, last = FakeInteraction(), FakeInteraction(), FakeInteraction()
+        await updater.update(first)
+        await updater.update(second)
+        await updater.update(last, final=True)
+        self.assertEqual(last.response.calls, [('edit_message', (), {'content': 'done'})])
+        self.assertFalse(updater.pending)
+        await asyncio.sleep(0.08)
+        self.assertEqual(second.edits, [])
+
+
+class TestViewUpdates(StrictLoopTestCase):
+
+    async def test_concurrent_joins(self):
+        host = FakeInteraction()
+        lobby = LobbyView(host, max_players=50, update_window=0.05)
+        players = [FakeMember() for _ in range(20)]
+        clicks = [FakeInteraction(player, latency=0.001) for player in players + players[:5]]
+        await asyncio.gather(*(click(lobby, lobby.join, interaction) for interaction in clicks))
+        self.assertEqual(len(lobby.members), 21)
+        self.assertEqual(len(set(lobby.members)), 21)
+        self.assertEqual(lobby.updater.edits, 1)
+        await asyncio.sleep(0.08)
+        self.assertEqual(lobby.updater.edits, 2)
+        self.assertEqual(clicks[-6].edits[0]['embed'].fields[0].name, 'Players (21/50)')
+        lobby.stop()
+
+    async def test_game_over(self):
+        host = FakeInteraction()
+        lobby = LobbyView(host)
+        await click(lobby, lobby.join, FakeInteraction())
+        game = BonesGame(FakeBot(), lobby=lobby, ruleset_name='baldurs_bones', update_window=10.0)
+        members = {member.id: member for member in lobby.members}
+        clicks = []
+        while not game.is_game_over:
+            interaction = FakeInteraction(members[game.current_player.id])
+            clicks.append(interaction)
+            await click(game, game.stand, interaction)
+        # The end of the game is shown straight away, however recently the message was edited
+        self.assertEqual(clicks[0].response.calls[0][0], 'edit_message')
+        self.assertEqual(clicks[-1].response.calls[0][0], 'edit_message')
+        self.assertIsNone(clicks[-1].response.calls[0][2]['view'])
+        self.assertFalse(game.updater.pending)
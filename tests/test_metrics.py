@@ -0,0 +1,93 @@
+import unittest
+
+import discord
+
+from r2d20.testing import FakeInteraction, click
+from r2d20.utils.metrics import Histogram, Metrics, timed_callback
+
+
+class TestHistogram(unittest.TestCase):
+
+    def test_buckets(self):
+        histogram = Histogram((1.0, 2.0, 5.0))
+        for value in (0.5, 1.0, 1.5, 3.0, 10.0):
+            histogram.observe(value)
+        self.assertEqual(histogram.counts, [2, 1, 1, 1])
+        self.assertEqual(histogram.count, 5)
+        self.assertEqual(histogram.sum, 16.0)
+        self.assertEqual(list(histogram.cumulative()), [('1.0', 2), ('2.0', 3), ('5.0', 4), ('+Inf', 5)])
+
+    def test_quantile(self):
+        histogram = Histogram((1.0, 2.0))
+        self.assertEqual(histogram.quantile(0.5), 0.0)
+        for _ in range(4):
+            histogram.observe(1.5)
+        self.assertEqual(histogram.quantile(0.5), 1.5)
+        self.assertEqual(histogram.quantile(1.0), 2.0)
+        histogram.observe(100.0)
+        self.assertEqual(histogram.quantile(1.0), 2.0)
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_render(self):
+        metrics = Metrics()
+        metrics.observe('r2d20_command_seconds', 0.002, command='roll', outcome='ok')
+        metrics.increment('r2d20_command_errors_total', command='roll', error='NotationParseException')
+        metrics.increment('r2d20_command_errors_total', command='roll', error='NotationParseException')
+        lines = metrics.render().splitlines()
+        self.assertIn('# TYPE r2d20_command_seconds histogram', lines)
+        self.assertIn('r2d20_command_seconds_bucket{command="roll",outcome="ok",le="0.001"} 0', lines)
+        self.assertIn('r2d20_command_seconds_bucket{command="roll",outcome="ok",le="0.0025"} 1', lines)
+        self.assertIn('r2d20_command_seconds_bucket{command="roll",outcome="ok",le="+Inf"} 1', lines)
+        self.assertIn('r2d20_command_seconds_count{command="roll",outcome="ok"} 1', lines)
+        self.assertIn('# TYPE r2d20_command_errors_total counter', lines)
+        self.assertIn('r2d20_command_errors_total{command="roll",error="NotationParseException"} 2', lines)
+
+    def test_escaping(self):
+        metrics = Metrics()
+        metrics.increment('errors', command='say "hi"\\\n')
+        self.assertIn(r'errors{command="say \"hi\"\\\n"} 1', metrics.render())
+
+    def test_time(self):
+        metrics = Metrics()
+        with self.assertRaises(ValueError):
+            with metrics.phase('parse'):
+                raise ValueError
+        self.assertEqual(metrics.histograms['r2d20_phase_seconds'][(('phase', 'parse'),)].count, 1)
+        with metrics.phase('parse', FakeInteraction(command='roll')):
+            pass
+        self.assertEqual(
+            metrics.histograms['r2d20_phase_seconds'][(('command', 'roll'), ('phase', 'parse'))].count, 1)
+        metrics.reset()
+        with metrics.phase('parse'):
+            pass
+        self.assertEqual(metrics.histograms['r2d20_phase_seconds'][(('phase', 'parse'),)].count, 1)
+
+    def test_summary(self):
+        metrics = Metrics()
+        for _ in range(3):
+            metrics.observe('latency', 0.002, command='roll', outcome='ok')
+        metrics.observe('latency', 0.002, command='roll', outcome='error')
+        metrics.observe('latency', 0.002, command='d20', outcome='ok')
+        rows = metrics.summary('latency', 'command')
+        self.assertEqual([(command, count) for command, count, _, _ in rows], [('roll', 4), ('d20', 1)])
+
+
+class TestTimedCallback(unittest.IsolatedAsyncioTestCase):
+
+    async def test_view(self):
+        metrics = Metrics()
+
+        class View(discord.ui.View):
+            @discord.ui.button(label='Press')
+            @timed_callback('test')
+            async def press(self, interaction, button):
+                await interaction.response.defer()
+
+        interaction = FakeInteraction()
+        interaction.client = type('Client', (), {'metrics': metrics})()
+        view = View()
+        await click(view, view.press, interaction)
+        self.assertEqual(interaction.response.calls[0][0], 'defer')
+        self.assertEqual(metrics.histograms['r2d20_view_seconds'][(('action', 'press'), ('view', 'test'))].count, 1)
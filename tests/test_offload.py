@@ -0,0 +1,51 @@
+import asyncio
+import math
+import time
+
+from r2d20.testing import StrictLoopTestCase
+from r2d20.utils.offload import JobTimeoutException, OffloadBusyException, Offloader
+
+
+class TestOffloader(StrictLoopTestCase):
+
+    async def asyncSetUp(self):
+        self.offloader = Offloader(max_workers=1, max_queue=1, timeout=5.0)
+
+    async def asyncTearDown(self):
+        self.offloader.shutdown()
+
+    async def test_inline(self):
+        self.assertEqual(await self.offloader.run(math.factorial, 5, inline=True), 120)
+        self.assertEqual(self.offloader.completed, 0)
+
+    async def test_run(self):
+        self.assertEqual(await self.offloader.run(math.factorial, 20), math.factorial(20))
+        stats = self.offloader.stats()
+        self.assertEqual((stats['completed'], stats['failed'], stats['waiting']), (1, 0, 0))
+        self.assertGreater(stats['latency_p50'], 0)
+        with self.assertRaises(ValueError):
+            await self.offloader.run(math.factorial, -1)
+        self.assertEqual(self.offloader.failed, 1)
+
+    async def test_timeout(self):
+        await self.offloader.run(math.factorial, 1)  # Start the worker
+        started = time.monotonic()
+        with self.assertRaises(JobTimeoutException):
+            await self.offloader.run(time.sleep, 10, timeout=0.2)
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertEqual(self.offloader.timed_out, 1)
+        # The worker gave up on the job, so it's free for the next one
+        self.assertEqual(await self.offloader.run(math.factorial, 3, timeout=1), 6)
+
+    async def test_backpressure(self):
+        await self.offloader.run(math.factorial, 1)
+        running = asyncio.create_task(self.offloader.run(time.sleep, 0.5))
+        await asyncio.sleep(0)
+        waiting = asyncio.create_task(self.offloader.run(math.factorial, 4))
+        await asyncio.sleep(0)
+        self.assertEqual(self.offloader.queue_depth, 1)
+        with self.assertRaises(OffloadBusyException):
+            await self.offloader.run(math.factorial, 5)
+        self.assertEqual(self.offloader.rejected, 1)
+        await running
+        self.assertEqual(await waiting, 24)
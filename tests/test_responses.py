@@ -0,0 +1,75 @@
+import asyncio
+import inspect
+
+from r2d20.testing import FakeInteraction, StrictLoopTestCase
+from r2d20.utils.responses import Responder, reply_error
+
+
+class TestResponder(StrictLoopTestCase):
+
+    async def test_direct(self):
+        responder = Responder()
+        interaction = FakeInteraction()
+        await responder.send(interaction, {'content': 'hi'}, ephemeral=True)
+        self.assertEqual(interaction.response.calls, [('send_message', (), {'content': 'hi', 'ephemeral': True})])
+        stats = responder.stats()
+        self.assertEqual((stats['direct'], stats['deferred'], stats['late']), (1, 0, 0))
+        self.assertGreater(stats['margin_min'], 2.5)
+
+    async def test_deferred(self):
+        responder = Responder()
+        interaction = FakeInteraction()
+
+        async def reply():
+            self.assertTrue(interaction.response.is_done())
+            return {'content': 'done'}
+        await responder.send(interaction, reply(), slow=True)
+        self.assertEqual(interaction.response.calls[0][0], 'defer')
+        self.assertEqual(interaction.followup.calls, [('send', (), {'content': 'done', 'ephemeral': False})])
+        self.assertEqual(responder.paths['deferred'], 1)
+
+    async def test_late(self):
+        responder = Responder(safety_margin=0.5)
+        interaction = FakeInteraction(age=2.4)
+
+        async def reply():
+            await asyncio.sleep(0.3)
+            return {'content': 'slow'}
+        await responder.send(interaction, reply())
+        self.assertEqual(interaction.response.calls[0][0], 'defer')
+        self.assertEqual(interaction.followup.calls[0][2]['content'], 'slow')
+        self.assertEqual(responder.paths['late'], 1)
+
+    async def test_defer_fails(self):
+        """The reply isn't left unawaited, or still running, if deferring fails"""
+        responder = Responder(safety_margin=0.5)
+
+        async def fail(**kwargs):
+            raise RuntimeError("expired")
+
+        finished = []
+
+        async def reply():
+            await asyncio.sleep(0.3)
+            finished.append(True)
+            return {'content': 'never sent'}
+        interaction = FakeInteraction()
+        interaction.response.defer = fail
+        coroutine = reply()
+        with self.assertRaises(RuntimeError):
+            await responder.send(interaction, coroutine, slow=True)
+        self.assertEqual(inspect.getcoroutinestate(coroutine), inspect.CORO_CLOSED)
+
+        interaction = FakeInteraction(age=2.4)
+        interaction.response.defer = fail
+        with self.assertRaises(RuntimeError):
+            await responder.send(interaction, reply())
+        await asyncio.sleep(0.4)
+        self.assertEqual(finished, [])
+
+    async def test_reply_error(self):
+        interaction = FakeInteraction()
+        await reply_error(interaction, "first")
+        await reply_error(interaction, "second")
+        self.assertEqual(interaction.response.calls[0][1], ("first",))
+        self.assertEqual(interaction.followup.calls[0][1], ("second",))
@@ -0,0 +1,62 @@
+import asyncio
+import time
+import unittest
+
+from r2d20.testing import StrictLoopTestCase
+from r2d20.utils.metrics import Metrics
+from r2d20.utils.watchdog import LoopWatchdog
+
+
+def _block(seconds: float):
+    time.sleep(seconds)
+
+
+class TestLoopWatchdog(unittest.IsolatedAsyncioTestCase):
+
+    async def test_idle(self):
+        metrics = Metrics()
+        watchdog = LoopWatchdog(0.05, 0.01, metrics=metrics)
+        watchdog.start()
+        await asyncio.sleep(0.1)
+        watchdog.stop()
+        self.assertEqual(watchdog.episodes, 0)
+        self.assertEqual(watchdog.call_sites(), [])
+        self.assertGreater(len(watchdog.lags), 0)
+        self.assertEqual(metrics.histograms['r2d20_loop_lag_seconds'][()].count, len(watchdog.lags))
+        self.assertFalse(watchdog.running)
+
+    async def test_blocked(self):
+        metrics = Metrics()
+        watchdog = LoopWatchdog(0.05, 0.01, metrics=metrics)
+        watchdog.start()
+        await asyncio.sleep(0.02)
+        _block(0.3)
+        await asyncio.sleep(0.02)
+        watchdog.stop()
+        self.assertEqual(watchdog.episodes, 1)
+        self.assertEqual(metrics.counters['r2d20_loop_blocked_total'][()], 1)
+        stack, count = watchdog.call_sites(1)[0]
+        self.assertEqual(stack[-1][2], '_block')
+        self.assertEqual(stack[-2][2], 'test_blocked')
+        self.assertGreater(count, 1)
+        self.assertIn('in _block', watchdog.report())
+        self.assertGreaterEqual(max(watchdog.lags), 0.25)
+
+
+class TestStrictLoopTestCase(unittest.TestCase):
+
+    def test_fails_blocking_tests(self):
+        class Blocking(StrictLoopTestCase):
+            async def test_sleep(self):
+                await asyncio.sleep(0.02)
+                _block(0.3)
+
+            async def test_await(self):
+                await asyncio.sleep(0.3)
+
+        result = unittest.TestResult()
+        unittest.defaultTestLoader.loadTestsFromTestCase(Blocking).run(result)
+        self.assertEqual(result.testsRun, 2)
+        failures = [test.id().rsplit('.', 1)[-1] for test, _ in result.failures + result.errors]
+        self.assertEqual(failures, ['test_sleep'])
+        self.assertIn('in _block', (result.failures + result.errors)[0][1])